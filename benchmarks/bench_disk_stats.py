@@ -0,0 +1,94 @@
+"""
+Compares parsing of /proc/diskstats with the parser that read sector counters only.
+
+Usage: python -m benchmarks.bench_disk_stats
+"""
+
+
+from dataclasses import dataclass
+import os
+import tempfile
+import timeit
+
+from hdmon.lib.disk_stats import iter_disk_stats
+
+
+_DEVICE_COUNT = 64
+_REPEAT = 5
+_NUMBER = 2000
+# Number of devices whose counters change between polls
+_SCENARIOS = {"idle": 0, "typical": 8, "busy": _DEVICE_COUNT}
+
+
+@dataclass(frozen=True)
+class _SectorCounters:
+    sectors_read: int
+    sectors_written: int
+
+
+def _iter_sector_counters(path):
+    """The parser before the full diskstats layout was supported"""
+    with open(path) as fh:
+        for line in fh:
+            parts = line.split()
+            device_name = parts[2]
+            counters = _SectorCounters(
+                sectors_read=int(parts[5]),
+                sectors_written=int(parts[9]),
+            )
+            yield (device_name, counters)
+
+
+def _write_diskstats(path, changed_devices, poll):
+    with open(path, "w") as fh:
+        for index in range(_DEVICE_COUNT):
+            base = index * 1000003 + (poll if index < changed_devices else 0)
+            values = " ".join(str(base + field) for field in range(17))
+            fh.write(f"   8      {index} sd{index} {values}\n")
+
+
+def _measure(parse, path, sources) -> float:
+    """Returns the best time per poll in microseconds.
+
+    Contents of the polled file alternate, the parser keeps its previous poll
+    by path. Swapping contents takes time too, it's subtracted.
+    """
+
+    def poll_twice(parse):
+        for source in sources:
+            os.link(source, path + ".tmp")
+            os.replace(path + ".tmp", path)
+            list(parse(path))
+
+    def best_time(parse):
+        times = timeit.repeat(lambda: poll_twice(parse), repeat=_REPEAT, number=_NUMBER)
+        return min(times) / (_NUMBER * len(sources)) * 1e6
+
+    return best_time(parse) - best_time(lambda path: ())
+
+
+def main():
+    print(f"{_DEVICE_COUNT} devices per poll, time per poll")
+    is_regressed = False
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for scenario, changed_devices in _SCENARIOS.items():
+            sources = []
+            for poll in range(2):
+                source = os.path.join(temp_dir, f"diskstats-{scenario}-{poll}")
+                _write_diskstats(source, changed_devices, poll)
+                sources.append(source)
+            path = os.path.join(temp_dir, f"diskstats-{scenario}")
+            baseline = _measure(_iter_sector_counters, path, sources)
+            current = _measure(iter_disk_stats, path, sources)
+            print(
+                f"{scenario:>8} ({changed_devices} changed): sectors only "
+                f"{baseline:.1f} us, all fields {current:.1f} us "
+                f"({current / baseline:.0%})"
+            )
+            if current > baseline:
+                is_regressed = True
+    return 1 if is_regressed else 0
+
+
+if __name__ == "__main__":
+    exit(main())
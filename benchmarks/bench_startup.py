@@ -0,0 +1,104 @@
+"""
+Measures time from process start to the first completed poll of the service.
+
+Every run starts a fresh interpreter with a configuration that uses all
+built-in plugins, so that slow imports and plugin initialization show up.
+
+Usage: python -m benchmarks.bench_startup [--runs N] [--max-ms MS]
+"""
+
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+_CONFIG = """
+profiles:
+  - disks:
+      - /dev/nonexistent
+    once_idle:
+      delay: 1h
+      run: "true"
+    prespin:
+      state_dir: {state_dir}
+    smart: {{}}
+    wake_culprits:
+      processes: true
+"""
+
+# Runs in the child process, prints CLOCK_MONOTONIC at the first poll
+_CHILD = """
+import sys, time
+from hdmon.lib.disk_stats_monitor import DiskStatsObserver
+from hdmon.service import DiskMonitoringService, load_config
+
+class FirstPoll(DiskStatsObserver):
+    def on_disk_stats_updated(self, disk_stats):
+        print(time.monotonic())
+        service._scheduler.stop()
+
+service = DiskMonitoringService(
+    load_config(sys.argv[1]),
+    control_socket_path=sys.argv[2],
+    status_file_path=sys.argv[3],
+    history_file_path=sys.argv[4],
+    persistent_history_file_path=sys.argv[5],
+)
+service._disk_stats_monitor.add_observer(FirstPoll())
+service.run()
+"""
+
+
+def _run_once(temp_dir: str) -> float:
+    """Returns milliseconds from spawning the service to its first poll"""
+    config_path = os.path.join(temp_dir, "hdmon.yml")
+    repo_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    started_at = time.monotonic()
+    output = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            _CHILD,
+            config_path,
+            os.path.join(temp_dir, "control.sock"),
+            os.path.join(temp_dir, "status"),
+            os.path.join(temp_dir, "history"),
+            os.path.join(temp_dir, "lib", "history"),
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        env=dict(os.environ, PYTHONPATH=repo_path),
+        check=True,
+        universal_newlines=True,
+    ).stdout
+    return (float(output.split()[-1]) - started_at) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(__doc__)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument(
+        "--max-ms", type=float, default=None, help="fail if the median is slower"
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        with open(os.path.join(temp_dir, "hdmon.yml"), "w") as fh:
+            fh.write(_CONFIG.format(state_dir=os.path.join(temp_dir, "state")))
+        times = [_run_once(temp_dir) for _run in range(args.runs)]
+
+    median = statistics.median(times)
+    print(f"startup to first poll: median {median:.1f} ms, best {min(times):.1f} ms")
+    if args.max_ms is not None and median > args.max_ms:
+        print(f"slower than {args.max_ms:.1f} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
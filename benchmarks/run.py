@@ -0,0 +1,269 @@
+"""
+Runs microbenchmarks of hot paths and compares results with stored baselines.
+
+Every case uses synthetic data, no root access or real devices are needed.
+Results are the best CPU time per operation out of several repeats, so other
+processes add less noise. Baselines depend on the machine, so record them with
+--update on the machine that compares results, e.g. before making a change,
+and raise --threshold on machines with noisy neighbours.
+
+Usage: python -m benchmarks.run [--threshold PERCENT] [--update] [CASE ...]
+"""
+
+
+from typing import Callable, Dict, List
+import argparse
+import gc
+import json
+import logging
+import os
+import tempfile
+import time
+
+from hdmon.lib.disk_activity_monitor import (
+    DiskActivityMonitor,
+    DiskActivityObserver,
+    DiskPollObserver,
+)
+from hdmon.lib.disk_presence_monitor import DiskPresenceMonitor, DiskPresenceObserver
+from hdmon.lib.disk_stats import DiskCounters, iter_disk_stats
+from hdmon.lib.logger import LOGGER
+from hdmon.lib.scheduler import Scheduler
+
+
+_BASELINES_PATH = os.path.join(os.path.dirname(__file__), "baselines.json")
+_DEFAULT_THRESHOLD = 25.0  # percent
+_REPEAT = 7
+_FIELD_COUNT = 17
+
+# Runs the given number of operations, returns seconds they took
+Case = Callable[[int], float]
+
+
+def _write_diskstats(path: str, device_count: int, changed_devices: int, poll: int):
+    with open(path, "w") as fh:
+        for index in range(device_count):
+            base = index * 1000003 + (poll if index < changed_devices else 0)
+            values = " ".join(str(base + field) for field in range(_FIELD_COUNT))
+            fh.write(f"   8      {index} sd{index} {values}\n")
+
+
+def _parse_disk_stats(device_count: int, changed_devices: int) -> Case:
+    def run(number: int) -> float:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # Polls alternate files, so changed lines look changed every time
+            paths = []
+            for poll in range(2):
+                path = os.path.join(temp_dir, f"diskstats-{poll}")
+                _write_diskstats(path, device_count, changed_devices, poll)
+                paths.append(path)
+            started_at = time.process_time()
+            for index in range(number):
+                for _device in iter_disk_stats(paths[index % 2]):
+                    pass
+            return time.process_time() - started_at
+
+    return run
+
+
+def _counters(value: int) -> DiskCounters:
+    return DiskCounters(*[value] * 11)
+
+
+def _polls(device_count: int, changed_devices: int, number: int):
+    """Returns stats of consecutive polls, changed disks alternate busy and idle"""
+    polls = []
+    for poll in range(number + 1):
+        value = poll // 2
+        polls.append(
+            [
+                (f"sd{index}", _counters(value if index < changed_devices else 0))
+                for index in range(device_count)
+            ]
+        )
+    return polls
+
+
+class _PresenceObserver(DiskPresenceObserver):
+    def on_disks_added(self, device_names):
+        pass
+
+    def on_disks_removed(self, device_names):
+        pass
+
+
+def _presence_monitor(device_count: int, is_churning: bool) -> Case:
+    def run(number: int) -> float:
+        polls = _polls(device_count, device_count, number)
+        if is_churning:  # one disk comes and goes
+            for poll in polls[1::2]:
+                del poll[-1]
+        monitor = DiskPresenceMonitor()
+        monitor.add_observer(_PresenceObserver())
+        monitor.on_disk_stats_updated(polls[0])
+        started_at = time.process_time()
+        for poll in polls[1:]:
+            monitor.on_disk_stats_updated(poll)
+        return time.process_time() - started_at
+
+    return run
+
+
+class _ActivityObserver(DiskActivityObserver, DiskPollObserver):
+    def on_disk_active(self):
+        pass
+
+    def on_disk_idle(self):
+        pass
+
+    def on_disk_removed(self):
+        pass
+
+    def on_poll(self, snapshot):
+        pass
+
+
+def _activity_monitor(device_count: int, observers_per_disk: int) -> Case:
+    def run(number: int) -> float:
+        # Half of the disks change their state on every poll
+        polls = _polls(device_count, device_count // 2, number)
+        monitor = DiskActivityMonitor()
+        for index in range(device_count):
+            for _index in range(observers_per_disk):
+                observer = _ActivityObserver()
+                monitor.add_observer(f"sd{index}", observer)
+            monitor.add_poll_observer(f"sd{index}", observer)
+        monitor.on_disk_stats_updated(polls[0])
+        started_at = time.process_time()
+        for poll in polls[1:]:
+            monitor.on_disk_stats_updated(poll)
+        return time.process_time() - started_at
+
+    return run
+
+
+def _scheduler_set_clear(pending_timers: int) -> Case:
+    def run(number: int) -> float:
+        scheduler = Scheduler()
+        for index in range(pending_timers):
+            scheduler.set_timer(3600 + index, _do_nothing)
+        started_at = time.process_time()
+        for _index in range(number):
+            scheduler.clear_timer(scheduler.set_timer(60, _do_nothing))
+        return time.process_time() - started_at
+
+    return run
+
+
+def _scheduler_run() -> Case:
+    def run(number: int) -> float:
+        scheduler = Scheduler()
+        started_at = time.process_time()
+        for _index in range(number):
+            scheduler.set_timer(0, _do_nothing)
+        scheduler.run()
+        return time.process_time() - started_at
+
+    return run
+
+
+def _do_nothing():
+    pass
+
+
+# Names, cases and numbers of operations per repeat
+_CASES = {
+    "disk_stats_8_idle": (_parse_disk_stats(8, 0), 5000),
+    "disk_stats_8_busy": (_parse_disk_stats(8, 8), 5000),
+    "disk_stats_64_idle": (_parse_disk_stats(64, 0), 1000),
+    "disk_stats_64_typical": (_parse_disk_stats(64, 8), 1000),
+    "disk_stats_64_busy": (_parse_disk_stats(64, 64), 1000),
+    "disk_stats_512_busy": (_parse_disk_stats(512, 512), 100),
+    "presence_64_steady": (_presence_monitor(64, is_churning=False), 2000),
+    "presence_64_churn": (_presence_monitor(64, is_churning=True), 2000),
+    "activity_64_disks_1_observer": (_activity_monitor(64, 1), 1000),
+    "activity_64_disks_16_observers": (_activity_monitor(64, 16), 500),
+    "scheduler_set_clear": (_scheduler_set_clear(100), 50000),
+    "scheduler_run": (_scheduler_run(), 50000),
+}
+
+
+def _measure(case: Case, number: int, repeat: int) -> float:
+    """Returns the best time per operation in microseconds"""
+    case(number)  # warms up caches
+    # Collections of garbage from previous cases would add noise
+    is_gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return min(case(number) for _repeat in range(repeat)) / number * 1e6
+    finally:
+        if is_gc_enabled:
+            gc.enable()
+
+
+def _load_baselines(path: str) -> Dict[str, float]:
+    try:
+        with open(path) as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        return {}
+
+
+def _save_baselines(path: str, baselines: Dict[str, float]):
+    with open(path, "w") as fh:
+        json.dump(baselines, fh, indent=2, sort_keys=True)
+        fh.write("\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(__doc__)
+    parser.add_argument("cases", nargs="*", help="all cases by default")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=_DEFAULT_THRESHOLD,
+        help="fail if a case is slower than its baseline by more percent",
+    )
+    parser.add_argument(
+        "--update", action="store_true", help="store results as baselines"
+    )
+    parser.add_argument("--repeat", type=int, default=_REPEAT)
+    parser.add_argument("--baselines", default=_BASELINES_PATH)
+    args = parser.parse_args()
+
+    unknown_cases = set(args.cases) - set(_CASES)
+    if unknown_cases:
+        parser.error(f"unknown cases: {', '.join(sorted(unknown_cases))}")
+    # Monitors log state changes
+    LOGGER.setLevel(logging.WARNING)
+
+    baselines = _load_baselines(args.baselines)
+    results = {}
+    regressions: List[str] = []
+    for name in args.cases or _CASES:
+        case, number = _CASES[name]
+        result = _measure(case, number, args.repeat)
+        results[name] = result
+        baseline = baselines.get(name)
+        if baseline is None:
+            comparison = "no baseline"
+        else:
+            comparison = f"{result / baseline:.0%} of {baseline:.2f} us"
+            if result > baseline * (1 + args.threshold / 100):
+                regressions.append(name)
+                comparison += ", REGRESSED"
+        print(f"{name:>32}: {result:10.2f} us ({comparison})")
+
+    if args.update:
+        baselines.update((name, round(result, 2)) for name, result in results.items())
+        _save_baselines(args.baselines, baselines)
+        print(f'Baselines saved to "{args.baselines}"')
+        return 0
+    if regressions:
+        print(f"{len(regressions)} case(s) slower by more than {args.threshold:g}%")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
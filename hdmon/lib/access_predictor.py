@@ -0,0 +1,98 @@
+from array import array
+from typing import Any, Dict, Optional, Tuple
+import datetime
+
+
+_DAY = 24 * 60 * 60
+_DAYS_PER_WEEK = 7
+
+
+class AccessPredictor:
+    """Learns at what time of day and day of week a disk gets accessed.
+
+    The day is split into slots. For every slot there are two scores: one for
+    any day and one for the same day of week. A score is an exponential moving
+    average of whether the slot had an access, so it approximates probability
+    of an access in that slot. An access is expected if any score is high enough.
+    Scores are updated once a day, when the day is over.
+    """
+
+    def __init__(self, *, slot_seconds: int, threshold=0.5, learning_rate=0.3):
+        assert _DAY % slot_seconds == 0
+        self._slot_seconds = slot_seconds
+        self._slots_per_day = _DAY // slot_seconds
+        self._threshold = threshold
+        self._learning_rate = learning_rate
+        self._daily_scores = array("f", [0.0]) * self._slots_per_day
+        self._weekly_scores = array("f", [0.0]) * (self._slots_per_day * _DAYS_PER_WEEK)
+        self._accesses_today = array("b", [0]) * self._slots_per_day
+        self._today: Optional[int] = None  # day ordinal
+
+    @property
+    def slot_seconds(self) -> int:
+        return self._slot_seconds
+
+    def record_access(self, timestamp: float):
+        day, _weekday, slot = self._locate(timestamp)
+        self._start_day(day)
+        self._accesses_today[slot] = 1
+
+    def is_access_expected(self, timestamp: float) -> bool:
+        day, weekday, slot = self._locate(timestamp)
+        self._start_day(day)
+        return (
+            self._daily_scores[slot] >= self._threshold
+            or self._weekly_scores[weekday * self._slots_per_day + slot]
+            >= self._threshold
+        )
+
+    def _locate(self, timestamp: float) -> Tuple[int, int, int]:
+        moment = datetime.datetime.fromtimestamp(timestamp)
+        seconds = moment.hour * 3600 + moment.minute * 60 + moment.second
+        return (
+            moment.toordinal(),
+            moment.weekday(),
+            seconds // self._slot_seconds,
+        )
+
+    def _start_day(self, day: int):
+        if self._today is None:
+            self._today = day
+        if day <= self._today:
+            return
+        self._learn_day(self._today)
+        self._accesses_today = array("b", [0]) * self._slots_per_day
+        # Days without accesses teach as well, but a week of them is enough
+        # to forget everything that can be forgotten.
+        for past_day in range(max(self._today + 1, day - _DAYS_PER_WEEK), day):
+            self._learn_day(past_day)
+        self._today = day
+
+    def _learn_day(self, day: int):
+        weekday = datetime.date.fromordinal(day).weekday()
+        weekly_offset = weekday * self._slots_per_day
+        rate = self._learning_rate
+        for slot, accessed in enumerate(self._accesses_today):
+            self._daily_scores[slot] += rate * (accessed - self._daily_scores[slot])
+            weekly_slot = weekly_offset + slot
+            self._weekly_scores[weekly_slot] += rate * (
+                accessed - self._weekly_scores[weekly_slot]
+            )
+
+    def to_state(self) -> Dict[str, Any]:
+        return {
+            "slot_seconds": self._slot_seconds,
+            "today": self._today,
+            "accesses_today": list(self._accesses_today),
+            "daily_scores": list(self._daily_scores),
+            "weekly_scores": list(self._weekly_scores),
+        }
+
+    def load_state(self, state: Dict[str, Any]):
+        """Ignores the state if it has been saved with different slots"""
+        if state["slot_seconds"] != self._slot_seconds:
+            return
+        self._today = state["today"]
+        self._accesses_today = array("b", state["accesses_today"])
+        self._daily_scores = array("f", state["daily_scores"])
+        self._weekly_scores = array("f", state["weekly_scores"])
@@ -0,0 +1,89 @@
+from dataclasses import dataclass, fields
+from typing import Any, Dict, Optional
+
+from .disk_stats import DiskCounters
+from .error_handling import ConfigurationError
+
+
+_SHORTHANDS = {
+    "min_sectors": ["min_sectors_read", "min_sectors_written"],
+    "samples": ["busy_samples", "idle_samples"],
+}
+
+
+@dataclass(frozen=True)
+class ActivityRules:
+    """Decides whether a disk is busy or idle.
+
+    A poll counts as busy if at least min_sectors_read sectors were read or
+    at least min_sectors_written sectors were written since the previous poll.
+    With use_in_flight a poll that finds requests in flight is busy too, e.g.
+    a long flush or a request the disk takes minutes to complete. With
+    use_io_ticks any time spent doing I/O since the previous poll is busy.
+    The disk changes its state only after busy_samples (idle_samples) consecutive
+    polls disagree with the current state.
+
+    Rules are hashable, disks that share rules share their state.
+    """
+
+    min_sectors_read: int = 1
+    min_sectors_written: int = 1
+    busy_samples: int = 1
+    idle_samples: int = 1
+    use_in_flight: bool = False
+    use_io_ticks: bool = False
+
+    def is_busy_sample(self, previous: DiskCounters, current: DiskCounters) -> bool:
+        sectors_read = current.sectors_read - previous.sectors_read
+        sectors_written = current.sectors_written - previous.sectors_written
+        return (
+            # Counters went back, something has happened to the disk
+            sectors_read < 0
+            or sectors_written < 0
+            or sectors_read >= self.min_sectors_read
+            or sectors_written >= self.min_sectors_written
+            or (self.use_in_flight and current.in_flight > 0)
+            or (self.use_io_ticks and current.io_ticks != previous.io_ticks)
+        )
+
+    def samples_to_change_state(self, is_idle: bool) -> int:
+        return self.busy_samples if is_idle else self.idle_samples
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]]) -> "ActivityRules":
+        """Creates rules from the "activity" section of a profile.
+
+        "min_sectors" sets both read and write thresholds, "samples" sets both
+        busy and idle hysteresis, specific keys override them.
+        """
+        if not config:
+            return DEFAULT_ACTIVITY_RULES
+
+        flags = {field.name for field in fields(cls) if field.type is bool}
+        known_keys = {field.name for field in fields(cls)} | set(_SHORTHANDS)
+        for key, value in config.items():
+            if key not in known_keys:
+                raise ConfigurationError(f'Unknown activity rule "{key}"')
+            if key in flags:
+                if not isinstance(value, bool):
+                    raise ConfigurationError(
+                        f'Activity rule "{key}" should be true or false, got "{value}"'
+                    )
+                continue
+            if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+                raise ConfigurationError(
+                    f'Activity rule "{key}" should be a positive integer, got "{value}"'
+                )
+
+        values = {}
+        for shorthand, keys in _SHORTHANDS.items():
+            if shorthand in config:
+                values.update(dict.fromkeys(keys, config[shorthand]))
+        values.update(
+            (key, value) for key, value in config.items() if key not in _SHORTHANDS
+        )
+        return cls(**values)
+
+
+# Any read or write makes a disk busy
+DEFAULT_ACTIVITY_RULES = ActivityRules()
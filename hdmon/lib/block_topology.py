@@ -0,0 +1,143 @@
+from typing import Dict, FrozenSet, List, Optional, Set
+import os
+import re
+
+from .logger import LOGGER as logger
+
+
+_SYSFS_BLOCK_PATH = "/sys/block"
+_SCSI_HOST = re.compile(r"host\d+")
+# Bus number and port path, e.g. 2-1 or 2-1.4, but not interfaces like 2-1:1.0
+_USB_DEVICE = re.compile(r"\d+-\d+(?:\.\d+)*")
+
+
+class BlockTopology:
+    """Knows which disks are members of md arrays and device mapper devices.
+
+    An array is an md device or a device mapper device that spans several disks.
+    A disk that belongs to an array should follow the activity of the array,
+    because I/O to the array goes to all members. If the disk belongs to several
+    unrelated arrays it is tracked on its own.
+
+    Disks behind the same USB device, e.g. bays of a USB enclosure behind one
+    bridge, belong to the same enclosure. Disks on other SCSI hosts, like
+    SATA and SAS controllers, are spun up on their own and belong to none.
+
+    Reading sysfs is relatively slow, so the topology is cached until refresh
+    is called on hotplug.
+    """
+
+    def __init__(self, sysfs_block_path: str = _SYSFS_BLOCK_PATH):
+        self._sysfs_block_path = sysfs_block_path
+        self._activity_devices: Dict[str, str] = {}
+        self._members: Dict[str, FrozenSet[str]] = {}
+        self._enclosures: Dict[str, str] = {}
+
+    def activity_device(self, device_name: str) -> str:
+        """Returns the device whose activity should be followed for the disk"""
+        return self._activity_devices.get(device_name, device_name)
+
+    def members(self, device_name: str) -> FrozenSet[str]:
+        """Returns disks of the array or the disk itself"""
+        return self._members.get(device_name, frozenset([device_name]))
+
+    def enclosure(self, device_name: str) -> Optional[str]:
+        """Returns sysfs path of the USB device of the disk, None if it has none"""
+        return self._enclosures.get(device_name)
+
+    def refresh(self):
+        try:
+            devices = os.listdir(self._sysfs_block_path)
+        except OSError as error:
+            logger.warning("Cannot read block device topology: %s", error)
+            return
+
+        disk_by_partition = {}
+        slaves: Dict[str, List[str]] = {}
+        for device in devices:
+            device_path = os.path.join(self._sysfs_block_path, device)
+            for entry in self._list_dir(device_path):
+                if os.path.exists(os.path.join(device_path, entry, "partition")):
+                    disk_by_partition[entry] = device
+            slaves[device] = self._list_dir(os.path.join(device_path, "slaves"))
+
+        def find_disks(device: str, seen: Set[str]) -> Set[str]:
+            device = disk_by_partition.get(device, device)
+            if device in seen:
+                return set()
+            seen.add(device)
+            if not slaves.get(device):
+                return {device}
+            disks = set()
+            for slave in slaves[device]:
+                disks |= find_disks(slave, seen)
+            return disks
+
+        def find_lower_devices(device: str) -> Set[str]:
+            lower_devices = set()
+            for slave in slaves.get(device, []):
+                slave = disk_by_partition.get(slave, slave)
+                lower_devices |= {slave} | find_lower_devices(slave)
+            return lower_devices
+
+        self._enclosures = {}
+        for device in devices:
+            enclosure = self._find_usb_device(
+                os.path.join(self._sysfs_block_path, device)
+            )
+            if enclosure is not None:
+                self._enclosures[device] = enclosure
+
+        self._members = {}
+        for device in devices:
+            if not slaves[device]:
+                continue
+            disks = frozenset(find_disks(device, set()))
+            is_md = os.path.isdir(os.path.join(self._sysfs_block_path, device, "md"))
+            if is_md or len(disks) > 1:
+                self._members[device] = disks
+
+        arrays_by_disk: Dict[str, Set[str]] = {}
+        for array, disks in self._members.items():
+            for disk in disks:
+                arrays_by_disk.setdefault(disk, set()).add(array)
+
+        self._activity_devices = {}
+        for disk, arrays in arrays_by_disk.items():
+            # I/O to a stacked device passes through the devices below it
+            lowest_arrays = [
+                array for array in arrays if not (find_lower_devices(array) & arrays)
+            ]
+            if len(lowest_arrays) == 1:
+                self._activity_devices[disk] = lowest_arrays[0]
+            else:
+                logger.info(
+                    "%s belongs to %s, tracking it separately",
+                    disk,
+                    ", ".join(sorted(lowest_arrays)),
+                )
+
+    @staticmethod
+    def _find_usb_device(device_path: str) -> Optional[str]:
+        """Returns the USB device nearest above the SCSI host of the disk"""
+        # E.g. /sys/devices/pci0000:00/0000:00:14.0/usb2/2-1/2-1:1.0/host6/
+        # target6:0:0/6:0:0:0/block/sdb
+        parts = os.path.realpath(device_path).split(os.sep)
+        is_above_scsi_host = False
+        for index in reversed(range(len(parts))):
+            if _SCSI_HOST.fullmatch(parts[index]):
+                is_above_scsi_host = True
+            elif is_above_scsi_host and _USB_DEVICE.fullmatch(parts[index]):
+                return os.sep.join(parts[: index + 1])
+        return None
+
+    @staticmethod
+    def _list_dir(path: str) -> List[str]:
+        try:
+            return sorted(
+                entry
+                for entry in os.listdir(path)
+                if os.path.isdir(os.path.join(path, entry))
+            )
+        except OSError:
+            return []
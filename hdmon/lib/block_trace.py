@@ -0,0 +1,236 @@
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+import os
+import re
+import threading
+
+from .error_handling import log_exceptions
+from .logger import LOGGER as logger
+from .scheduler import Scheduler
+
+
+_TRACEFS_PATHS = ("/sys/kernel/tracing", "/sys/kernel/debug/tracing")
+_SYSFS_BLOCK_PATH = "/sys/block"
+_INSTANCE_NAME = "hdmon"
+_EVENTS = ("block_rq_issue", "block_rq_complete")
+# Per CPU, events of idle disks are rare
+_BUFFER_SIZE_KB = 256
+# Events that follow a delivered one are delivered together
+_DELIVERY_INTERVAL = 1.0
+
+# E.g. "kworker/1:1-12 [001] ..... 1234.567890: block_rq_issue: 8,0 W 4096 () 2048 + 8 [dd]"
+_EVENT = re.compile(
+    r" (\d+\.\d+): (block_rq_issue|block_rq_complete): (\d+),(\d+) (\S+) .*? \+ (\d+) "
+)
+
+
+class BlockIoObserver(ABC):
+    @abstractmethod
+    def on_block_io(
+        self,
+        device_name: str,
+        last_io_time: float,
+        sectors_read: int,
+        sectors_written: int,
+    ):
+        """Called in the scheduler thread, shouldn't raise exceptions.
+
+        last_io_time is time.monotonic() of the last traced event, sectors
+        are issued since the previous call.
+        """
+        raise NotImplementedError()
+
+
+class _DiskIo(NamedTuple):
+    last_io_time: float
+    sectors_read: int
+    sectors_written: int
+
+
+class BlockTraceSource:
+    """Reports block I/O of disks as it happens.
+
+    Reads block_rq_issue and block_rq_complete tracepoints from a tracefs
+    instance of its own. Events are filtered in the kernel by device numbers,
+    so other disks cost nothing. The trace clock is CLOCK_MONOTONIC, which
+    makes timestamps comparable with time.monotonic().
+
+    The first event after a quiet period is delivered right away, following
+    events are delivered at most once per second. Requires root, start
+    returns False if tracing is unavailable, polls still work then.
+    """
+
+    def __init__(
+        self,
+        *,
+        scheduler: Scheduler,
+        observer: BlockIoObserver,
+        tracefs_paths: Iterable[str] = _TRACEFS_PATHS,
+        sysfs_block_path: str = _SYSFS_BLOCK_PATH,
+    ):
+        self._scheduler = scheduler
+        self._observers: List[BlockIoObserver] = [observer]
+        self._tracefs_paths = list(tracefs_paths)
+        self._sysfs_block_path = sysfs_block_path
+        self._instance_path: Optional[str] = None
+        # Reported names by "major,minor"
+        self._device_names: Dict[str, Tuple[str, ...]] = {}
+        self._lock = threading.Lock()
+        self._pending: Dict[str, _DiskIo] = {}
+        self._is_delivery_scheduled = False
+
+    def add_observer(self, observer: BlockIoObserver):
+        self._observers.append(observer)
+
+    def start(self) -> bool:
+        """Returns False if tracing is unavailable"""
+        for tracefs_path in self._tracefs_paths:
+            instances_path = os.path.join(tracefs_path, "instances")
+            if os.path.isdir(instances_path):
+                break
+        else:
+            logger.warning("tracefs is not mounted, block I/O won't be traced")
+            return False
+        instance_path = os.path.join(instances_path, _INSTANCE_NAME)
+        try:
+            os.makedirs(instance_path, exist_ok=True)
+            _write(os.path.join(instance_path, "trace_clock"), "mono")
+            _write(os.path.join(instance_path, "buffer_size_kb"), str(_BUFFER_SIZE_KB))
+            trace_pipe = open(os.path.join(instance_path, "trace_pipe"))
+        except OSError as error:
+            logger.warning("Cannot trace block I/O: %s", error)
+            return False
+        self._instance_path = instance_path
+        self._apply_filter()
+        threading.Thread(
+            target=self._read, args=(trace_pipe,), name="block_trace", daemon=True
+        ).start()
+        logger.info("Tracing block I/O")
+        return True
+
+    def stop(self):
+        if self._instance_path is None:
+            return
+        self._set_events_enabled(False)
+        try:
+            os.rmdir(self._instance_path)
+        except OSError:  # the reader still has trace_pipe open
+            pass
+        self._instance_path = None
+
+    def set_device_names(
+        self,
+        device_names: Iterable[str],
+        activity_device_names: Optional[Dict[str, str]] = None,
+    ):
+        """Limits tracing to the disks, partitions are traced as their disks.
+
+        I/O of a disk is also reported for its activity device from
+        activity_device_names, e.g. the md array it belongs to. Arrays don't
+        issue requests of their own, only their members do.
+        """
+        activity_device_names = activity_device_names or {}
+        names_by_number = {}
+        for device_name in device_names:
+            device_number = _read_device_number(
+                os.path.join(self._sysfs_block_path, device_name, "dev")
+            )
+            if device_number is None:
+                continue
+            activity_device_name = activity_device_names.get(device_name)
+            names_by_number[device_number] = (
+                (device_name,)
+                if activity_device_name in (None, device_name)
+                else (device_name, activity_device_name)
+            )
+        # Replaced at once, the reader thread uses it
+        self._device_names = names_by_number
+        if self._instance_path is not None:
+            self._apply_filter()
+
+    def _apply_filter(self):
+        # The kernel keeps dev_t as major << 20 | minor
+        conditions = []
+        for device_number in sorted(self._device_names):
+            major, minor = device_number.split(",")
+            conditions.append(f"dev == {int(major) << 20 | int(minor)}")
+        if not conditions:
+            self._set_events_enabled(False)
+            return
+        try:
+            for event in _EVENTS:
+                _write(self._event_path(event, "filter"), " || ".join(conditions))
+        except OSError as error:
+            logger.warning("Cannot filter block I/O events: %s", error)
+        self._set_events_enabled(True)
+
+    def _set_events_enabled(self, is_enabled: bool):
+        try:
+            for event in _EVENTS:
+                _write(self._event_path(event, "enable"), "1" if is_enabled else "0")
+        except OSError as error:
+            logger.warning("Cannot enable block I/O events: %s", error)
+
+    def _event_path(self, event: str, name: str) -> str:
+        return os.path.join(self._instance_path, "events", "block", event, name)
+
+    @log_exceptions
+    def _read(self, trace_pipe):
+        """Runs in the reader thread"""
+        with trace_pipe:
+            for line in trace_pipe:
+                self._on_line(line)
+
+    def _on_line(self, line: str):
+        match = _EVENT.search(line)
+        if match is None:
+            return
+        timestamp, event, major, minor, rwbs, sectors = match.groups()
+        device_names = self._device_names.get(f"{major},{minor}")
+        if device_names is None:
+            return
+        # Sectors are counted once, when requests are issued
+        sectors = int(sectors) if event == "block_rq_issue" else 0
+        sectors_read = sectors if "R" in rwbs else 0
+        sectors_written = sectors if "W" in rwbs else 0
+        with self._lock:
+            for device_name in device_names:
+                previous = self._pending.get(device_name)
+                self._pending[device_name] = _DiskIo(
+                    last_io_time=float(timestamp),
+                    sectors_read=(previous.sectors_read if previous else 0)
+                    + sectors_read,
+                    sectors_written=(previous.sectors_written if previous else 0)
+                    + sectors_written,
+                )
+            if self._is_delivery_scheduled:
+                return
+            self._is_delivery_scheduled = True
+        self._scheduler.call_soon_threadsafe(self._deliver)
+
+    @log_exceptions
+    def _deliver(self):
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+            if not pending:
+                self._is_delivery_scheduled = False
+                return
+        for device_name, disk_io in pending.items():
+            for observer in self._observers:
+                observer.on_block_io(device_name, *disk_io)
+        self._scheduler.set_timer(_DELIVERY_INTERVAL, self._deliver)
+
+
+def _read_device_number(path: str) -> Optional[str]:
+    """Returns "major,minor" as they appear in trace events"""
+    try:
+        with open(path) as fh:
+            return fh.read().strip().replace(":", ",")
+    except OSError:
+        return None
+
+
+def _write(path: str, value: str):
+    with open(path, "w") as fh:
+        fh.write(value)
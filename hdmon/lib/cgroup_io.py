@@ -0,0 +1,89 @@
+from typing import Dict, List, Optional, Tuple
+import os
+
+from .logger import LOGGER as logger
+
+
+_CGROUP_ROOT = "/sys/fs/cgroup"
+
+# Bytes read and written by cgroup path relative to the root
+_CgroupBytes = Dict[str, int]
+
+
+class CgroupIoSampler:
+    """Finds cgroups that did I/O to a disk.
+
+    Reads io.stat across the cgroup v2 hierarchy. Stats of a cgroup include
+    stats of its descendants, so the contribution of a cgroup is its delta
+    minus deltas of its children. Walking the hierarchy is relatively slow and
+    should be done on disk state transitions only.
+    """
+
+    def __init__(self, device_number: str, cgroup_root: str = _CGROUP_ROOT):
+        self._device_prefix = device_number + " "
+        self._cgroup_root = cgroup_root
+        self._baseline: Optional[_CgroupBytes] = None
+
+    def take_baseline(self):
+        self._baseline = self._read_io_stats()
+
+    def find_top_contributors(self, count: int) -> List[Tuple[str, int]]:
+        """Returns cgroups that did most I/O since the baseline and their bytes.
+
+        The current stats become the new baseline.
+        """
+        current = self._read_io_stats()
+        baseline, self._baseline = self._baseline, current
+        if baseline is None:
+            return []
+
+        deltas = {
+            cgroup: current_bytes - baseline.get(cgroup, 0)
+            for cgroup, current_bytes in current.items()
+        }
+        contributions = dict(deltas)
+        for cgroup, delta in deltas.items():
+            parent = os.path.dirname(cgroup)
+            if cgroup and parent in contributions:
+                contributions[parent] -= delta
+        top = sorted(
+            (
+                (cgroup or "/", contribution)
+                for cgroup, contribution in contributions.items()
+                if contribution > 0
+            ),
+            key=lambda item: item[1],
+            reverse=True,
+        )
+        return top[:count]
+
+    def _read_io_stats(self) -> _CgroupBytes:
+        stats = {}
+        for directory, _subdirectories, files in os.walk(self._cgroup_root):
+            if "io.stat" not in files:
+                continue
+            try:
+                with open(os.path.join(directory, "io.stat")) as fh:
+                    for line in fh:
+                        if line.startswith(self._device_prefix):
+                            cgroup = os.path.relpath(directory, self._cgroup_root)
+                            stats["" if cgroup == "." else cgroup] = _parse_bytes(line)
+                            break
+            except OSError as error:  # the cgroup is gone
+                logger.debug("Cannot read io.stat in %s: %s", directory, error)
+        return stats
+
+
+def _parse_bytes(line: str) -> int:
+    # 8:16 rbytes=1459200 wbytes=314773504 rios=192 wios=353 dbytes=0 dios=0
+    total = 0
+    for field in line.split()[1:]:
+        key, _separator, value = field.partition("=")
+        if key in ("rbytes", "wbytes"):
+            total += int(value)
+    return total
+
+
+def device_number(disk_path: str) -> str:
+    rdev = os.stat(disk_path).st_rdev
+    return f"{os.major(rdev)}:{os.minor(rdev)}"
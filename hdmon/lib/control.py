@@ -0,0 +1,107 @@
+from concurrent.futures import Future
+from typing import Any, Callable, Dict
+import json
+import os
+import socket
+import threading
+
+from .error_handling import Error
+from .logger import LOGGER as logger, log_current_exception
+from .scheduler import Scheduler
+
+
+Request = Dict[str, Any]
+Handler = Callable[[Request], Any]  # Runs in a connection thread
+
+_MAX_MESSAGE_SIZE = 1024 * 1024
+
+
+class ControlServer:
+    """Serves commands over a Unix socket.
+
+    Every request and response is a single line of JSON. Every connection is
+    served by its own thread, so a slow command doesn't block the service.
+    Handlers should use call_in_scheduler to access service state.
+    """
+
+    def __init__(self, path: str, handlers: Dict[str, Handler]):
+        self._path = path
+        self._handlers = handlers
+        self._socket = None
+
+    def start(self):
+        os.makedirs(os.path.dirname(self._path), exist_ok=True)
+        try:
+            os.remove(self._path)
+        except FileNotFoundError:
+            pass
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.bind(self._path)
+        os.chmod(self._path, 0o600)
+        self._socket.listen()
+        threading.Thread(target=self._accept, name="control", daemon=True).start()
+        logger.debug('Listening on "%s"', self._path)
+
+    def stop(self):
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+    def _accept(self):
+        while True:
+            try:
+                connection, _address = self._socket.accept()
+            except OSError:  # the socket is closed
+                return
+            threading.Thread(
+                target=self._serve, args=(connection,), name="control", daemon=True
+            ).start()
+
+    def _serve(self, connection: socket.socket):
+        with connection, connection.makefile("rwb") as fh:
+            try:
+                request = json.loads(fh.readline(_MAX_MESSAGE_SIZE))
+                response = {"result": self._handle(request)}
+            except Error as error:
+                response = {"error": str(error)}
+            except Exception as error:
+                log_current_exception()
+                response = {"error": f"Internal error: {error}"}
+            fh.write(json.dumps(response).encode() + b"\n")
+
+    def _handle(self, request: Request) -> Any:
+        command = request.get("command")
+        handler = self._handlers.get(command)
+        if handler is None:
+            raise Error(f'Unknown command "{command}"')
+        return handler(request)
+
+
+def call_in_scheduler(scheduler: Scheduler, function: Callable[[], Any]) -> Any:
+    """Runs the function in the scheduler thread, waits for its result"""
+    future = Future()
+
+    def callback():
+        try:
+            future.set_result(function())
+        except BaseException as error:
+            future.set_exception(error)
+
+    scheduler.call_soon_threadsafe(callback)
+    return future.result()
+
+
+def send_request(path: str, request: Request) -> Any:
+    """Sends the request to the service, returns the result"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.connect(path)
+        except OSError as error:
+            raise Error(f'Cannot connect to hdmon at "{path}": {error}')
+        with client.makefile("rwb") as fh:
+            fh.write(json.dumps(request).encode() + b"\n")
+            fh.flush()
+            response = json.loads(fh.readline(_MAX_MESSAGE_SIZE))
+    if "error" in response:
+        raise Error(response["error"])
+    return response["result"]
@@ -1,13 +1,16 @@
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
-from typing import Dict, List, Iterable
+from dataclasses import dataclass, field
+from typing import Dict, List, Iterable, NamedTuple, Optional
 import collections
+import time
 
+from .activity_rules import ActivityRules, DEFAULT_ACTIVITY_RULES
+from .block_trace import BlockIoObserver
 from .disk_presence_monitor import DiskPresenceObserver
-from .disk_stats import DiskCounters, DeviceNameAndCounters
+from .disk_stats import DiskCounters, DeviceNameAndCounters, SECTOR_SIZE
 from .disk_stats_monitor import DiskStatsObserver
 from .error_handling import log_exceptions
-from .logger import LOGGER as logger
+from .logger import LOGGER as logger, log_current_exception
 
 
 class DiskActivityObserver(ABC):
@@ -27,28 +30,137 @@ class DiskActivityObserver(ABC):
         raise NotImplementedError()
 
 
+class DiskSnapshot(NamedTuple):
+    """What happened to a disk since the previous poll, shared by all observers"""
+
+    device_name: str
+    interval: float  # seconds since the previous poll
+    counters: DiskCounters
+    # Differences of counters, in_flight is a gauge and keeps its current value
+    deltas: DiskCounters
+    read_bytes_per_second: float
+    written_bytes_per_second: float
+    utilisation: float  # share of the interval the disk was doing I/O
+
+
+class DiskPollObserver(ABC):
+    @abstractmethod
+    def on_poll(self, snapshot: DiskSnapshot):
+        """Called after every poll, shouldn't raise exceptions"""
+        raise NotImplementedError()
+
+
 _ActivityObserverList = List[DiskActivityObserver]
-_ActivityObserverMap = Dict[str, _ActivityObserverList]
+_ActivityObserverMap = Dict[str, Dict[ActivityRules, _ActivityObserverList]]
+
+
+@dataclass
+class _Activity:
+    is_idle: bool = False
+    # Number of consecutive samples that disagree with is_idle
+    contrary_samples: int = 0
 
 
 @dataclass
 class _Disk:
-    counters: DiskCounters
-    is_idle: bool
+    counters: Optional[DiskCounters]  # None until the next poll after a rename
+    polled_at: float
+    activities: Dict[ActivityRules, _Activity] = field(default_factory=dict)
+    # I/O done by hdmon itself that shouldn't count as activity
+    ignored_sectors_read: int = 0
+    ignored_sectors_written: int = 0
+    ignored_polls_left: int = 0
+    # Known if block I/O is traced
+    last_io_time: Optional[float] = None
+    traced_sectors_read: int = 0  # since the previous poll
+    traced_sectors_written: int = 0
 
 
-class DiskActivityMonitor(DiskStatsObserver, DiskPresenceObserver):
+class DiskActivityMonitor(DiskStatsObserver, DiskPresenceObserver, BlockIoObserver):
     def __init__(self):
-        self._observers: _ActivityObserverMap = collections.defaultdict(list)
+        self._observers: _ActivityObserverMap = collections.defaultdict(dict)
+        self._poll_observers: Dict[str, List[DiskPollObserver]] = {}
         self._disks: Dict[str, _Disk] = {}
+        # Activity of every disk is tracked for every known set of rules
+        self._rules: Dict[ActivityRules, None] = {DEFAULT_ACTIVITY_RULES: None}
+
+    def add_observer(
+        self,
+        device_name: str,
+        observer: DiskActivityObserver,
+        rules: ActivityRules = DEFAULT_ACTIVITY_RULES,
+    ):
+        if rules not in self._rules:
+            self._rules[rules] = None
+            for disk in self._disks.values():
+                disk.activities[rules] = _Activity()
 
-    def add_observer(self, device_name: str, observer: DiskActivityObserver):
-        self._observers[device_name].append(observer)
+        observers = self._observers[device_name].setdefault(rules, [])
+        observers.append(observer)
         disk = self._disks.get(device_name)
         if disk is not None:
-            if len(self._observers[device_name]) == 1:  # first observer?
-                self._log_disk_is_idle(device_name, disk.is_idle)
-            self._notify(observer, disk.is_idle)
+            is_idle = disk.activities[rules].is_idle
+            if len(observers) == 1:  # first observer?
+                self._log_disk_is_idle(device_name, is_idle)
+            self._notify(observer, is_idle)
+
+    def add_poll_observer(self, device_name: str, observer: DiskPollObserver):
+        """Snapshots are only taken for disks that have poll observers"""
+        self._poll_observers.setdefault(device_name, []).append(observer)
+
+    def remove_observer(self, device_name: str, observer: DiskActivityObserver):
+        """Doesn't notify the observer"""
+        for observers in self._observers.get(device_name, {}).values():
+            if observer in observers:
+                observers.remove(observer)
+        poll_observers = self._poll_observers.get(device_name, [])
+        if observer in poll_observers:
+            poll_observers.remove(observer)
+            if not poll_observers:
+                del self._poll_observers[device_name]
+
+    def is_idle(
+        self, device_name: str, rules: ActivityRules = DEFAULT_ACTIVITY_RULES
+    ) -> Optional[bool]:
+        """Returns None if the disk hasn't been polled yet"""
+        disk = self._disks.get(device_name)
+        if disk is None or rules not in disk.activities:
+            return None
+        return disk.activities[rules].is_idle
+
+    def last_io_time(self, device_name: str) -> Optional[float]:
+        """Returns time.monotonic() of the last I/O if block I/O is traced"""
+        disk = self._disks.get(device_name)
+        return None if disk is None else disk.last_io_time
+
+    def mark_active(self, device_name: str):
+        """Makes the disk busy for all rules without waiting for the next poll"""
+        disk = self._disks.get(device_name)
+        if disk is None:
+            return
+        for rules, activity in disk.activities.items():
+            activity.contrary_samples = 0
+            if not activity.is_idle:
+                continue
+            activity.is_idle = False
+            self._notify_observers(device_name, rules, is_idle=False)
+
+    def ignore_sectors_read(self, device_name: str, sectors: int):
+        """Makes next polls ignore sectors that are about to be read by hdmon"""
+        disk = self._disks.get(device_name)
+        if disk is None:
+            return
+        disk.ignored_sectors_read += sectors
+        # The read can complete after the next poll
+        disk.ignored_polls_left = 2
+
+    def ignore_sectors_written(self, device_name: str, sectors: int):
+        """Makes next polls ignore sectors that have just been written by hdmon"""
+        disk = self._disks.get(device_name)
+        if disk is None:
+            return
+        disk.ignored_sectors_written += sectors
+        disk.ignored_polls_left = 2
 
     @log_exceptions
     def on_disks_added(self, device_names: Iterable[str]):
@@ -58,34 +170,152 @@ class DiskActivityMonitor(DiskStatsObserver, DiskPresenceObserver):
     def on_disks_removed(self, device_names: Iterable[str]):
         for device_name in device_names:
             disk = self._disks.pop(device_name, None)
-            observers = self._observers.pop(device_name, [])
-            for observer in observers:
-                observer.on_disk_removed()
-            if disk and observers:
+            self._poll_observers.pop(device_name, None)
+            observers_by_rules = self._observers.pop(device_name, {})
+            for observers in observers_by_rules.values():
+                for observer in observers:
+                    observer.on_disk_removed()
+            if disk and observers_by_rules:
                 self._log_disk_state(device_name, "offline")
 
+    @log_exceptions
+    def on_disks_renamed(self, new_names: Dict[str, str]):
+        for old_name, new_name in new_names.items():
+            disk = self._disks.pop(old_name, None)
+            if disk is not None:
+                # Activity is kept, counters of the new name start over
+                disk.counters = None
+                self._disks[new_name] = disk
+            poll_observers = self._poll_observers.pop(old_name, [])
+            if poll_observers:
+                self._poll_observers.setdefault(new_name, []).extend(poll_observers)
+            # Observers added for the new name haven't been notified yet
+            added_observers = self._observers.pop(new_name, {})
+            self._observers[new_name] = self._observers.pop(old_name, {})
+            for rules, observers in added_observers.items():
+                for observer in observers:
+                    self.add_observer(new_name, observer, rules)
+
+    @log_exceptions
+    def on_block_io(
+        self,
+        device_name: str,
+        last_io_time: float,
+        sectors_read: int,
+        sectors_written: int,
+    ):
+        disk = self._disks.get(device_name)
+        if disk is None:
+            return
+        disk.last_io_time = max(disk.last_io_time or last_io_time, last_io_time)
+        disk.traced_sectors_read += sectors_read
+        disk.traced_sectors_written += sectors_written
+        # I/O of hdmon itself can't be told apart until the next poll
+        sectors_read = disk.traced_sectors_read - disk.ignored_sectors_read
+        sectors_written = disk.traced_sectors_written - disk.ignored_sectors_written
+        for rules, activity in disk.activities.items():
+            # Rules that need several busy polls wait for polls
+            if not activity.is_idle or rules.busy_samples > 1:
+                continue
+            if (
+                sectors_read >= rules.min_sectors_read
+                or sectors_written >= rules.min_sectors_written
+            ):
+                activity.is_idle = False
+                activity.contrary_samples = 0
+                self._notify_observers(device_name, rules, is_idle=False)
+
     @log_exceptions
     def on_disk_stats_updated(self, disk_stats: Iterable[DeviceNameAndCounters]):
+        now = time.monotonic()
         for device_name, counters in disk_stats:
             disk = self._disks.get(device_name)
             if disk is None:
-                self._disks[device_name] = _Disk(counters=counters, is_idle=False)
+                self._disks[device_name] = _Disk(
+                    counters=counters,
+                    polled_at=now,
+                    activities={rules: _Activity() for rules in self._rules},
+                )
                 continue
 
-            was_idle = disk.is_idle
-            is_idle = self._is_disk_idle(disk.counters, counters)
+            previous_counters = disk.counters
             disk.counters = counters
-            disk.is_idle = is_idle
-            if was_idle == is_idle:
+            disk.traced_sectors_read = 0
+            disk.traced_sectors_written = 0
+            if previous_counters is None:
+                disk.polled_at = now
                 continue
+            poll_observers = self._poll_observers.get(device_name)
+            if poll_observers:
+                snapshot = _take_snapshot(
+                    device_name, previous_counters, counters, now - disk.polled_at
+                )
+                for poll_observer in poll_observers:
+                    # A failing observer mustn't keep others and activity stale
+                    try:
+                        poll_observer.on_poll(snapshot)
+                    except Exception:
+                        log_current_exception()
+            disk.polled_at = now
+            if disk.ignored_polls_left:
+                previous_counters = self._skip_ignored_sectors(
+                    disk, previous_counters, counters
+                )
+            for rules, activity in disk.activities.items():
+                is_busy_sample = rules.is_busy_sample(previous_counters, counters)
+                if self._update_activity(rules, activity, is_busy_sample):
+                    self._notify_observers(device_name, rules, activity.is_idle)
 
-            observers = self._observers.get(device_name, [])
+    def _notify_observers(self, device_name: str, rules: ActivityRules, is_idle: bool):
+        observers = self._observers.get(device_name, {}).get(rules, [])
 
-            if observers:
-                self._log_disk_is_idle(device_name, is_idle)
+        if observers:
+            self._log_disk_is_idle(device_name, is_idle)
+
+        for observer in observers:
+            self._notify(observer, is_idle)
 
-            for observer in observers:
-                self._notify(observer, is_idle)
+    @staticmethod
+    def _skip_ignored_sectors(
+        disk: _Disk, previous: DiskCounters, current: DiskCounters
+    ) -> DiskCounters:
+        sectors_read = min(
+            disk.ignored_sectors_read,
+            max(current.sectors_read - previous.sectors_read, 0),
+        )
+        sectors_written = min(
+            disk.ignored_sectors_written,
+            max(current.sectors_written - previous.sectors_written, 0),
+        )
+        disk.ignored_sectors_read -= sectors_read
+        disk.ignored_sectors_written -= sectors_written
+        disk.ignored_polls_left -= 1
+        if disk.ignored_polls_left == 0:
+            disk.ignored_sectors_read = 0
+            disk.ignored_sectors_written = 0
+        return previous._replace(
+            sectors_read=previous.sectors_read + sectors_read,
+            sectors_written=previous.sectors_written + sectors_written,
+            # Time spent on our own I/O can't be told apart
+            io_ticks=current.io_ticks
+            if sectors_read or sectors_written
+            else previous.io_ticks,
+        )
+
+    @staticmethod
+    def _update_activity(
+        rules: ActivityRules, activity: _Activity, is_busy_sample: bool
+    ) -> bool:
+        """Returns True if the disk state has changed"""
+        if is_busy_sample != activity.is_idle:
+            activity.contrary_samples = 0
+            return False
+        activity.contrary_samples += 1
+        if activity.contrary_samples < rules.samples_to_change_state(activity.is_idle):
+            return False
+        activity.contrary_samples = 0
+        activity.is_idle = not activity.is_idle
+        return True
 
     @staticmethod
     def _notify(observer, is_idle):
@@ -101,9 +331,21 @@ class DiskActivityMonitor(DiskStatsObserver, DiskPresenceObserver):
     def _log_disk_state(device_name, state):
         logger.info("%s is %s", device_name, state)
 
-    @staticmethod
-    def _is_disk_idle(previous: DiskCounters, current: DiskCounters) -> bool:
-        return (
-            previous.sectors_read == current.sectors_read
-            and previous.sectors_written == current.sectors_written
-        )
+
+def _take_snapshot(
+    device_name: str, previous: DiskCounters, current: DiskCounters, interval: float
+) -> DiskSnapshot:
+    deltas = DiskCounters._make(
+        None if value is None else value - previous_value
+        for value, previous_value in zip(current, previous)
+    )._replace(in_flight=current.in_flight)
+    per_second = 1 / interval if interval > 0 else 0.0
+    return DiskSnapshot(
+        device_name=device_name,
+        interval=interval,
+        counters=current,
+        deltas=deltas,
+        read_bytes_per_second=deltas.sectors_read * SECTOR_SIZE * per_second,
+        written_bytes_per_second=deltas.sectors_written * SECTOR_SIZE * per_second,
+        utilisation=min(max(deltas.io_ticks / 1000 * per_second, 0.0), 1.0),
+    )
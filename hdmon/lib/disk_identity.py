@@ -0,0 +1,65 @@
+from typing import Dict, Optional
+import os
+
+
+_SYSFS_BLOCK_PATH = "/sys/block"
+_UDEV_DATA_PATH = "/run/udev/data"
+# Most specific first
+_UDEV_PROPERTIES = ("ID_WWN_WITH_EXTENSION", "ID_WWN", "ID_SERIAL")
+
+
+class DiskIdentityResolver:
+    """Finds identities of disks that don't change when disks are renamed.
+
+    Tries the WWID the kernel reports for SCSI, SATA and NVMe disks first, then
+    WWN and serial number known to udev, e.g. for disks behind USB bridges
+    that don't report a WWID. Reads files every time, callers should cache
+    identities until hotplug.
+    """
+
+    def __init__(
+        self,
+        sysfs_block_path: str = _SYSFS_BLOCK_PATH,
+        udev_data_path: str = _UDEV_DATA_PATH,
+    ):
+        self._sysfs_block_path = sysfs_block_path
+        self._udev_data_path = udev_data_path
+
+    def resolve(self, device_name: str) -> Optional[str]:
+        """Returns None if the disk has no known identity"""
+        device_path = os.path.join(self._sysfs_block_path, device_name)
+        for path in [
+            os.path.join(device_path, "device", "wwid"),
+            os.path.join(device_path, "wwid"),
+        ]:
+            wwid = _read_first_line(path)
+            if wwid:
+                return wwid
+        device_number = _read_first_line(os.path.join(device_path, "dev"))
+        if device_number is None:
+            return None
+        properties = self._read_udev_properties(device_number)
+        for key in _UDEV_PROPERTIES:
+            if properties.get(key):
+                return f"{key}={properties[key]}"
+        return None
+
+    def _read_udev_properties(self, device_number: str) -> Dict[str, str]:
+        properties = {}
+        try:
+            with open(os.path.join(self._udev_data_path, f"b{device_number}")) as fh:
+                for line in fh:
+                    if line.startswith("E:"):
+                        key, _separator, value = line[2:].rstrip("\n").partition("=")
+                        properties[key] = value
+        except OSError:
+            pass
+        return properties
+
+
+def _read_first_line(path: str) -> Optional[str]:
+    try:
+        with open(path) as fh:
+            return fh.readline().strip()
+    except OSError:
+        return None
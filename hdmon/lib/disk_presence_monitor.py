@@ -1,9 +1,11 @@
 from abc import ABC, abstractmethod
-from typing import Dict, List, Iterable
+from typing import Dict, List, Iterable, Optional, Set
 
+from .disk_identity import DiskIdentityResolver
 from .disk_stats import DiskCounters, DeviceNameAndCounters
 from .disk_stats_monitor import DiskStatsObserver
 from .error_handling import log_exceptions
+from .logger import LOGGER as logger
 
 
 class DiskPresenceObserver(ABC):
@@ -17,11 +19,34 @@ class DiskPresenceObserver(ABC):
         """Shouldn't raise exceptions"""
         raise NotImplementedError()
 
+    def on_disks_renamed(self, new_names: Dict[str, str]):
+        """Receives new names by old names, shouldn't raise exceptions.
+
+        Observers that keep state of disks should move it to the new names.
+        """
+        self.on_disks_removed(list(new_names))
+        self.on_disks_added(list(new_names.values()))
+
 
 class DiskPresenceMonitor(DiskStatsObserver):
-    def __init__(self):
+    """Tells when disks are added, removed and renamed.
+
+    Without an identity resolver disks are known by their names only. With it,
+    a disk that disappears while a disk with the same identity appears is
+    renamed, e.g. a USB disk that has reconnected between polls, and counters
+    that went back only mean a replaced disk if its identity has changed.
+    """
+
+    def __init__(self, identity_resolver: Optional[DiskIdentityResolver] = None):
+        self._identity_resolver = identity_resolver
         self._observers: List[DiskPresenceObserver] = []
         self._disks: Dict[str, DiskCounters] = {}
+        # Resolved when disks appear or their counters go back
+        self._identities: Dict[str, Optional[str]] = {}
+
+    def identity(self, device_name: str) -> Optional[str]:
+        """Returns None for unknown disks and disks without a known identity"""
+        return self._identities.get(device_name)
 
     def add_observer(self, observer: DiskPresenceObserver):
         self._observers.append(observer)
@@ -55,21 +80,66 @@ class DiskPresenceMonitor(DiskStatsObserver):
             if (
                 device_name in self._disks
                 and self._is_disk_replaced(self._disks[device_name], counters)
+                and self._has_identity_changed(device_name)
             )
         )
         disks_added = (disks_current - disks_previous) | disks_replaced
         disks_removed = (disks_previous - disks_current) | disks_replaced
+        for device_name in disks_added:
+            self._identities[device_name] = self._resolve_identity(device_name)
+        new_names = self._find_renamed_disks(disks_removed, disks_added)
+        disks_added -= set(new_names.values())
+        disks_removed -= set(new_names)
 
         if disks_removed:
             for device_name in disks_removed:
                 del self._disks[device_name]
+                if device_name not in disks_added:
+                    self._identities.pop(device_name, None)
             for observer in self._observers:
                 observer.on_disks_removed(disks_removed)
+        if new_names:
+            for old_name, new_name in new_names.items():
+                logger.info("%s is now %s", old_name, new_name)
+                del self._disks[old_name]
+                self._identities.pop(old_name, None)
+            for observer in self._observers:
+                observer.on_disks_renamed(new_names)
         if disks_added:
             # Disk are added to self._disks in _update_counters
             for observer in self._observers:
                 observer.on_disks_added(disks_added)
 
+    def _has_identity_changed(self, device_name: str) -> bool:
+        identity = self._identities.get(device_name)
+        if identity is None:
+            return True  # unknown, counters are all there is
+        if self._resolve_identity(device_name) != identity:
+            return True
+        logger.info("Counters of %s went back, but it's the same disk", device_name)
+        return False
+
+    def _find_renamed_disks(
+        self, disks_removed: Set[str], disks_added: Set[str]
+    ) -> Dict[str, str]:
+        """Returns new names by old names"""
+        old_names = {}
+        for device_name in disks_removed:
+            identity = self._identities.get(device_name)
+            if identity is not None and device_name not in disks_added:
+                old_names[identity] = device_name
+        new_names = {}
+        for device_name in disks_added:
+            old_name = old_names.pop(self._identities.get(device_name), None)
+            if old_name is not None:
+                new_names[old_name] = device_name
+        return new_names
+
+    def _resolve_identity(self, device_name: str) -> Optional[str]:
+        if self._identity_resolver is None:
+            return None
+        return self._identity_resolver.resolve(device_name)
+
     def _update_counters(self, disk_stats: Iterable[DeviceNameAndCounters]):
         for device_name, counters in disk_stats:
             self._disks[device_name] = counters
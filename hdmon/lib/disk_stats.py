@@ -1,26 +1,126 @@
-from dataclasses import dataclass
-from typing import Generator, Tuple
+from operator import itemgetter, ne
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
 
 
 _PATH = "/proc/diskstats"
+# diskstats counts 512-byte sectors regardless of the disk
+SECTOR_SIZE = 512
 
 
-@dataclass(frozen=True)
-class DiskCounters:
+class DiskCounters(NamedTuple):
+    """Fields of /proc/diskstats, see Documentation/admin-guide/iostats.rst.
+
+    Sector counters come first, so counters can be created from them alone.
+    Times are in milliseconds. Discard fields appeared in Linux 4.18, flush
+    fields in 5.5, they are None on older kernels.
+    """
+
     sectors_read: int
     sectors_written: int
+    reads_completed: int = 0
+    reads_merged: int = 0
+    read_ticks: int = 0
+    writes_completed: int = 0
+    writes_merged: int = 0
+    write_ticks: int = 0
+    in_flight: int = 0
+    io_ticks: int = 0  # time spent doing I/O, grows with utilisation
+    time_in_queue: int = 0
+    discards_completed: Optional[int] = None
+    discards_merged: Optional[int] = None
+    sectors_discarded: Optional[int] = None
+    discard_ticks: Optional[int] = None
+    flushes_completed: Optional[int] = None
+    flush_ticks: Optional[int] = None
 
 
 DeviceNameAndCounters = Tuple[str, DiskCounters]
 
+# Positions of DiskCounters fields among the values after the device name
+_FIELD_ORDER = (2, 6, 0, 1, 3, 4, 5, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16)
+_VALUE_COUNT = len(_FIELD_ORDER)
+_PADDING = [None] * _VALUE_COUNT
+
+
+class _ParsedCounters:
+    """DiskCounters of a diskstats line that converts other fields on first use.
+
+    Every poll compares sector counters of every disk, other fields are only
+    needed for some disks, so converting all of them up front would make
+    polls slower than when only sector counters were parsed.
+    """
+
+    __slots__ = ("sectors_read", "sectors_written", "_parts", "_counters")
+
+    def __init__(self, parts: List[str]):
+        """Takes all parts of the line, values start after the device name"""
+        self.sectors_read = int(parts[5])
+        self.sectors_written = int(parts[9])
+        self._parts = parts
+        self._counters: Optional[DiskCounters] = None
+
+    def __getattr__(self, name: str):
+        # Other fields and methods of DiskCounters
+        return getattr(self._to_counters(), name)
+
+    def __iter__(self):
+        return iter(self._to_counters())
+
+    def __len__(self) -> int:
+        return _VALUE_COUNT
 
-def iter_disk_stats() -> Generator[DeviceNameAndCounters, None, None]:
-    with open(_PATH) as fh:
-        for line in fh:
-            parts = line.split()
-            device_name = parts[2]
-            counters = DiskCounters(
-                sectors_read=int(parts[5]),
-                sectors_written=int(parts[9]),
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, (tuple, _ParsedCounters)):
+            return NotImplemented
+        return tuple(self) == tuple(other)
+
+    def __hash__(self) -> int:
+        return hash(self._to_counters())
+
+    def __repr__(self) -> str:
+        return repr(self._to_counters())
+
+    def _to_counters(
+        self, new_counters=DiskCounters._make, reorder=itemgetter(*_FIELD_ORDER)
+    ) -> DiskCounters:
+        if self._counters is None:
+            # Avoids Python level loops over fields and keyword arguments
+            values = list(map(int, self._parts[3:]))
+            if len(values) < _VALUE_COUNT:
+                values += _PADDING[len(values) :]
+            self._counters = new_counters(reorder(values))
+        return self._counters
+
+
+# Lines and counters of the previous poll by path, lines of idle disks don't
+# change between polls
+_previous_polls: Dict[str, Tuple[List[str], List[DeviceNameAndCounters]]] = {}
+
+
+def iter_disk_stats(path: str = _PATH) -> Iterator[DeviceNameAndCounters]:
+    """Returns counters that behave like DiskCounters"""
+    with open(path) as fh:
+        lines = fh.read().splitlines()
+    previous_lines, previous_disk_stats = _previous_polls.get(path, ([], []))
+    if len(lines) == len(previous_lines):
+        is_changed = list(map(ne, lines, previous_lines))
+    else:  # disks have been added or removed
+        is_changed = [True]
+    if all(is_changed):
+        disk_stats = list(map(_parse_line, lines))
+    elif any(is_changed):
+        disk_stats = [
+            _parse_line(line) if line_changed else previous
+            for line, line_changed, previous in zip(
+                lines, is_changed, previous_disk_stats
             )
-            yield (device_name, counters)
+        ]
+    else:
+        disk_stats = previous_disk_stats
+    _previous_polls[path] = (lines, disk_stats)
+    return iter(disk_stats)
+
+
+def _parse_line(line: str) -> DeviceNameAndCounters:
+    parts = line.split()
+    return (parts[2], _ParsedCounters(parts))
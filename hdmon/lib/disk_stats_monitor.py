@@ -21,6 +21,10 @@ class DiskStatsMonitor:
         self._observers: List[DiskStatsObserver] = []
         self._set_timer(delay=0)
 
+    @property
+    def polling_interval(self) -> float:
+        return self._POLLING_INTERVAL
+
     def add_observer(self, observer: DiskStatsObserver):
         self._observers.append(observer)
 
@@ -0,0 +1,128 @@
+from dataclasses import replace
+from typing import Dict, Iterable, Optional, Set
+import time
+
+from .disk_activity_monitor import DiskActivityObserver
+from .disk_stats import DeviceNameAndCounters
+from .disk_stats_monitor import DiskStatsObserver
+from .error_handling import log_exceptions
+from .event_history import (
+    EventHistoryWriter,
+    EVENT_ADDED,
+    EVENT_BUSY,
+    EVENT_COMMAND_FAILED,
+    EVENT_IDLE,
+    EVENT_REMOVED,
+    EVENT_SPUN_DOWN,
+)
+from .logger import LOGGER as logger
+from .spin_down_monitor import SpinDownObserver
+from .status_file import (
+    DiskStatus,
+    StatusFileWriter,
+    POWER_STATE_ACTIVE,
+    POWER_STATE_STANDBY,
+)
+
+
+class DiskStatusPublisher(DiskStatsObserver, SpinDownObserver):
+    """Keeps the status file and the event history up to date for monitored disks"""
+
+    def __init__(
+        self, writer: StatusFileWriter, history: Optional[EventHistoryWriter] = None
+    ):
+        self._writer = writer
+        self._history = history
+        self._statuses: Dict[str, DiskStatus] = {}
+        self._device_names: Set[str] = set()
+
+    def add_disk(self, device_name: str) -> DiskActivityObserver:
+        """Returns an observer to add to the disk activity monitor"""
+        self._device_names.add(device_name)
+        self._record(device_name, EVENT_ADDED)
+        self._update(DiskStatus(device_name=device_name))
+        return _DiskActivityObserver(self, device_name)
+
+    def remove_disk(self, device_name: str):
+        if device_name in self._device_names:
+            self._record(device_name, EVENT_REMOVED)
+            self._device_names.remove(device_name)
+        if self._statuses.pop(device_name, None) is not None:
+            self._writer.remove(device_name)
+
+    @log_exceptions
+    def on_disk_stats_updated(self, disk_stats: Iterable[DeviceNameAndCounters]):
+        now = time.time()
+        for device_name, counters in disk_stats:
+            status = self._statuses.get(device_name)
+            if status is not None:
+                self._update(
+                    replace(
+                        status,
+                        updated_at=now,
+                        sectors_read=counters.sectors_read,
+                        sectors_written=counters.sectors_written,
+                    )
+                )
+
+    @log_exceptions
+    def on_disk_spun_down(self, device_name: str):
+        self._record(device_name, EVENT_SPUN_DOWN)
+        status = self._statuses.get(device_name)
+        if status is not None:
+            self._update(
+                replace(
+                    status, power_state=POWER_STATE_STANDBY, spun_down_at=time.time()
+                )
+            )
+
+    @log_exceptions
+    def on_spin_down_failed(self, device_name: str):
+        self._record(device_name, EVENT_COMMAND_FAILED)
+
+    def on_disk_active(self, device_name: str):
+        self._record(device_name, EVENT_BUSY)
+        status = self._statuses.get(device_name)
+        if status is not None:
+            self._update(
+                replace(
+                    status,
+                    is_idle=False,
+                    idle_since=None,
+                    power_state=POWER_STATE_ACTIVE,
+                )
+            )
+
+    def on_disk_idle(self, device_name: str):
+        self._record(device_name, EVENT_IDLE)
+        status = self._statuses.get(device_name)
+        if status is not None:
+            self._update(replace(status, is_idle=True, idle_since=time.time()))
+
+    def _record(self, device_name: str, event_type: int):
+        if self._history is not None and device_name in self._device_names:
+            self._history.append(time.time(), device_name, event_type)
+
+    def _update(self, status: DiskStatus):
+        if self._writer.write(status):
+            self._statuses[status.device_name] = status
+        else:
+            logger.warning("No room for %s in the status file", status.device_name)
+
+
+class _DiskActivityObserver(DiskActivityObserver):
+    def __init__(self, publisher: DiskStatusPublisher, device_name: str):
+        self._publisher = publisher
+        self._device_name = device_name
+
+    @log_exceptions
+    def on_disk_active(self):
+        self._publisher.on_disk_active(self._device_name)
+
+    @log_exceptions
+    def on_disk_idle(self):
+        self._publisher.on_disk_idle(self._device_name)
+
+    @log_exceptions
+    def on_disk_removed(self):
+        pass  # the service removes the disk from the publisher
@@ -0,0 +1,227 @@
+"""
+Fixed-size ring of disk events kept in a memory-mapped file on tmpfs.
+
+The file starts with a header that holds the number of events ever appended,
+events are written to slot number % capacity. An event is written before the
+count is increased, so readers take events whose slots couldn't have been
+reused while they were reading and check every event's sequence number.
+Once the ring is full readers skip the oldest slot, the next event may be
+written there.
+
+The ring is copied to persistent storage from time to time and restored from
+there after a reboot.
+"""
+
+
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, NamedTuple, Optional
+import mmap
+import os
+import shutil
+import statistics
+import struct
+
+from .error_handling import Error
+from .logger import LOGGER as logger
+
+
+HISTORY_FILE_PATH = "/run/hdmon/history"
+PERSISTENT_HISTORY_FILE_PATH = "/var/lib/hdmon/history"
+
+EVENT_BUSY = 1
+EVENT_IDLE = 2
+EVENT_SPUN_DOWN = 3  # a spin-down command has succeeded
+EVENT_ADDED = 4
+EVENT_REMOVED = 5
+EVENT_COMMAND_FAILED = 6  # a spin-down command has failed or timed out
+
+EVENT_NAMES = {
+    EVENT_BUSY: "busy",
+    EVENT_IDLE: "idle",
+    EVENT_SPUN_DOWN: "spun down",
+    EVENT_ADDED: "added",
+    EVENT_REMOVED: "removed",
+    EVENT_COMMAND_FAILED: "command failed",
+}
+
+_MAGIC = b"HDMH"
+_VERSION = 1
+_HEADER = struct.Struct("=4sIIIQ")  # magic, version, record size, capacity, count
+_COUNT_OFFSET = 16
+_COUNT = struct.Struct("=Q")
+# Sequence number (index + 1), timestamp, event type, device name, value
+_RECORD = struct.Struct("=QdB32s7xd")
+_DEFAULT_CAPACITY = 64 * 1024  # 4 MiB
+
+
+class Event(NamedTuple):
+    timestamp: float  # seconds since the epoch
+    device_name: str
+    event_type: int
+    value: float = 0.0  # meaning depends on the event type
+
+
+class EventHistoryWriter:
+    def __init__(
+        self,
+        path: str = HISTORY_FILE_PATH,
+        persistent_path: str = PERSISTENT_HISTORY_FILE_PATH,
+        capacity: int = _DEFAULT_CAPACITY,
+    ):
+        self._path = path
+        self._persistent_path = persistent_path
+        self._capacity = capacity
+        self._mmap: Optional[mmap.mmap] = None
+        self._count = 0
+        self._persisted_count: Optional[int] = None
+        # Encoded once, so that appends don't allocate
+        self._encoded_names: Dict[str, bytes] = {}
+
+    def open(self):
+        """Reuses the ring after a restart, restores it after a reboot"""
+        if not _is_compatible(self._path, self._capacity):
+            os.makedirs(os.path.dirname(self._path), exist_ok=True)
+            temp_path = self._path + ".tmp"
+            if _is_compatible(self._persistent_path, self._capacity):
+                shutil.copyfile(self._persistent_path, temp_path)
+            else:
+                with open(temp_path, "wb") as fh:
+                    fh.write(
+                        _HEADER.pack(_MAGIC, _VERSION, _RECORD.size, self._capacity, 0)
+                    )
+                    fh.truncate(_HEADER.size + _RECORD.size * self._capacity)
+            os.chmod(temp_path, 0o644)
+            os.replace(temp_path, self._path)
+        fd = os.open(self._path, os.O_RDWR)
+        try:
+            self._mmap = mmap.mmap(fd, 0)
+        finally:
+            os.close(fd)
+        (self._count,) = _COUNT.unpack_from(self._mmap, _COUNT_OFFSET)
+
+    def close(self):
+        if self._mmap is not None:
+            self.persist()
+            self._mmap.close()
+            self._mmap = None
+
+    def append(self, timestamp: float, device_name: str, event_type: int, value=0.0):
+        encoded_name = self._encoded_names.get(device_name)
+        if encoded_name is None:
+            encoded_name = self._encoded_names[device_name] = device_name.encode()
+        index = self._count
+        _RECORD.pack_into(
+            self._mmap,
+            _HEADER.size + _RECORD.size * (index % self._capacity),
+            index + 1,
+            timestamp,
+            event_type,
+            encoded_name,
+            value,
+        )
+        self._count = index + 1
+        _COUNT.pack_into(self._mmap, _COUNT_OFFSET, self._count)
+
+    def persist(self):
+        """Does nothing if no events have been appended since the last call"""
+        if self._count == self._persisted_count:
+            return
+        try:
+            os.makedirs(os.path.dirname(self._persistent_path), exist_ok=True)
+            temp_path = self._persistent_path + ".tmp"
+            with open(temp_path, "wb") as fh:
+                fh.write(self._mmap)
+            os.replace(temp_path, self._persistent_path)
+            self._persisted_count = self._count
+        except OSError as error:
+            logger.warning(
+                'Cannot save history to "%s": %s', self._persistent_path, error
+            )
+
+
+def read_events(path: str = HISTORY_FILE_PATH) -> List[Event]:
+    """Returns events from the oldest to the newest"""
+    with open(path, "rb") as fh, mmap.mmap(
+        fh.fileno(), 0, access=mmap.ACCESS_READ
+    ) as buffer:
+        magic, version, record_size, capacity, count = _HEADER.unpack_from(buffer)
+        if magic != _MAGIC or version != _VERSION or record_size != _RECORD.size:
+            raise Error(f'Unsupported history file "{path}"')
+        records = buffer[_HEADER.size : _HEADER.size + record_size * capacity]
+        (count_after_copy,) = _COUNT.unpack_from(buffer, _COUNT_OFFSET)
+
+    events = []
+    # Slots of older events could be reused while they were copied
+    first_index = max(count - capacity, count_after_copy - capacity + 1, 0)
+    for index in range(first_index, count):
+        sequence, timestamp, event_type, device_name, value = _RECORD.unpack_from(
+            records, record_size * (index % capacity)
+        )
+        if sequence != index + 1:
+            continue
+        events.append(
+            Event(timestamp, device_name.rstrip(b"\0").decode(), event_type, value)
+        )
+    return events
+
+
+@dataclass
+class DiskHistorySummary:
+    spin_downs: int = 0
+    hotplug_events: int = 0
+    command_failures: int = 0
+    # Completed idle periods in seconds
+    idle_periods: List[float] = field(default_factory=list)
+
+    @property
+    def median_idle_period(self) -> Optional[float]:
+        return statistics.median(self.idle_periods) if self.idle_periods else None
+
+    @property
+    def mean_idle_period(self) -> Optional[float]:
+        return statistics.mean(self.idle_periods) if self.idle_periods else None
+
+    @property
+    def max_idle_period(self) -> Optional[float]:
+        return max(self.idle_periods) if self.idle_periods else None
+
+
+def summarize(events: Iterable[Event]) -> Dict[str, DiskHistorySummary]:
+    """Counts spin-downs and failed commands, measures idle periods of every disk"""
+    summaries: Dict[str, DiskHistorySummary] = {}
+    idle_since: Dict[str, float] = {}
+    for event in events:
+        summary = summaries.setdefault(event.device_name, DiskHistorySummary())
+        if event.event_type == EVENT_SPUN_DOWN:
+            summary.spin_downs += 1
+        elif event.event_type == EVENT_IDLE:
+            idle_since.setdefault(event.device_name, event.timestamp)
+        elif event.event_type == EVENT_BUSY:
+            started_at = idle_since.pop(event.device_name, None)
+            if started_at is not None:
+                summary.idle_periods.append(event.timestamp - started_at)
+        elif event.event_type == EVENT_COMMAND_FAILED:
+            summary.command_failures += 1
+        elif event.event_type in (EVENT_ADDED, EVENT_REMOVED):
+            summary.hotplug_events += 1
+            idle_since.pop(event.device_name, None)
+    return summaries
+
+
+def _is_compatible(path: str, capacity: int) -> bool:
+    try:
+        with open(path, "rb") as fh:
+            header = fh.read(_HEADER.size)
+            size = os.fstat(fh.fileno()).st_size
+    except OSError:
+        return False
+    if len(header) < _HEADER.size:
+        return False
+    magic, version, record_size, file_capacity, _count = _HEADER.unpack(header)
+    return (
+        magic == _MAGIC
+        and version == _VERSION
+        and record_size == _RECORD.size
+        and file_capacity == capacity
+        and size == _HEADER.size + record_size * capacity
+    )
@@ -0,0 +1,54 @@
+from array import array
+from typing import Any, Dict, List
+import bisect
+import math
+
+
+class LogHistogram:
+    """Constant memory histogram with logarithmically spaced buckets.
+
+    Bucket i counts values in [bounds[i - 1], bounds[i]), the first bucket counts
+    values below min_value and the last one values above max_value.
+    Counts are floats so that old observations can be decayed.
+    """
+
+    def __init__(self, *, min_value: float, max_value: float, buckets_per_doubling=4):
+        assert 0 < min_value < max_value
+        bucket_count = math.ceil(
+            math.log2(max_value / min_value) * buckets_per_doubling
+        )
+        ratio = 2 ** (1 / buckets_per_doubling)
+        self._bounds: List[float] = [
+            min_value * ratio**index for index in range(bucket_count + 1)
+        ]
+        self._counts = array("d", [0.0]) * (len(self._bounds) + 1)
+
+    @property
+    def bounds(self) -> List[float]:
+        return self._bounds
+
+    @property
+    def total(self) -> float:
+        return sum(self._counts)
+
+    def add(self, value: float, weight: float = 1.0):
+        self._counts[bisect.bisect_right(self._bounds, value)] += weight
+
+    def count_above(self, bound_index: int) -> float:
+        """Returns the number of values >= bounds[bound_index]"""
+        return sum(self._counts[bound_index + 1 :])
+
+    def decay(self, factor: float):
+        for index in range(len(self._counts)):
+            self._counts[index] *= factor
+
+    def to_state(self) -> Dict[str, Any]:
+        return {"bounds": self._bounds, "counts": list(self._counts)}
+
+    def load_state(self, state: Dict[str, Any]):
+        """Ignores the state if it has been saved with different bounds"""
+        if len(state["counts"]) == len(self._counts) and all(
+            math.isclose(saved, bound)
+            for saved, bound in zip(state["bounds"], self._bounds)
+        ):
+            self._counts = array("d", state["counts"])
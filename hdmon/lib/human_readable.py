@@ -1,4 +1,5 @@
 _DURATION_UNITS = {
+    "d": 24 * 60 * 60,
     "h": 60 * 60,
     "m": 60,
     "s": 1,
@@ -6,8 +7,31 @@ _DURATION_UNITS = {
 
 
 def duration_to_seconds(value):
-    value = value.strip()
+    value = str(value).strip()
     unit = value[-1].lower()
     if unit in _DURATION_UNITS.keys():
         return float(value[:-1].strip()) * _DURATION_UNITS[unit]
     return float(value)
+
+
+def seconds_to_duration(seconds):
+    seconds = round(seconds)
+    parts = []
+    for unit, unit_seconds in _DURATION_UNITS.items():
+        value, seconds = divmod(seconds, unit_seconds)
+        if value:
+            parts.append(f"{value}{unit}")
+    return " ".join(parts) or "0s"
+
+
+_SIZE_UNITS = ["B", "KiB", "MiB", "GiB", "TiB"]
+
+
+def bytes_to_size(value):
+    for unit in _SIZE_UNITS[:-1]:
+        if abs(value) < 1024:
+            break
+        value /= 1024
+    else:
+        unit = _SIZE_UNITS[-1]
+    return f"{value:.0f} {unit}" if unit == "B" else f"{value:.1f} {unit}"
@@ -0,0 +1,79 @@
+from typing import Any, Dict
+
+from .histogram import LogHistogram
+
+
+_DAY = 24 * 60 * 60
+
+
+class IdleDelayLearner:
+    """Learns how long a disk should be idle before it's spun down.
+
+    A disk is spun up again after every idle gap that is longer than the delay,
+    so the expected number of spin ups per day is the daily rate of such gaps.
+    The learner picks the shortest delay that keeps this rate under the limit.
+    """
+
+    # Don't trust the histogram until it has seen at least one day
+    _MIN_OBSERVATION_TIME = 1 * _DAY
+    # Halve the weight of past observations after that time
+    _HALF_LIFE = 30 * _DAY
+
+    def __init__(
+        self,
+        *,
+        max_spin_ups_per_day: float,
+        min_delay: float,
+        max_delay: float,
+        initial_delay: float,
+    ):
+        self._max_spin_ups_per_day = max_spin_ups_per_day
+        self._max_delay = max_delay
+        self._histogram = LogHistogram(min_value=min_delay, max_value=max_delay)
+        self._observation_time = 0.0
+        self._initial_delay = initial_delay
+        self._delay = initial_delay
+
+    @property
+    def delay(self) -> float:
+        return self._delay
+
+    @property
+    def is_trained(self) -> bool:
+        return self._observation_time >= self._MIN_OBSERVATION_TIME
+
+    def add_observation_time(self, seconds: float):
+        self._observation_time += seconds
+        if self._observation_time > self._HALF_LIFE:
+            self._observation_time /= 2
+            self._histogram.decay(0.5)
+
+    def add_idle_gap(self, seconds: float):
+        self._histogram.add(seconds)
+
+    def update_delay(self) -> bool:
+        """Returns True if the delay has changed"""
+        delay = self._choose_delay() if self.is_trained else self._initial_delay
+        if delay == self._delay:
+            return False
+        self._delay = delay
+        return True
+
+    def _choose_delay(self) -> float:
+        days = self._observation_time / _DAY
+        for index, bound in enumerate(self._histogram.bounds):
+            if self._histogram.count_above(index) / days <= self._max_spin_ups_per_day:
+                return min(bound, self._max_delay)
+        return self._max_delay
+
+    def to_state(self) -> Dict[str, Any]:
+        return {
+            "delay": self._delay,
+            "observation_time": self._observation_time,
+            "histogram": self._histogram.to_state(),
+        }
+
+    def load_state(self, state: Dict[str, Any]):
+        self._observation_time = state["observation_time"]
+        self._histogram.load_state(state["histogram"])
+        self.update_delay()
@@ -0,0 +1,57 @@
+from typing import Dict, List
+import bisect
+import math
+
+
+class LatencyBuckets:
+    """Counts values in buckets whose upper bounds grow by a factor.
+
+    Values above the last bound go to an extra bucket, like +Inf buckets of
+    Prometheus histograms. Unlike histogram.LogHistogram, counts never decay and
+    the sum of values is kept for exporting.
+    """
+
+    def __init__(self, first_bound: float, factor: float = 2, bucket_count: int = 10):
+        self.bounds = [first_bound * factor**index for index in range(bucket_count)]
+        self.counts = [0] * (bucket_count + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def add(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def format_histogram(
+    name: str, help_text: str, histograms: Dict[str, LatencyBuckets]
+) -> List[str]:
+    """Returns lines of Prometheus text format, histograms are labelled by disk"""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for disk, histogram in sorted(histograms.items()):
+        cumulative_count = 0
+        for bound, count in zip(histogram.bounds + [math.inf], histogram.counts):
+            cumulative_count += count
+            lines.append(
+                f'{name}_bucket{{disk="{disk}",le="{_format_value(bound)}"}}'
+                f" {cumulative_count}"
+            )
+        lines.append(f'{name}_sum{{disk="{disk}"}} {_format_value(histogram.sum)}')
+        lines.append(f'{name}_count{{disk="{disk}"}} {histogram.count}')
+    return lines
+
+
+def format_values(
+    name: str, metric_type: str, help_text: str, values: Dict[str, float]
+) -> List[str]:
+    """Returns lines of Prometheus text format, values are labelled by disk"""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+    for disk, value in sorted(values.items()):
+        lines.append(f'{name}{{disk="{disk}"}} {_format_value(value)}')
+    return lines
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return f"{value:g}"
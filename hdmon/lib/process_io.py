@@ -0,0 +1,135 @@
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterator, List, Set, Tuple
+import bisect
+import itertools
+import os
+
+
+_PROC_ROOT = "/proc"
+_MAX_COMMAND_LENGTH = 80
+
+
+@dataclass(frozen=True)
+class ProcessIoBaseline:
+    bytes_by_pid: Dict[int, int]
+    pids: FrozenSet[int]
+
+
+class ProcessIoSampler:
+    """Finds processes that did most I/O.
+
+    /proc/<pid>/io counts bytes a process read from and wrote to all disks,
+    so the result is a hint rather than proof. To bound the work on hosts with
+    many processes at most max_reads io files are read per scan: new processes
+    first, then processes that did I/O recently, then the rest in turns.
+    Processes that weren't read keep their last known counters, processes that
+    haven't been read before the baseline are ignored.
+
+    The sampler can be shared, every user keeps its own baseline.
+    """
+
+    def __init__(self, proc_root: str = _PROC_ROOT, max_reads: int = 500):
+        self._proc_root = proc_root
+        self._max_reads = max_reads
+        # Last known read_bytes + write_bytes
+        self._bytes: Dict[int, int] = {}
+        self._recently_active: Set[int] = set()
+        self._commands: Dict[int, str] = {}
+        self._pids: List[int] = []
+        self._next_pid_index = 0
+
+    def take_baseline(self) -> ProcessIoBaseline:
+        self._scan()
+        return ProcessIoBaseline(
+            bytes_by_pid=dict(self._bytes), pids=frozenset(self._pids)
+        )
+
+    def find_top_contributors(
+        self, baseline: ProcessIoBaseline, count: int
+    ) -> List[Tuple[int, str, int]]:
+        """Returns pids, commands and bytes of top processes since the baseline"""
+        self._scan()
+        deltas = []
+        for pid, current_bytes in self._bytes.items():
+            baseline_bytes = baseline.bytes_by_pid.get(pid)
+            if baseline_bytes is None:
+                if pid in baseline.pids:
+                    continue  # the baseline is unknown
+                baseline_bytes = 0
+            # The pid has been reused if its counters went back
+            delta = current_bytes - (
+                baseline_bytes if baseline_bytes <= current_bytes else 0
+            )
+            if delta > 0:
+                deltas.append((delta, pid))
+        deltas.sort(reverse=True)
+        return [(pid, self._command(pid), delta) for delta, pid in deltas[:count]]
+
+    def _scan(self):
+        pids = {int(entry) for entry in os.listdir(self._proc_root) if entry.isdigit()}
+        known_pids = set(self._pids)
+        if pids != known_pids:
+            for pid in known_pids - pids:
+                self._bytes.pop(pid, None)
+                self._commands.pop(pid, None)
+                self._recently_active.discard(pid)
+            next_pid = (
+                self._pids[self._next_pid_index]
+                if self._next_pid_index < len(self._pids)
+                else 0
+            )
+            self._pids = sorted(pids)
+            self._next_pid_index = bisect.bisect_left(self._pids, next_pid)
+
+        for pid in itertools.islice(
+            self._iter_pids_to_read(pids - known_pids), self._max_reads
+        ):
+            self._read(pid)
+
+    def _iter_pids_to_read(self, new_pids: Set[int]) -> Iterator[int]:
+        yield from new_pids
+        yield from list(self._recently_active)
+        for _index in range(len(self._pids)):
+            if self._next_pid_index >= len(self._pids):
+                self._next_pid_index = 0
+            yield self._pids[self._next_pid_index]
+            self._next_pid_index += 1
+
+    def _read(self, pid: int):
+        try:
+            with open(os.path.join(self._proc_root, str(pid), "io")) as fh:
+                total = 0
+                for line in fh:
+                    key, _separator, value = line.partition(":")
+                    if key in ("read_bytes", "write_bytes"):
+                        total += int(value)
+        except (OSError, ValueError):  # the process is gone or inaccessible
+            return
+        previous = self._bytes.get(pid)
+        self._bytes[pid] = total
+        if previous is not None and previous != total:
+            self._recently_active.add(pid)
+        else:
+            self._recently_active.discard(pid)
+
+    def _command(self, pid: int) -> str:
+        command = self._commands.get(pid)
+        if command is None:
+            command = self._read_command(pid)
+            self._commands[pid] = command
+        return command
+
+    def _read_command(self, pid: int) -> str:
+        process_path = os.path.join(self._proc_root, str(pid))
+        try:
+            with open(os.path.join(process_path, "cmdline"), "rb") as fh:
+                command = fh.read().replace(b"\0", b" ").decode(errors="replace")
+            if not command.strip():  # kernel thread
+                with open(os.path.join(process_path, "comm")) as fh:
+                    command = f"[{fh.read().strip()}]"
+        except OSError:
+            return "?"
+        command = command.strip()
+        if len(command) > _MAX_COMMAND_LENGTH:
+            command = command[: _MAX_COMMAND_LENGTH - 3] + "..."
+        return command
@@ -1,14 +1,20 @@
 from dataclasses import dataclass
-from typing import Dict, Callable, Optional
+from typing import Deque, Dict, Callable, Optional
+import collections
 import heapq
 import itertools
 import threading
 import time
 
+from .logger import LOGGER as logger
+
 
 Callback = Callable[[], None]  # Shouldn't raise exceptions
 TimerId = int
 
+# Lag or callback duration that is worth a warning
+_STALL_THRESHOLD = 10.0
+
 
 @dataclass(order=True)
 class _Timer:
@@ -19,11 +25,22 @@ class _Timer:
 
 
 class Scheduler:
-    def __init__(self):
+    """Runs timers and callbacks from other threads in one thread.
+
+    Logs timers that fire late and callbacks that block the loop, lag is
+    the difference between scheduled and actual fire times.
+    """
+
+    def __init__(self, stall_threshold: float = _STALL_THRESHOLD):
+        self.stall_threshold = stall_threshold
+        self.last_lag = 0.0
         self._queue = []
         self._timer_by_id: Dict[TimerId, _Timer] = {}
         self._counter = itertools.count()
-        self._stop_event = threading.Event()
+        # Callbacks from other threads
+        self._pending_callbacks: Deque[Callback] = collections.deque()
+        self._wake_up_event = threading.Event()
+        self._is_stopped = False
 
     def set_timer(self, delay: float, callback: Callback) -> TimerId:
         assert delay >= 0
@@ -40,19 +57,49 @@ class Scheduler:
         timer.deleted = True
         timer.callback = None
 
+    def call_soon_threadsafe(self, callback: Callback):
+        """The only method that can be called from other threads"""
+        self._pending_callbacks.append(callback)
+        self._wake_up_event.set()
+
     def run(self):
-        while self._queue:
-            timer = heapq.heappop(self._queue)
+        while self._queue and not self._is_stopped:
+            self._run_pending_callbacks()
+            timer = self._queue[0]
             if timer.deleted:
+                heapq.heappop(self._queue)
                 continue
             delay = timer.fire_time - time.monotonic()
             if delay > 0:
-                if self._stop_event.wait(delay):
-                    break
-                if timer.deleted:
-                    continue
+                self._wake_up_event.wait(delay)
+                self._wake_up_event.clear()
+                continue
+            heapq.heappop(self._queue)
             self._timer_by_id.pop(timer.timer_id)
-            timer.callback()
+            self.last_lag = -delay
+            if self.last_lag > self.stall_threshold:
+                logger.warning(
+                    "%s fired %.1fs late", _name(timer.callback), self.last_lag
+                )
+            self._run(timer.callback)
 
     def stop(self):
-        self._stop_event.set()
+        self._is_stopped = True
+        self._wake_up_event.set()
+
+    def _run_pending_callbacks(self):
+        while self._pending_callbacks:
+            self._run(self._pending_callbacks.popleft())
+
+    def _run(self, callback: Callback):
+        started_at = time.monotonic()
+        callback()
+        duration = time.monotonic() - started_at
+        if duration > self.stall_threshold:
+            logger.warning(
+                "%s blocked the scheduler for %.1fs", _name(callback), duration
+            )
+
+
+def _name(callback: Callback) -> str:
+    return getattr(callback, "__qualname__", None) or repr(callback)
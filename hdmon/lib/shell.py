@@ -1,38 +1,230 @@
-from typing import Dict
-import subprocess
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+import os
+import re
+import select
+import signal
+import time
 
 from .logger import LOGGER as logger
 
 
 _TIMEOUT: float = 5 * 60  # 5 minutes
+_SHELL = "/bin/sh"
+# Only the end of the output is kept, it's where errors usually are
+_MAX_LOGGED_OUTPUT = 16 * 1024
+_MAX_CAPTURED_OUTPUT = 1024 * 1024
+_READ_SIZE = 64 * 1024
+# How often a command that closed its output is checked for exit
+_EXIT_POLL_INTERVAL = 0.01
 
+_VARIABLE = re.compile(r"\$(?:([A-Za-z_]\w*)|\{([A-Za-z_]\w*)\})")
+# Anything else means the command needs a shell
+_SHELL_SYNTAX = re.compile(r"""[|&;<>()$`\\*?\[\]{}~!#'"\n]""")
+# Commands that start with NAME=value assignments need a shell too
+_ASSIGNMENT = re.compile(r"[A-Za-z_]\w*=")
+# Builtins that don't exist as executables or only act on the shell itself,
+# and reserved words
+_SHELL_BUILTINS = frozenset(
+    [".", "alias", "bg", "break", "cd", "command", "continue", "eval", "exec"]
+    + ["exit", "export", "fc", "fg", "getopts", "hash", "jobs", "read"]
+    + ["readonly", "return", "set", "shift", "source", "times", "trap", "type"]
+    + ["ulimit", "umask", "unalias", "unset", "wait"]
+    + ["case", "do", "done", "elif", "else", "esac", "fi", "for", "function"]
+    + ["if", "in", "select", "then", "until", "while"]
+)
 
-def run(command: str, env: Dict[str, str], timeout=_TIMEOUT):
+
+@dataclass(frozen=True)
+class SpawnResult:
+    exit_code: Optional[int]  # None on timeout, negative signal number if killed
+    output: bytes  # the end of stdout (and stderr) of the command
+    is_output_truncated: bool
+    spawn_time: float  # seconds until the command started
+    run_time: float  # seconds until the command exited
+
+
+def run(command: str, env: Dict[str, str], timeout=_TIMEOUT) -> bool:
+    """Returns True if the command has succeeded.
+
+    Commands without shell syntax other than $variables from env are run
+    directly, without a shell.
+    """
     logger.info(
         'Running "%s" where %s',
         command,
         ", ".join("${}={}".format(key, value) for key, value in env.items()),
     )
+    args = split_command(command, env) or [_SHELL, "-c", command]
     try:
-        subprocess.run(
-            command,
-            shell=True,
-            env=env,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            timeout=timeout,
-            check=True,
-        )
-    except subprocess.TimeoutExpired as error:
+        result = spawn(args, env, timeout=timeout, max_output=_MAX_LOGGED_OUTPUT)
+    except OSError as error:
+        logger.error('Cannot run command "%s": %s', command, error)
+        return False
+    logger.debug(
+        'Command "%s" took %.3fs, started in %.1fms%s',
+        command,
+        result.run_time,
+        result.spawn_time * 1000,
+        "" if args[0] != _SHELL else " with shell",
+    )
+    output = _decode_output(result)
+    if result.exit_code is None:
         logger.error(
-            'Timeout while running command "%s", command output:\n%s',
-            command,
-            error.stdout,
+            'Timeout while running command "%s", command output:\n%s', command, output
         )
-    except subprocess.CalledProcessError as error:
+        return False
+    if result.exit_code != 0:
         logger.error(
             'Command "%s" failed with exit code %d, command output:\n%s',
             command,
-            error.returncode,
-            error.stdout,
+            result.exit_code,
+            output,
         )
+        return False
+    return True
+
+
+def run_and_capture(args: List[str], timeout=_TIMEOUT) -> Optional[Tuple[int, str]]:
+    """Runs the command without shell, returns its exit code and output"""
+    logger.debug('Running "%s"', " ".join(args))
+    try:
+        result = spawn(
+            args,
+            timeout=timeout,
+            max_output=_MAX_CAPTURED_OUTPUT,
+            capture_stderr=False,
+        )
+    except OSError as error:
+        logger.error('Cannot run command "%s": %s', " ".join(args), error)
+        return None
+    if result.exit_code is None:
+        logger.error('Timeout while running command "%s"', " ".join(args))
+        return None
+    if result.is_output_truncated:
+        logger.error('Command "%s" printed too much', " ".join(args))
+        return None
+    return result.exit_code, result.output.decode(errors="replace")
+
+
+def split_command(command: str, env: Dict[str, str]) -> Optional[List[str]]:
+    """Returns arguments of the command, None if it needs a shell"""
+    if _SHELL_SYNTAX.search(_VARIABLE.sub("", command)):
+        return None
+    words = command.split()
+    if words and (words[0] in _SHELL_BUILTINS or _ASSIGNMENT.match(words[0])):
+        return None
+    args = []
+    for word in words:
+        arg = _VARIABLE.sub(lambda match: env.get(match[1] or match[2], ""), word)
+        if _SHELL_SYNTAX.search(arg) or arg != arg.strip() or len(arg.split()) > 1:
+            return None  # the shell would split or expand the value
+        if arg:
+            args.append(arg)
+    return args or None
+
+
+def spawn(
+    args: List[str],
+    env: Optional[Dict[str, str]] = None,
+    *,
+    timeout: float = _TIMEOUT,
+    max_output: int = _MAX_LOGGED_OUTPUT,
+    capture_stderr: bool = True,
+) -> SpawnResult:
+    """Runs the command with posix_spawn, keeps only the end of its output.
+
+    The executable is looked up in PATH of hdmon itself.
+    """
+    started_at = time.monotonic()
+    read_fd, write_fd = os.pipe()
+    file_actions = [(os.POSIX_SPAWN_DUP2, write_fd, 1), (os.POSIX_SPAWN_CLOSE, read_fd)]
+    if capture_stderr:
+        file_actions.append((os.POSIX_SPAWN_DUP2, write_fd, 2))
+    else:
+        file_actions.append((os.POSIX_SPAWN_OPEN, 2, os.devnull, os.O_WRONLY, 0))
+    try:
+        pid = os.posix_spawnp(
+            args[0],
+            args,
+            os.environ if env is None else env,
+            file_actions=file_actions,
+        )
+    except BaseException:
+        os.close(read_fd)
+        raise
+    finally:
+        os.close(write_fd)
+    spawned_at = time.monotonic()
+
+    output = _TailBuffer(max_output)
+    exit_code = None
+    deadline = started_at + timeout
+    try:
+        while exit_code is None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+                break
+            if read_fd >= 0 and _is_readable(
+                read_fd, min(remaining, _EXIT_POLL_INTERVAL * 10)
+            ):
+                chunk = os.read(read_fd, _READ_SIZE)
+                if chunk:
+                    output.append(chunk)
+                    continue
+                os.close(read_fd)  # the command has closed its output
+                read_fd = -1
+            # Children of the command can keep the output open after it exits
+            finished_pid, status = os.waitpid(pid, os.WNOHANG)
+            if finished_pid:
+                exit_code = _exit_code(status)
+            elif read_fd < 0:
+                time.sleep(min(_EXIT_POLL_INTERVAL, remaining))
+        # Whatever the command has written before exiting
+        while read_fd >= 0 and _is_readable(read_fd, 0):
+            chunk = os.read(read_fd, _READ_SIZE)
+            if not chunk:
+                break
+            output.append(chunk)
+    finally:
+        if read_fd >= 0:
+            os.close(read_fd)
+
+    return SpawnResult(
+        exit_code=exit_code,
+        output=bytes(output.data),
+        is_output_truncated=output.is_truncated,
+        spawn_time=spawned_at - started_at,
+        run_time=time.monotonic() - started_at,
+    )
+
+
+class _TailBuffer:
+    def __init__(self, size: int):
+        self.data = bytearray()
+        self.is_truncated = False
+        self._size = size
+
+    def append(self, chunk: bytes):
+        self.data += chunk
+        if len(self.data) > self._size:
+            del self.data[: -self._size]
+            self.is_truncated = True
+
+
+def _is_readable(fd: int, timeout: float) -> bool:
+    readable, _, _ = select.select([fd], [], [], timeout)
+    return bool(readable)
+
+
+def _exit_code(status: int) -> int:
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def _decode_output(result: SpawnResult) -> str:
+    output = result.output.decode(errors="replace")
+    return ("..." + output) if result.is_output_truncated else output
@@ -0,0 +1,37 @@
+from typing import Any, Dict, Optional
+import json
+
+
+SmartData = Dict[str, Any]
+
+# smartctl exit status bits
+_COMMAND_LINE_ERROR = 1 << 0
+_DEVICE_OPEN_FAILED = 1 << 1  # or the disk is in standby and -n standby is used
+
+
+def build_command(smartctl: str, disk_path: str):
+    # "-n standby" is a safety net, the disk shouldn't be sleeping anyway
+    return [smartctl, "--json", "-n", "standby", "-H", "-A", disk_path]
+
+
+def parse_output(exit_code: int, output: str) -> Optional[SmartData]:
+    """Returns health, temperature and attributes, None if the disk wasn't read"""
+    if exit_code & (_COMMAND_LINE_ERROR | _DEVICE_OPEN_FAILED):
+        return None
+    report = json.loads(output)
+    data: SmartData = {}
+    smart_status = report.get("smart_status")
+    if smart_status is not None:
+        data["passed"] = smart_status.get("passed")
+    temperature = report.get("temperature", {}).get("current")
+    if temperature is not None:
+        data["temperature"] = temperature
+    ata_attributes = report.get("ata_smart_attributes", {}).get("table")
+    if ata_attributes is not None:
+        data["attributes"] = {
+            attribute["name"]: attribute["raw"]["value"] for attribute in ata_attributes
+        }
+    nvme_attributes = report.get("nvme_smart_health_information_log")
+    if nvme_attributes is not None:
+        data["attributes"] = nvme_attributes
+    return data
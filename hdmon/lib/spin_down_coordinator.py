@@ -0,0 +1,140 @@
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional
+import time
+
+from .block_topology import BlockTopology
+from .error_handling import log_exceptions
+from .logger import LOGGER as logger
+from .scheduler import Scheduler, TimerId
+
+
+SpinDown = Callable[[], None]  # Shouldn't raise exceptions
+
+
+@dataclass
+class _Enclosure:
+    # Spin-downs of members that are ready to be spun down
+    ready: Dict[str, SpinDown] = field(default_factory=dict)
+    spun_down_at: Optional[float] = None
+    # Number of spin-downs in a row that were followed by activity too soon
+    respin_ups: int = 0
+    backoff_until: float = 0.0
+    timer_id: Optional[TimerId] = None
+
+
+class SpinDownCoordinator:
+    """Spins down disks of an enclosure together.
+
+    Some enclosures spin all their disks up when one of them is accessed, so
+    disks of an enclosure are spun down only once all of them are ready to.
+    Activity soon after a spin-down means the enclosure has spun the disks up
+    right away, the next spin-down of the enclosure is then postponed by
+    a backoff that doubles every time it happens again.
+
+    Members are disks that ask for spin-downs, disks that don't belong to
+    any enclosure are spun down right away.
+    """
+
+    def __init__(
+        self,
+        *,
+        scheduler: Scheduler,
+        block_topology: BlockTopology,
+        respin_window: float,
+        backoff: float,
+        max_backoff: float,
+    ):
+        self._scheduler = scheduler
+        self._block_topology = block_topology
+        self._respin_window = respin_window
+        self._backoff = backoff
+        self._max_backoff = max_backoff
+        self._members: Dict[str, str] = {}  # enclosures by device name
+        self._enclosures: Dict[str, _Enclosure] = {}
+
+    def add_member(self, device_name: str):
+        enclosure = self._block_topology.enclosure(device_name)
+        if enclosure is not None:
+            self._members[device_name] = enclosure
+            self._enclosures.setdefault(enclosure, _Enclosure())
+
+    def remove_member(self, device_name: str):
+        enclosure = self._members.pop(device_name, None)
+        if enclosure is None:
+            return
+        self._enclosures[enclosure].ready.pop(device_name, None)
+        if enclosure not in self._members.values():
+            self._cancel_timer(self._enclosures.pop(enclosure))
+        else:
+            self._try_spin_down(enclosure)
+
+    def request_spin_down(self, device_name: str, spin_down: SpinDown):
+        """Calls spin_down now or once other disks of the enclosure are ready"""
+        enclosure = self._members.get(device_name)
+        if enclosure is None:
+            spin_down()
+            return
+        self._enclosures[enclosure].ready[device_name] = spin_down
+        self._try_spin_down(enclosure)
+
+    def on_disk_active(self, device_name: str):
+        enclosure_path = self._members.get(device_name)
+        if enclosure_path is None:
+            return
+        enclosure = self._enclosures[enclosure_path]
+        enclosure.ready.pop(device_name, None)
+        if enclosure.spun_down_at is None:
+            return
+        if time.monotonic() - enclosure.spun_down_at > self._respin_window:
+            enclosure.respin_ups = 0
+        else:
+            enclosure.respin_ups += 1
+            backoff = min(
+                self._backoff * 2 ** (enclosure.respin_ups - 1), self._max_backoff
+            )
+            enclosure.backoff_until = time.monotonic() + backoff
+            logger.warning(
+                "%s became active right after spin-down, postponing spin-downs"
+                " of its enclosure by %.0fs",
+                device_name,
+                backoff,
+            )
+        enclosure.spun_down_at = None
+
+    def _try_spin_down(self, enclosure_path: str):
+        enclosure = self._enclosures[enclosure_path]
+        members = [
+            device_name
+            for device_name, member_enclosure in self._members.items()
+            if member_enclosure == enclosure_path
+        ]
+        if any(device_name not in enclosure.ready for device_name in members):
+            return
+        delay = enclosure.backoff_until - time.monotonic()
+        if delay > 0:
+            if enclosure.timer_id is None:
+                enclosure.timer_id = self._scheduler.set_timer(
+                    delay, lambda: self._on_backoff_timer(enclosure_path)
+                )
+            return
+        self._cancel_timer(enclosure)
+        if len(members) > 1:
+            logger.info("Spinning down %s together", ", ".join(sorted(members)))
+        ready = enclosure.ready
+        enclosure.ready = {}
+        enclosure.spun_down_at = time.monotonic()
+        for spin_down in ready.values():
+            spin_down()
+
+    @log_exceptions
+    def _on_backoff_timer(self, enclosure_path: str):
+        enclosure = self._enclosures.get(enclosure_path)
+        if enclosure is None:
+            return
+        enclosure.timer_id = None
+        self._try_spin_down(enclosure_path)
+
+    def _cancel_timer(self, enclosure: _Enclosure):
+        if enclosure.timer_id is not None:
+            self._scheduler.clear_timer(enclosure.timer_id)
+            enclosure.timer_id = None
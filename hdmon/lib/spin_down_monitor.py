@@ -0,0 +1,30 @@
+from abc import ABC, abstractmethod
+from typing import List
+
+
+class SpinDownObserver(ABC):
+    @abstractmethod
+    def on_disk_spun_down(self, device_name: str):
+        """Shouldn't raise exceptions"""
+        raise NotImplementedError()
+
+    def on_spin_down_failed(self, device_name: str):
+        """Shouldn't raise exceptions"""
+
+
+class SpinDownMonitor:
+    """Tells observers whether spin-down commands have succeeded"""
+
+    def __init__(self):
+        self._observers: List[SpinDownObserver] = []
+
+    def add_observer(self, observer: SpinDownObserver):
+        self._observers.append(observer)
+
+    def notify_spun_down(self, device_name: str):
+        for observer in self._observers:
+            observer.on_disk_spun_down(device_name)
+
+    def notify_spin_down_failed(self, device_name: str):
+        for observer in self._observers:
+            observer.on_spin_down_failed(device_name)
@@ -0,0 +1,188 @@
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, Iterable, List, Optional
+import os
+import time
+
+from .block_trace import BlockIoObserver
+from .disk_presence_monitor import DiskPresenceObserver
+from .disk_stats import DeviceNameAndCounters
+from .disk_stats_monitor import DiskStatsObserver
+from .error_handling import log_exceptions
+from .logger import LOGGER as logger
+from .metrics import LatencyBuckets, format_histogram, format_values
+from .scheduler import Scheduler
+from .spin_down_monitor import SpinDownObserver
+
+
+_SYSFS_BLOCK_PATH = "/sys/block"
+_SAMPLE_INTERVAL = 0.5
+_DAY = 24 * 60 * 60
+# Fields of /sys/block/<disk>/stat
+_READS_COMPLETED = 0
+_WRITES_COMPLETED = 4
+_IO_TICKS = 9
+
+
+class _DiskSpinUps:
+    def __init__(self):
+        # From 0.125s to 64s
+        self.latencies = LatencyBuckets(first_bound=0.125, bucket_count=10)
+        self.wake_times: Deque[float] = deque()  # time.time() of the last day
+
+    def add(self, latency: float, wake_time: float):
+        self.latencies.add(latency)
+        self.wake_times.append(wake_time)
+
+    def wakes_per_day(self, now: float) -> int:
+        while self.wake_times and self.wake_times[0] < now - _DAY:
+            self.wake_times.popleft()
+        return len(self.wake_times)
+
+
+@dataclass
+class _Standby:
+    counters: List[int]  # of /sys/block/<disk>/stat at spin-down
+    is_sampled: bool = False
+
+
+class SpinUpMonitor(
+    SpinDownObserver, DiskPresenceObserver, DiskStatsObserver, BlockIoObserver
+):
+    """Measures how long disks take to serve I/O after commanded spin-downs.
+
+    The first request that completes ends the standby, the latency is the
+    time the disk has been doing I/O by then (io_ticks). Disks in standby
+    cost nothing until I/O is issued to them: traced I/O or a regular poll
+    that shows requests in flight starts sampling them every half a second,
+    so the latency is up to one interval longer than the request took. If a
+    regular poll finds requests already completed, the latency includes
+    I/O that followed the first request until the poll.
+    """
+
+    def __init__(
+        self, *, scheduler: Scheduler, sysfs_block_path: str = _SYSFS_BLOCK_PATH
+    ):
+        self._scheduler = scheduler
+        self._sysfs_block_path = sysfs_block_path
+        self._standby_disks: Dict[str, _Standby] = {}
+        self._spin_ups: Dict[str, _DiskSpinUps] = {}
+        self._timer_id = None
+
+    @log_exceptions
+    def on_disk_spun_down(self, device_name: str):
+        if device_name in self._standby_disks:
+            return  # the command has been repeated
+        counters = self._read_counters(device_name)
+        if counters is not None:
+            self._standby_disks[device_name] = _Standby(counters)
+
+    @log_exceptions
+    def on_disks_added(self, device_names: Iterable[str]):
+        pass
+
+    @log_exceptions
+    def on_disks_removed(self, device_names: Iterable[str]):
+        for device_name in device_names:
+            self._standby_disks.pop(device_name, None)
+
+    @log_exceptions
+    def on_disks_renamed(self, new_names: Dict[str, str]):
+        for old_name, new_name in new_names.items():
+            # Counters of the new name can't be compared with standby ones
+            self._standby_disks.pop(old_name, None)
+            spin_ups = self._spin_ups.pop(old_name, None)
+            if spin_ups is not None:
+                self._spin_ups[new_name] = spin_ups
+
+    @log_exceptions
+    def on_disk_stats_updated(self, disk_stats: Iterable[DeviceNameAndCounters]):
+        if not self._standby_disks:
+            return
+        for device_name, counters in disk_stats:
+            standby = self._standby_disks.get(device_name)
+            if standby is None or standby.is_sampled:
+                continue
+            if (
+                counters.reads_completed != standby.counters[_READS_COMPLETED]
+                or counters.writes_completed != standby.counters[_WRITES_COMPLETED]
+            ):
+                self._add_spin_up(device_name, standby, counters.io_ticks)
+            elif counters.in_flight:
+                self._start_sampling(standby)
+
+    @log_exceptions
+    def on_block_io(
+        self,
+        device_name: str,
+        last_io_time: float,
+        sectors_read: int,
+        sectors_written: int,
+    ):
+        standby = self._standby_disks.get(device_name)
+        if standby is not None:
+            self._start_sampling(standby)
+
+    def get_metrics(self) -> str:
+        """Returns metrics in Prometheus text format"""
+        now = time.time()
+        lines = format_histogram(
+            "hdmon_spin_up_latency_seconds",
+            "Time the first I/O after a commanded spin-down took.",
+            {
+                device_name: spin_ups.latencies
+                for device_name, spin_ups in self._spin_ups.items()
+            },
+        )
+        lines += format_values(
+            "hdmon_spin_ups_per_day",
+            "gauge",
+            "Spin-ups after commanded spin-downs during the last 24 hours.",
+            {
+                device_name: spin_ups.wakes_per_day(now)
+                for device_name, spin_ups in self._spin_ups.items()
+            },
+        )
+        lines += format_values(
+            "hdmon_standby",
+            "gauge",
+            "1 if the disk has been spun down and hasn't been accessed since.",
+            {device_name: 1 for device_name in self._standby_disks},
+        )
+        return "\n".join(lines) + "\n"
+
+    def _start_sampling(self, standby: _Standby):
+        standby.is_sampled = True
+        if self._timer_id is None:
+            self._timer_id = self._scheduler.set_timer(_SAMPLE_INTERVAL, self._sample)
+
+    @log_exceptions
+    def _sample(self):
+        self._timer_id = None
+        for device_name, standby in list(self._standby_disks.items()):
+            if not standby.is_sampled:
+                continue
+            counters = self._read_counters(device_name)
+            if counters is None:
+                del self._standby_disks[device_name]
+                continue
+            if (
+                counters[_READS_COMPLETED] != standby.counters[_READS_COMPLETED]
+                or counters[_WRITES_COMPLETED] != standby.counters[_WRITES_COMPLETED]
+            ):
+                self._add_spin_up(device_name, standby, counters[_IO_TICKS])
+        if any(standby.is_sampled for standby in self._standby_disks.values()):
+            self._timer_id = self._scheduler.set_timer(_SAMPLE_INTERVAL, self._sample)
+
+    def _add_spin_up(self, device_name: str, standby: _Standby, io_ticks: int):
+        del self._standby_disks[device_name]
+        latency = (io_ticks - standby.counters[_IO_TICKS]) / 1000
+        self._spin_ups.setdefault(device_name, _DiskSpinUps()).add(latency, time.time())
+        logger.info("%s spun up, the first I/O took %.1fs", device_name, latency)
+
+    def _read_counters(self, device_name: str) -> Optional[List[int]]:
+        try:
+            with open(os.path.join(self._sysfs_block_path, device_name, "stat")) as fh:
+                return [int(value) for value in fh.read().split()]
+        except (OSError, ValueError):
+            return None
@@ -0,0 +1,40 @@
+from typing import Any, Dict, Optional
+import json
+import os
+import re
+
+from .logger import LOGGER as logger
+
+
+State = Dict[str, Any]
+
+
+class StateStore:
+    """Keeps small JSON documents that should survive restarts"""
+
+    def __init__(self, directory: str):
+        self._directory = directory
+
+    def load(self, name: str) -> Optional[State]:
+        path = self._path(name)
+        try:
+            with open(path) as fh:
+                return json.load(fh)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as error:
+            logger.warning('Cannot load state from "%s": %s', path, error)
+            return None
+
+    def save(self, name: str, state: State):
+        os.makedirs(self._directory, exist_ok=True)
+        path = self._path(name)
+        temp_path = path + ".tmp"
+        with open(temp_path, "w") as fh:
+            json.dump(state, fh)
+        os.replace(temp_path, path)
+
+    def _path(self, name: str) -> str:
+        # Names can contain identities of disks, e.g. serial numbers with spaces
+        file_name = re.sub(r"[^\w.=-]", "_", name)
+        return os.path.join(self._directory, file_name + ".json")
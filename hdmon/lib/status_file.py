@@ -0,0 +1,184 @@
+"""
+Fixed-layout status file that other programs can read without waking disks up.
+
+The file starts with a header followed by a fixed number of fixed-size records,
+one record per disk. A record is updated in place: its generation counter is
+made odd, the record is written and the counter is made even again. Readers
+retry while the counter is odd or changes during the read, so they never see
+a torn record and never block the writer.
+
+The writer replaces the whole file on start, so readers should open the file
+on every read rather than keep it mapped.
+"""
+
+
+from dataclasses import dataclass
+from typing import Dict, Optional
+import mmap
+import os
+import struct
+import time
+
+from .error_handling import Error
+
+
+STATUS_FILE_PATH = "/run/hdmon/status"
+
+POWER_STATE_UNKNOWN = "unknown"
+POWER_STATE_ACTIVE = "active"
+POWER_STATE_STANDBY = "standby"  # a spin-down command has succeeded
+
+_MAGIC = b"HDMS"
+_VERSION = 1
+_HEADER = struct.Struct("=4sIII")  # magic, version, record size, record count
+_GENERATION = struct.Struct("=Q")
+# Device name, activity, power state, idle since, spun down at, updated at,
+# sectors read, sectors written
+_PAYLOAD = struct.Struct("=32sBB6xdddQQ")
+# Leaves room for new fields, readers use the record size from the header
+_RECORD_SIZE = 128
+_MAX_READ_ATTEMPTS = 1000
+
+_ACTIVITIES = [None, False, True]  # unknown, busy, idle
+_POWER_STATES = [POWER_STATE_UNKNOWN, POWER_STATE_ACTIVE, POWER_STATE_STANDBY]
+
+
+@dataclass(frozen=True)
+class DiskStatus:
+    device_name: str
+    is_idle: Optional[bool] = None  # None until the first poll
+    power_state: str = POWER_STATE_UNKNOWN
+    # Timestamps are seconds since the epoch
+    idle_since: Optional[float] = None
+    spun_down_at: Optional[float] = None
+    updated_at: Optional[float] = None
+    sectors_read: int = 0
+    sectors_written: int = 0
+
+
+class StatusFileWriter:
+    def __init__(self, path: str = STATUS_FILE_PATH, max_disks: int = 64):
+        self._path = path
+        self._max_disks = max_disks
+        self._slots: Dict[str, int] = {}
+        self._generations = [0] * max_disks
+        self._mmap: Optional[mmap.mmap] = None
+
+    def open(self):
+        os.makedirs(os.path.dirname(self._path), exist_ok=True)
+        temp_path = self._path + ".tmp"
+        with open(temp_path, "wb") as fh:
+            fh.write(_HEADER.pack(_MAGIC, _VERSION, _RECORD_SIZE, self._max_disks))
+            fh.truncate(_HEADER.size + _RECORD_SIZE * self._max_disks)
+        os.chmod(temp_path, 0o644)
+        fd = os.open(temp_path, os.O_RDWR)
+        try:
+            self._mmap = mmap.mmap(fd, 0)
+        finally:
+            os.close(fd)
+        os.replace(temp_path, self._path)
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def write(self, status: DiskStatus) -> bool:
+        """Returns False if there is no room for the disk"""
+        slot = self._slots.get(status.device_name)
+        if slot is None:
+            free_slots = set(range(self._max_disks)) - set(self._slots.values())
+            if not free_slots:
+                return False
+            slot = self._slots[status.device_name] = min(free_slots)
+        self._write_slot(slot, _pack(status))
+        return True
+
+    def remove(self, device_name: str):
+        slot = self._slots.pop(device_name, None)
+        if slot is not None:
+            self._write_slot(slot, bytes(_PAYLOAD.size))
+
+    def _write_slot(self, slot: int, payload: bytes):
+        offset = _HEADER.size + _RECORD_SIZE * slot
+        generation = self._generations[slot]
+        _GENERATION.pack_into(self._mmap, offset, generation + 1)
+        self._mmap[
+            offset + _GENERATION.size : offset + _GENERATION.size + len(payload)
+        ] = payload
+        _GENERATION.pack_into(self._mmap, offset, generation + 2)
+        self._generations[slot] = generation + 2
+
+
+def read_status(path: str = STATUS_FILE_PATH) -> Dict[str, DiskStatus]:
+    """Returns status of every disk in the file"""
+    with open(path, "rb") as fh, mmap.mmap(
+        fh.fileno(), 0, access=mmap.ACCESS_READ
+    ) as buffer:
+        magic, version, record_size, record_count = _HEADER.unpack_from(buffer)
+        if magic != _MAGIC or version != _VERSION:
+            raise Error(f'Unsupported status file "{path}"')
+        statuses = {}
+        for slot in range(record_count):
+            status = _read_record(buffer, _HEADER.size + record_size * slot)
+            if status is not None:
+                statuses[status.device_name] = status
+        return statuses
+
+
+def read_disk_status(
+    device_name: str, path: str = STATUS_FILE_PATH
+) -> Optional[DiskStatus]:
+    return read_status(path).get(device_name)
+
+
+def _read_record(buffer: mmap.mmap, offset: int) -> Optional[DiskStatus]:
+    payload_offset = offset + _GENERATION.size
+    for _attempt in range(_MAX_READ_ATTEMPTS):
+        (generation,) = _GENERATION.unpack_from(buffer, offset)
+        if generation % 2:
+            time.sleep(0)
+            continue
+        payload = buffer[payload_offset : payload_offset + _PAYLOAD.size]
+        if _GENERATION.unpack_from(buffer, offset)[0] == generation:
+            return _unpack(payload)
+    raise Error("The status file is being updated for too long")
+
+
+def _pack(status: DiskStatus) -> bytes:
+    return _PAYLOAD.pack(
+        status.device_name.encode(),
+        _ACTIVITIES.index(status.is_idle),
+        _POWER_STATES.index(status.power_state),
+        status.idle_since or 0.0,
+        status.spun_down_at or 0.0,
+        status.updated_at or 0.0,
+        status.sectors_read,
+        status.sectors_written,
+    )
+
+
+def _unpack(payload: bytes) -> Optional[DiskStatus]:
+    (
+        device_name,
+        activity,
+        power_state,
+        idle_since,
+        spun_down_at,
+        updated_at,
+        sectors_read,
+        sectors_written,
+    ) = _PAYLOAD.unpack(payload)
+    device_name = device_name.rstrip(b"\0").decode()
+    if not device_name:  # a free slot
+        return None
+    return DiskStatus(
+        device_name=device_name,
+        is_idle=_ACTIVITIES[activity],
+        power_state=_POWER_STATES[power_state],
+        idle_since=idle_since or None,
+        spun_down_at=spun_down_at or None,
+        updated_at=updated_at or None,
+        sectors_read=sectors_read,
+        sectors_written=sectors_written,
+    )
@@ -0,0 +1,72 @@
+"""
+Minimal implementation of the sd_notify protocol, see sd_notify(3).
+
+Does nothing unless the service is started by systemd with Type=notify.
+"""
+
+
+from typing import Callable, Optional
+import os
+import socket
+
+from .error_handling import log_exceptions
+from .logger import LOGGER as logger
+from .scheduler import Scheduler
+
+
+# Pings per watchdog interval, a ping that comes late still has a chance
+_PINGS_PER_INTERVAL = 4
+
+
+def notify(message: str) -> bool:
+    """Sends the message to systemd, returns False if there is no one to tell"""
+    address = os.environ.get("NOTIFY_SOCKET")
+    if not address:
+        return False
+    if address.startswith("@"):  # abstract namespace
+        address = "\0" + address[1:]
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as client:
+            client.connect(address)
+            client.sendall(message.encode())
+    except OSError as error:
+        logger.warning("Cannot notify systemd: %s", error)
+        return False
+    return True
+
+
+def watchdog_interval() -> Optional[float]:
+    """Returns how often systemd expects watchdog pings, in seconds"""
+    usec = os.environ.get("WATCHDOG_USEC")
+    pid = os.environ.get("WATCHDOG_PID")
+    if not usec or (pid and pid != str(os.getpid())):
+        return None
+    try:
+        return int(usec) / 1e6
+    except ValueError:
+        return None
+
+
+class Watchdog:
+    """Pings the systemd watchdog from the scheduler loop.
+
+    A ping that runs at all shows the loop is alive, so a stall shorter than
+    the watchdog interval is forgiven as soon as the loop is back.
+    is_healthy can hold pings back for other reasons.
+    """
+
+    def __init__(
+        self, *, scheduler: Scheduler, interval: float, is_healthy: Callable[[], bool]
+    ):
+        self._scheduler = scheduler
+        self._ping_interval = interval / _PINGS_PER_INTERVAL
+        self._is_healthy = is_healthy
+
+    def start(self):
+        self._ping()
+
+    @log_exceptions
+    def _ping(self):
+        self._scheduler.set_timer(self._ping_interval, self._ping)
+        if self._is_healthy():
+            notify("WATCHDOG=1")
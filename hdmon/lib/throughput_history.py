@@ -0,0 +1,100 @@
+from array import array
+from typing import Dict, List, Tuple
+import time
+
+from .disk_activity_monitor import DiskPollObserver, DiskSnapshot
+from .disk_stats import SECTOR_SIZE
+from .error_handling import log_exceptions
+
+
+# Step in seconds and number of steps
+ARCHIVES = {
+    "hour": (60, 60),
+    "day": (5 * 60, 288),
+    "month": (60 * 60, 30 * 24),
+}
+
+# Step start time, read and written bytes per second
+ThroughputRow = Tuple[float, float, float]
+
+
+class ThroughputArchive:
+    """Round robin archive of bytes read and written per step.
+
+    Like RRD, keeps a fixed number of steps, so memory doesn't grow with
+    uptime. Steps without polls count as no I/O.
+    """
+
+    def __init__(self, step: int, rows: int):
+        self.step = step
+        self.rows = rows
+        self._read = array("d", bytes(8 * rows))
+        self._written = array("d", bytes(8 * rows))
+        self._first_step = -1
+        self._last_step = -1
+
+    def add(self, timestamp: float, read_bytes: float, written_bytes: float):
+        step = int(timestamp // self.step)
+        if self._first_step < 0:
+            self._first_step = self._last_step = step
+        elif step > self._last_step:
+            for skipped_step in range(
+                max(self._last_step + 1, step - self.rows + 1), step + 1
+            ):
+                self._read[skipped_step % self.rows] = 0.0
+                self._written[skipped_step % self.rows] = 0.0
+            self._last_step = step
+        # Samples from the past (the clock went back) go to the last step
+        index = self._last_step % self.rows
+        self._read[index] += read_bytes
+        self._written[index] += written_bytes
+
+    def get_rows(self) -> List[ThroughputRow]:
+        """Returns rows from the oldest to the newest"""
+        if self._first_step < 0:
+            return []
+        first_step = max(self._first_step, self._last_step - self.rows + 1)
+        return [
+            (
+                float(step * self.step),
+                self._read[step % self.rows] / self.step,
+                self._written[step % self.rows] / self.step,
+            )
+            for step in range(first_step, self._last_step + 1)
+        ]
+
+    def get_average(self) -> Tuple[float, float]:
+        """Returns average read and written bytes per second"""
+        rows = self.get_rows()
+        if not rows:
+            return 0.0, 0.0
+        return (
+            sum(row[1] for row in rows) / len(rows),
+            sum(row[2] for row in rows) / len(rows),
+        )
+
+
+class ThroughputHistory(DiskPollObserver):
+    """Read and write rates of a disk over the last hour, day and month"""
+
+    def __init__(self):
+        self.archives: Dict[str, ThroughputArchive] = {
+            name: ThroughputArchive(step, rows)
+            for name, (step, rows) in ARCHIVES.items()
+        }
+
+    @log_exceptions
+    def on_poll(self, snapshot: DiskSnapshot):
+        # Counters that went back can't tell how much was done
+        read_bytes = max(snapshot.deltas.sectors_read, 0) * SECTOR_SIZE
+        written_bytes = max(snapshot.deltas.sectors_written, 0) * SECTOR_SIZE
+        now = time.time()
+        for archive in self.archives.values():
+            archive.add(now, read_bytes, written_bytes)
+
+    def get_status(self) -> Dict[str, Dict[str, float]]:
+        status = {}
+        for name, archive in self.archives.items():
+            read, written = archive.get_average()
+            status[name] = {"read": read, "written": written}
+        return status
@@ -0,0 +1,47 @@
+from typing import Dict, Generic, Iterator, Optional, Tuple, TypeVar
+import time
+
+
+Key = TypeVar("Key")
+Value = TypeVar("Value")
+
+
+class TtlCache(Generic[Key, Value]):
+    """Keeps values for ttl seconds, expired values are evicted on access"""
+
+    def __init__(self, ttl: float):
+        self._ttl = ttl
+        # Values with the time they were stored at
+        self._entries: Dict[Key, Tuple[float, Value]] = {}
+
+    def set(self, key: Key, value: Value):
+        self.evict_expired()
+        self._entries[key] = (time.monotonic(), value)
+
+    def get(self, key: Key) -> Optional[Value]:
+        entry = self._get_entry(key)
+        return None if entry is None else entry[1]
+
+    def age(self, key: Key) -> Optional[float]:
+        entry = self._get_entry(key)
+        return None if entry is None else time.monotonic() - entry[0]
+
+    def items(self) -> Iterator[Tuple[Key, Value]]:
+        self.evict_expired()
+        return ((key, value) for key, (_time, value) in self._entries.items())
+
+    def evict_expired(self):
+        expiration_time = time.monotonic() - self._ttl
+        for key in [
+            key
+            for key, (stored_time, _value) in self._entries.items()
+            if stored_time < expiration_time
+        ]:
+            del self._entries[key]
+
+    def _get_entry(self, key: Key) -> Optional[Tuple[float, Value]]:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] < time.monotonic() - self._ttl:
+            del self._entries[key]
+            return None
+        return entry
@@ -0,0 +1,57 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+import mmap
+import os
+import random
+import time
+
+
+_BLOCK_SIZE = 4096
+
+# /proc/diskstats counts 512 byte sectors regardless of the disk sector size
+WAKE_SECTORS = _BLOCK_SIZE // 512
+
+
+@dataclass(frozen=True)
+class WakeResult:
+    latency: Optional[float] = None
+    error: Optional[str] = None
+
+
+def wake_disk(disk_path: str) -> float:
+    """Wakes a disk up by reading one block from it.
+
+    The block is read with O_DIRECT from a random offset, so neither the page
+    cache nor the disk cache can answer instead of the disk.
+    Blocks until the disk responds, returns the time it took.
+    """
+    fd = os.open(disk_path, os.O_RDONLY | os.O_DIRECT)
+    try:
+        block_count = os.lseek(fd, 0, os.SEEK_END) // _BLOCK_SIZE
+        offset = random.randrange(max(block_count, 1)) * _BLOCK_SIZE
+        # Anonymous memory maps are page aligned as O_DIRECT requires
+        with mmap.mmap(-1, _BLOCK_SIZE) as buffer:
+            start_time = time.monotonic()
+            os.preadv(fd, [buffer], offset)
+            return time.monotonic() - start_time
+    finally:
+        os.close(fd)
+
+
+def wake_disks(disk_paths: List[str], *, max_parallel: int) -> Dict[str, WakeResult]:
+    """Wakes disks up in parallel, waits until all of them respond"""
+    with ThreadPoolExecutor(
+        max_workers=max(min(max_parallel, len(disk_paths)), 1),
+        thread_name_prefix="wake",
+    ) as executor:
+        futures = {
+            disk_path: executor.submit(wake_disk, disk_path) for disk_path in disk_paths
+        }
+    results = {}
+    for disk_path, future in futures.items():
+        try:
+            results[disk_path] = WakeResult(latency=future.result())
+        except OSError as error:
+            results[disk_path] = WakeResult(error=str(error))
+    return results
@@ -0,0 +1,153 @@
+from typing import Dict, Iterator, List, Optional, Set
+import ctypes
+import os
+
+from .logger import LOGGER as logger
+
+
+_SYSFS_BLOCK_PATH = "/sys/block"
+# Per-BDI stats are only available in debugfs
+_DEBUGFS_BDI_PATH = "/sys/kernel/debug/bdi"
+_MOUNTINFO_PATH = "/proc/self/mountinfo"
+# Dirty pages and pages under writeback
+_PENDING_STATS = ("BdiWriteback", "BdiReclaimable")
+_SECTORS_WRITTEN_FIELD = 6  # in /sys/block/<disk>/stat
+
+_libc = None
+
+
+class DiskWriteback:
+    """Finds and flushes dirty data of filesystems on a disk.
+
+    Filesystems can live on partitions of the disk or on devices stacked on
+    top of it (device mapper, md). Walking sysfs is relatively slow, so the
+    devices and their backing devices (BDI) are found once on creation.
+    """
+
+    def __init__(
+        self,
+        device_name: str,
+        sysfs_block_path: str = _SYSFS_BLOCK_PATH,
+        debugfs_bdi_path: str = _DEBUGFS_BDI_PATH,
+        mountinfo_path: str = _MOUNTINFO_PATH,
+    ):
+        self._device_name = device_name
+        self._sysfs_block_path = sysfs_block_path
+        self._debugfs_bdi_path = debugfs_bdi_path
+        self._mountinfo_path = mountinfo_path
+        self._device_numbers: Set[str] = set()
+        # The disk and devices stacked on it, without partitions
+        self._device_names: List[str] = []
+        self._bdis: Set[str] = set()
+        self._add_device(os.path.join(sysfs_block_path, device_name))
+
+    def pending_kb(self) -> Optional[int]:
+        """Returns dirty and writeback data in KiB, None if it's unknown"""
+        total = 0
+        for bdi in self._bdis:
+            try:
+                with open(os.path.join(self._debugfs_bdi_path, bdi, "stats")) as fh:
+                    for line in fh:
+                        key, _separator, value = line.partition(":")
+                        if key.strip() in _PENDING_STATS:
+                            total += int(value.split()[0])
+            except (OSError, ValueError, IndexError):
+                return None
+        return total
+
+    def sync(self) -> Dict[str, int]:
+        """Flushes filesystems on the disk.
+
+        Returns sectors written meanwhile by the disk and by devices stacked
+        on it, e.g. an md array, by device name. Devices that haven't written
+        anything are left out.
+        """
+        sectors_written_before = {
+            device_name: self._read_sectors_written(device_name)
+            for device_name in self._device_names
+        }
+        for mount_point in self._find_mount_points():
+            _syncfs(mount_point)
+        sectors_written = {}
+        for device_name, before in sectors_written_before.items():
+            if before is None:
+                continue
+            after = self._read_sectors_written(device_name) or 0
+            if after > before:
+                sectors_written[device_name] = after - before
+        return sectors_written
+
+    def _add_device(self, device_path: str):
+        device_number = _read_first_line(os.path.join(device_path, "dev"))
+        if device_number is None or device_number in self._device_numbers:
+            return
+        self._device_numbers.add(device_number)
+        if not os.path.exists(os.path.join(device_path, "partition")):
+            self._device_names.append(os.path.basename(device_path))
+        bdi_path = os.path.join(device_path, "bdi")
+        if os.path.exists(bdi_path):  # partitions share the BDI of their disk
+            self._bdis.add(os.path.basename(os.path.realpath(bdi_path)))
+        for entry in _list_dir(device_path):
+            if os.path.exists(os.path.join(device_path, entry, "partition")):
+                self._add_device(os.path.join(device_path, entry))
+        for holder in _list_dir(os.path.join(device_path, "holders")):
+            self._add_device(os.path.join(self._sysfs_block_path, holder))
+
+    def _find_mount_points(self) -> Iterator[str]:
+        try:
+            with open(self._mountinfo_path) as fh:
+                lines = fh.readlines()
+        except OSError as error:
+            logger.warning("Cannot read mount points: %s", error)
+            return
+        for line in lines:
+            fields = line.split()
+            if len(fields) > 4 and fields[2] in self._device_numbers:
+                yield _unescape(fields[4])
+
+    def _read_sectors_written(self, device_name: str) -> Optional[int]:
+        line = _read_first_line(
+            os.path.join(self._sysfs_block_path, device_name, "stat")
+        )
+        try:
+            return int(line.split()[_SECTORS_WRITTEN_FIELD])
+        except (AttributeError, ValueError, IndexError):
+            return None
+
+
+def _syncfs(path: str):
+    global _libc
+    if _libc is None:
+        _libc = ctypes.CDLL(None, use_errno=True)
+    try:
+        fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    except OSError as error:
+        logger.warning('Cannot open "%s": %s', path, error)
+        return
+    try:
+        if _libc.syncfs(fd) != 0:
+            logger.warning(
+                'Cannot sync "%s": %s', path, os.strerror(ctypes.get_errno())
+            )
+    finally:
+        os.close(fd)
+
+
+def _unescape(path: str) -> str:
+    """Mount points in mountinfo have spaces and such escaped as \\040"""
+    return path.encode().decode("unicode_escape").encode("latin-1").decode()
+
+
+def _read_first_line(path: str) -> Optional[str]:
+    try:
+        with open(path) as fh:
+            return fh.readline().strip()
+    except OSError:
+        return None
+
+
+def _list_dir(path: str) -> List[str]:
+    try:
+        return sorted(os.listdir(path))
+    except OSError:
+        return []
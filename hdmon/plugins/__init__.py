@@ -1 +1,57 @@
-from . import once_idle
\ No newline at end of file
+"""
+Plugins are found by name in the "hdmon.plugins" entry point group. Built-in
+plugins are looked up in a table first, which avoids scanning metadata of all
+installed packages and works in a source checkout. The entry point
+should refer to the plugin factory class:
+
+    entry_points={"hdmon.plugins": ["my_plugin = my_package.my_plugin:Factory"]}
+
+Plugin modules are imported only when a profile uses them.
+"""
+
+
+from typing import Optional, Type
+import importlib
+
+from ..lib.logger import LOGGER as logger
+from .base import PluginFactory
+
+
+ENTRY_POINT_GROUP = "hdmon.plugins"
+
+_BUILTIN_PLUGINS = {
+    "once_idle": "hdmon.plugins.once_idle",
+    "prespin": "hdmon.plugins.prespin",
+    "shadow": "hdmon.plugins.shadow",
+    "smart": "hdmon.plugins.smart",
+    "wake_culprits": "hdmon.plugins.wake_culprits",
+}
+
+
+def load_factory_class(name: str) -> Optional[Type[PluginFactory]]:
+    """Returns None if there is no such plugin"""
+    module_name = _BUILTIN_PLUGINS.get(name)
+    if module_name is not None:
+        return importlib.import_module(module_name).Factory
+    entry_point = _find_entry_point(name)
+    if entry_point is None:
+        return None
+    logger.debug("Loading plugin %s from %s", name, entry_point.value)
+    return entry_point.load()
+
+
+def _find_entry_point(name: str):
+    try:
+        from importlib import metadata
+    except ImportError:  # Python < 3.8
+        return None
+    entry_points = metadata.entry_points()
+    if hasattr(entry_points, "select"):
+        candidates = entry_points.select(group=ENTRY_POINT_GROUP, name=name)
+    else:  # Python < 3.10
+        candidates = [
+            entry_point
+            for entry_point in entry_points.get(ENTRY_POINT_GROUP, [])
+            if entry_point.name == name
+        ]
+    return next(iter(candidates), None)
@@ -1,21 +1,71 @@
-from ..lib.disk_activity_monitor import DiskActivityObserver
+from ..lib.activity_rules import ActivityRules
+from ..lib.disk_presence_monitor import DiskPresenceMonitor
+from ..lib.disk_activity_monitor import (
+    DiskActivityMonitor,
+    DiskActivityObserver,
+    DiskPollObserver,
+    DiskSnapshot,
+)
 from ..lib.scheduler import Scheduler
+from ..lib.spin_down_coordinator import SpinDownCoordinator
+from ..lib.spin_down_monitor import SpinDownMonitor
 from abc import ABC, abstractmethod
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 
-class Plugin(DiskActivityObserver):
-    pass
+PluginConfig = Dict[str, Any]
+PluginStatus = Optional[Dict[str, Any]]
 
+# 1: on_disk_active, on_disk_idle, on_disk_removed
+# 2: on_poll with a snapshot of the plugin's own disk after every poll
+# 3: activity_rules to observe activity with rules of the plugin's own
+# 4: on_disk_renamed instead of being recreated when the disk gets a new name
+PLUGIN_API_VERSION = 4
 
-PluginConfig = Dict[str, Any]
+
+class Plugin(DiskActivityObserver, DiskPollObserver):
+    # Plugins opt into newer callbacks by raising their version
+    api_version = 1
+    # None means rules of the profile
+    activity_rules: Optional[ActivityRules] = None
+
+    def on_poll(self, snapshot: DiskSnapshot):
+        pass
+
+    def on_disk_renamed(self, device_name: str, disk_path: str):
+        """Called when the same disk is back under a new name, e.g. sdb to sdc"""
+        pass
+
+    def get_status(self) -> PluginStatus:
+        """Returns JSON serializable state for status requests, shouldn't touch the disk"""
+        return None
 
 
 class PluginFactory(ABC):
-    def __init__(self, scheduler: Scheduler, config: PluginConfig):
+    def __init__(
+        self,
+        scheduler: Scheduler,
+        config: PluginConfig,
+        disk_activity_monitor: DiskActivityMonitor,
+        spin_down_monitor: SpinDownMonitor,
+        # None unless disks of enclosures should be spun down together
+        spin_down_coordinator: Optional[SpinDownCoordinator] = None,
+        # Tells identities of disks that don't change when disks are renamed
+        disk_presence_monitor: Optional[DiskPresenceMonitor] = None,
+    ):
         self._scheduler = scheduler
         self._config = config
+        self._disk_activity_monitor = disk_activity_monitor
+        self._spin_down_monitor = spin_down_monitor
+        self._spin_down_coordinator = spin_down_coordinator
+        self._disk_presence_monitor = disk_presence_monitor
 
     @abstractmethod
     def create_plugin(self, device_name: str, disk_path: str) -> Plugin:
         raise NotImplementedError()
+
+    def _disk_id(self, device_name: str) -> Optional[str]:
+        """Returns the identity of the disk to keep its state under, if known"""
+        if self._disk_presence_monitor is None:
+            return None
+        return self._disk_presence_monitor.identity(device_name)
@@ -1,9 +1,21 @@
+from typing import Optional
+import time
+
 from ..lib import human_readable
 from ..lib import shell
+from ..lib.disk_activity_monitor import DiskActivityMonitor
 from ..lib.error_handling import log_exceptions
+from ..lib.idle_delay_learner import IdleDelayLearner
 from ..lib.logger import LOGGER as logger
 from ..lib.scheduler import Scheduler
-from .base import Plugin, PluginFactory, PluginConfig
+from ..lib.spin_down_coordinator import SpinDownCoordinator
+from ..lib.spin_down_monitor import SpinDownMonitor
+from ..lib.state_store import StateStore
+from ..lib.writeback import DiskWriteback
+from .base import Plugin, PluginFactory, PluginConfig, PluginStatus
+
+
+_DEFAULT_STATE_DIR = "/var/lib/hdmon"
 
 
 class Factory(PluginFactory):
@@ -11,12 +23,18 @@ class Factory(PluginFactory):
         return OnceIdle(
             device_name=device_name,
             disk_path=disk_path,
+            disk_id=self._disk_id(device_name),
             scheduler=self._scheduler,
             config=self._config,
+            disk_activity_monitor=self._disk_activity_monitor,
+            spin_down_monitor=self._spin_down_monitor,
+            spin_down_coordinator=self._spin_down_coordinator,
         )
 
 
 class OnceIdle(Plugin):
+    api_version = 4
+
     def __init__(
         self,
         *,
@@ -24,10 +42,21 @@ class OnceIdle(Plugin):
         disk_path: str,
         scheduler: Scheduler,
         config: PluginConfig,
+        disk_activity_monitor: DiskActivityMonitor,
+        spin_down_monitor: SpinDownMonitor,
+        spin_down_coordinator: Optional[SpinDownCoordinator] = None,
+        disk_id: Optional[str] = None,
     ):
         self._device_name = device_name
         self._disk_path = disk_path
+        # Keeps learned state of the disk across renames and restarts
+        self._disk_id = disk_id or device_name
         self._scheduler = scheduler
+        self._disk_activity_monitor = disk_activity_monitor
+        self._spin_down_monitor = spin_down_monitor
+        self._spin_down_coordinator = spin_down_coordinator
+        if spin_down_coordinator is not None:
+            spin_down_coordinator.add_member(device_name)
         human_readable_delay = config["delay"]
         self._delay = human_readable.duration_to_seconds(human_readable_delay)
         self._command = config["run"]
@@ -38,31 +67,197 @@ class OnceIdle(Plugin):
             human_readable_delay,
             self._command,
         )
+        self._idle_since: Optional[float] = None
+        self._learner: Optional[IdleDelayLearner] = None
+        self._state_store: Optional[StateStore] = None
+        adaptive_config = config.get("adaptive")
+        if adaptive_config is not None:
+            self._init_learner(adaptive_config)
+        self._writeback: Optional[DiskWriteback] = None
+        self._writeback_retries = 0
+        writeback_config = config.get("writeback")
+        if writeback_config is not None:
+            self._init_writeback_gate(writeback_config or {})
+
+    @property
+    def delay(self) -> float:
+        if self._learner is not None:
+            return self._learner.delay
+        return self._delay
 
     @log_exceptions
     def on_disk_active(self):
         self._cancel_timer()
+        self._writeback_retries = 0
+        if self._spin_down_coordinator is not None:
+            self._spin_down_coordinator.on_disk_active(self._device_name)
+        self._learn_idle_gap()
 
     @log_exceptions
     def on_disk_idle(self):
-        self._set_timer()
+        now = time.monotonic()
+        # Polls notice idle disks late, traced I/O tells when it has stopped
+        last_io_time = self._disk_activity_monitor.last_io_time(self._device_name)
+        self._idle_since = now if last_io_time is None else min(last_io_time, now)
+        self._set_timer(max(self.delay - (now - self._idle_since), 0))
 
     @log_exceptions
     def on_disk_removed(self):
         self._cancel_timer()
+        self._idle_since = None
+        if self._spin_down_coordinator is not None:
+            self._spin_down_coordinator.remove_member(self._device_name)
+        if self._learner is not None:
+            self._add_observation_time()
+            self._save_learner_state()
+
+    @log_exceptions
+    def on_disk_renamed(self, device_name: str, disk_path: str):
+        if self._spin_down_coordinator is not None:
+            self._spin_down_coordinator.remove_member(self._device_name)
+            self._spin_down_coordinator.add_member(device_name)
+        self._device_name = device_name
+        self._disk_path = disk_path
+        if self._writeback is not None:
+            self._writeback = DiskWriteback(device_name)
+
+    def get_status(self) -> PluginStatus:
+        return {
+            "delay": self.delay,
+            "idle_for": None
+            if self._idle_since is None
+            else time.monotonic() - self._idle_since,
+        }
 
     @log_exceptions
     def _on_timer(self):
         self._timer_id = None
-        shell.run(self._command, env={"disk_path": self._disk_path})
+        if not self._is_writeback_done():
+            self._timer_id = self._scheduler.set_timer(
+                self._writeback_retry_delay, self._on_timer
+            )
+            return
+        if self._spin_down_coordinator is None:
+            self._spin_down()
+        else:
+            self._spin_down_coordinator.request_spin_down(
+                self._device_name, self._spin_down
+            )
         # Set the timer again to turn off the disk if some undetected activity spun it up.
         self._set_timer()
 
-    def _set_timer(self):
+    @log_exceptions
+    def _spin_down(self):
+        if shell.run(self._command, env={"disk_path": self._disk_path}):
+            self._spin_down_monitor.notify_spun_down(self._device_name)
+        else:
+            self._spin_down_monitor.notify_spin_down_failed(self._device_name)
+
+    def _set_timer(self, delay: Optional[float] = None):
         assert self._timer_id is None
-        self._timer_id = self._scheduler.set_timer(self._delay, self._on_timer)
+        self._timer_id = self._scheduler.set_timer(
+            self.delay if delay is None else delay, self._on_timer
+        )
 
     def _cancel_timer(self):
         if self._timer_id is not None:
             self._scheduler.clear_timer(self._timer_id)
             self._timer_id = None
+
+    def _init_writeback_gate(self, writeback_config: PluginConfig):
+        # Created along with the plugin, i.e. on hotplug
+        self._writeback = DiskWriteback(self._device_name)
+        self._writeback_retry_delay = human_readable.duration_to_seconds(
+            writeback_config.get("retry_delay", "10s")
+        )
+        self._max_writeback_retries = int(writeback_config.get("max_retries", 6))
+
+    def _is_writeback_done(self) -> bool:
+        """Flushes dirty data that would wake the disk up right after spin-down"""
+        if self._writeback is None or self._writeback.pending_kb() == 0:
+            return True
+        # Unknown amount of dirty data is flushed too, syncing a clean
+        # filesystem is cheap
+        # Arrays the disk belongs to are followed instead of the disk itself
+        for device_name, sectors_written in self._writeback.sync().items():
+            self._disk_activity_monitor.ignore_sectors_written(
+                device_name, sectors_written
+            )
+        pending_kb = self._writeback.pending_kb()
+        if not pending_kb:
+            self._writeback_retries = 0
+            return True
+        if self._writeback_retries >= self._max_writeback_retries:
+            logger.warning(
+                "%s still has %d KiB to write back, running the command anyway",
+                self._device_name,
+                pending_kb,
+            )
+            self._writeback_retries = 0
+            return True
+        self._writeback_retries += 1
+        logger.info(
+            "%s has %d KiB to write back, will retry in %s",
+            self._device_name,
+            pending_kb,
+            human_readable.seconds_to_duration(self._writeback_retry_delay),
+        )
+        return False
+
+    def _init_learner(self, adaptive_config: PluginConfig):
+        self._learner = IdleDelayLearner(
+            max_spin_ups_per_day=float(adaptive_config["max_spin_ups_per_day"]),
+            min_delay=human_readable.duration_to_seconds(
+                adaptive_config.get("min_delay", "10m")
+            ),
+            max_delay=human_readable.duration_to_seconds(
+                adaptive_config.get("max_delay", "1d")
+            ),
+            initial_delay=self._delay,
+        )
+        self._state_store = StateStore(
+            adaptive_config.get("state_dir", _DEFAULT_STATE_DIR)
+        )
+        state = self._state_store.load(self._state_name)
+        if state is not None:
+            self._learner.load_state(state)
+        self._observed_since = time.monotonic()
+        self._log_delay()
+
+    def _learn_idle_gap(self):
+        if self._learner is None:
+            return
+        now = self._add_observation_time()
+        # Disks can be busy many times a minute, only idle gaps are worth saving
+        is_learned = False
+        if self._idle_since is not None:
+            self._learner.add_idle_gap(now - self._idle_since)
+            self._idle_since = None
+            is_learned = True
+        if self._learner.update_delay():
+            self._log_delay()
+            is_learned = True
+        if is_learned:
+            self._save_learner_state()
+
+    def _add_observation_time(self) -> float:
+        """Returns the current time"""
+        now = time.monotonic()
+        self._learner.add_observation_time(now - self._observed_since)
+        self._observed_since = now
+        return now
+
+    def _save_learner_state(self):
+        self._state_store.save(self._state_name, self._learner.to_state())
+
+    def _log_delay(self):
+        logger.info(
+            "Idle delay for %s is %s%s",
+            self._device_name,
+            human_readable.seconds_to_duration(self._learner.delay),
+            "" if self._learner.is_trained else " (still learning)",
+        )
+
+    @property
+    def _state_name(self) -> str:
+        return f"once_idle-{self._disk_id}"
@@ -0,0 +1,268 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Deque, List, Optional
+import datetime
+import logging
+import time
+
+from ..lib import human_readable
+from ..lib.access_predictor import AccessPredictor
+from ..lib.disk_activity_monitor import DiskActivityMonitor
+from ..lib.error_handling import log_exceptions
+from ..lib.logger import LOGGER as logger
+from ..lib.scheduler import Scheduler
+from ..lib.state_store import StateStore
+from ..lib.wake import WAKE_SECTORS, wake_disk
+from .base import Plugin, PluginFactory, PluginConfig, PluginStatus
+
+
+_DEFAULT_STATE_DIR = "/var/lib/hdmon"
+_SLOT_SECONDS = 15 * 60
+# Activity is noticed on the next poll only
+_DETECTION_DELAY = 60
+# Number of recent predictions and wake ups to estimate precision and recall
+_HISTORY_SIZE = 20
+_MIN_PREDICTIONS_TO_JUDGE = 5
+
+
+class Factory(PluginFactory):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._group: Optional[_DiskGroup] = None
+        self._state_store = StateStore(
+            self._config.get("state_dir", _DEFAULT_STATE_DIR)
+        )
+
+    def create_plugin(self, device_name: str, disk_path: str) -> Plugin:
+        lead = human_readable.duration_to_seconds(self._config.get("lead", "2m"))
+        if self._group is None:
+            self._group = _DiskGroup(
+                scheduler=self._scheduler,
+                disk_activity_monitor=self._disk_activity_monitor,
+                lead=lead,
+                max_parallel=int(self._config.get("max_parallel", 8)),
+            )
+        plugin = Prespin(
+            device_name=device_name,
+            disk_path=disk_path,
+            disk_id=self._disk_id(device_name),
+            config=self._config,
+            lead=lead,
+            state_store=self._state_store,
+        )
+        self._group.add(plugin)
+        return plugin
+
+
+class Prespin(Plugin):
+    """Learns when a disk gets woken up and predicts next wake ups.
+
+    Tracks its own precision and recall, stops waking the disk up if too many
+    predictions turn out wrong and starts again once predictions improve.
+    """
+
+    api_version = 4
+
+    def __init__(
+        self,
+        *,
+        device_name: str,
+        disk_path: str,
+        config: PluginConfig,
+        lead: float,
+        state_store: StateStore,
+        disk_id: Optional[str] = None,
+    ):
+        self.device_name = device_name
+        self.disk_path = disk_path
+        # Keeps learned state of the disk across renames and restarts
+        self._disk_id = disk_id or device_name
+        self._lead = lead
+        self._min_idle = human_readable.duration_to_seconds(
+            config.get("min_idle", "10m")
+        )
+        self._min_precision = float(config.get("min_precision", 0.5))
+        self._state_store = state_store
+        self._predictor = AccessPredictor(slot_seconds=_SLOT_SECONDS)
+        state = self._state_store.load(self._state_name)
+        if state is not None:
+            self._predictor.load_state(state)
+        self.is_removed = False
+        self._is_enabled = True
+        self._idle_since: Optional[float] = None
+        self._prediction_deadline: Optional[float] = None
+        # True for predictions followed by a wake up
+        self._predictions: Deque[bool] = deque(maxlen=_HISTORY_SIZE)
+        # True for predicted wake ups
+        self._wake_ups: Deque[bool] = deque(maxlen=_HISTORY_SIZE)
+        logger.info(
+            "Will pre-spin %s %s before predicted access",
+            device_name,
+            human_readable.seconds_to_duration(lead),
+        )
+
+    @property
+    def precision(self) -> Optional[float]:
+        return _ratio(self._predictions)
+
+    @property
+    def recall(self) -> Optional[float]:
+        return _ratio(self._wake_ups)
+
+    @log_exceptions
+    def on_disk_active(self):
+        now = time.monotonic()
+        if self._idle_since is not None and now - self._idle_since >= self._min_idle:
+            self._on_wake_up(now)
+        self._idle_since = None
+
+    @log_exceptions
+    def on_disk_idle(self):
+        self._idle_since = time.monotonic()
+
+    @log_exceptions
+    def on_disk_removed(self):
+        self.is_removed = True
+        self._idle_since = None
+
+    @log_exceptions
+    def on_disk_renamed(self, device_name: str, disk_path: str):
+        self.device_name = device_name
+        self.disk_path = disk_path
+
+    def get_status(self) -> PluginStatus:
+        return {
+            "enabled": self._is_enabled,
+            "precision": self.precision,
+            "recall": self.recall,
+        }
+
+    def predict(self, slot_start: float) -> bool:
+        """Returns True if the disk should be woken up before the slot starts"""
+        now = time.monotonic()
+        self._expire_prediction(now)
+        if self._idle_since is None or self._prediction_deadline is not None:
+            return False
+        if not self._predictor.is_access_expected(slot_start):
+            return False
+        self._prediction_deadline = now + self._lead + _SLOT_SECONDS + _DETECTION_DELAY
+        return self._is_enabled
+
+    def _on_wake_up(self, now: float):
+        self._expire_prediction(now)
+        is_predicted = self._prediction_deadline is not None
+        if is_predicted:
+            self._prediction_deadline = None
+            self._predictions.append(True)
+        self._wake_ups.append(is_predicted)
+        self._predictor.record_access(time.time())
+        self._state_store.save(self._state_name, self._predictor.to_state())
+        self._update_is_enabled()
+
+    def _expire_prediction(self, now: float):
+        if self._prediction_deadline is not None and now > self._prediction_deadline:
+            self._prediction_deadline = None
+            self._predictions.append(False)
+            self._update_is_enabled()
+
+    def _update_is_enabled(self):
+        if len(self._predictions) < _MIN_PREDICTIONS_TO_JUDGE:
+            return
+        is_precise = self.precision >= self._min_precision
+        if is_precise == self._is_enabled:
+            return
+        self._is_enabled = is_precise
+        logger.log(
+            logging.INFO if is_precise else logging.WARNING,
+            "Pre-spin of %s is %s, precision %.0f%%, recall %.0f%%",
+            self.device_name,
+            "on" if is_precise else "off",
+            self.precision * 100,
+            (self.recall or 0) * 100,
+        )
+
+    @property
+    def _state_name(self) -> str:
+        return f"prespin-{self._disk_id}"
+
+
+class _DiskGroup:
+    """Wakes up disks of a profile in parallel shortly before predicted access"""
+
+    def __init__(
+        self,
+        *,
+        scheduler: Scheduler,
+        disk_activity_monitor: DiskActivityMonitor,
+        lead: float,
+        max_parallel: int,
+    ):
+        self._scheduler = scheduler
+        self._disk_activity_monitor = disk_activity_monitor
+        self._lead = lead
+        self._max_parallel = max_parallel
+        self._plugins: List[Prespin] = []
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._scheduler.set_timer(
+            _SLOT_SECONDS - _seconds_into_slot(time.time() + lead), self._on_timer
+        )
+
+    def add(self, plugin: Prespin):
+        self._plugins.append(plugin)
+
+    @log_exceptions
+    def _on_timer(self):
+        timestamp = time.time() + self._lead
+        offset = _seconds_into_slot(timestamp)
+        if offset > _SLOT_SECONDS / 2:  # the timer fired a bit early
+            offset -= _SLOT_SECONDS
+        slot_start = timestamp - offset
+        self._scheduler.set_timer(
+            max(slot_start + _SLOT_SECONDS - self._lead - time.time(), 0),
+            self._on_timer,
+        )
+
+        self._plugins = [plugin for plugin in self._plugins if not plugin.is_removed]
+        # Add a second to be safely inside the slot
+        plugins = [plugin for plugin in self._plugins if plugin.predict(slot_start + 1)]
+        if plugins:
+            self._wake_up(plugins)
+
+    def _wake_up(self, plugins: List[Prespin]):
+        logger.info(
+            "Pre-spinning %s", ", ".join(plugin.device_name for plugin in plugins)
+        )
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self._max_parallel, thread_name_prefix="prespin"
+            )
+        for plugin in plugins:
+            # Our own read shouldn't look like the predicted access
+            self._disk_activity_monitor.ignore_sectors_read(
+                plugin.device_name, WAKE_SECTORS
+            )
+            self._executor.submit(_wake_up_disk, plugin.device_name, plugin.disk_path)
+
+
+@log_exceptions
+def _wake_up_disk(device_name: str, disk_path: str):
+    """Runs in a worker thread"""
+    latency = wake_disk(disk_path)
+    logger.info("%s responded in %.1fs", device_name, latency)
+
+
+def _seconds_into_slot(timestamp: float) -> float:
+    moment = datetime.datetime.fromtimestamp(timestamp)
+    seconds = (
+        moment.hour * 3600
+        + moment.minute * 60
+        + moment.second
+        + moment.microsecond / 1e6
+    )
+    return seconds % _SLOT_SECONDS
+
+
+def _ratio(outcomes: Deque[bool]) -> Optional[float]:
+    if not outcomes:
+        return None
+    return sum(outcomes) / len(outcomes)
@@ -0,0 +1,172 @@
+from dataclasses import asdict, dataclass
+from typing import Dict, Optional
+import time
+
+from ..lib import human_readable
+from ..lib.activity_rules import ActivityRules
+from ..lib.disk_activity_monitor import DiskActivityMonitor, DiskSnapshot
+from ..lib.error_handling import log_exceptions
+from ..lib.logger import LOGGER as logger
+from ..lib.scheduler import Scheduler
+from ..lib.spin_down_monitor import SpinDownObserver
+from .base import Plugin, PluginFactory, PluginConfig, PluginStatus
+
+
+class Factory(PluginFactory, SpinDownObserver):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        activity_config = self._config.get("activity")
+        self._activity_rules = (
+            ActivityRules.from_config(activity_config) if activity_config else None
+        )
+        self._plugins: Dict[str, Shadow] = {}
+        self._spin_down_monitor.add_observer(self)
+
+    def create_plugin(self, device_name: str, disk_path: str) -> Plugin:
+        plugin = Shadow(
+            device_name=device_name,
+            scheduler=self._scheduler,
+            config=self._config,
+            activity_rules=self._activity_rules,
+            disk_activity_monitor=self._disk_activity_monitor,
+            plugins=self._plugins,
+        )
+        self._plugins[device_name] = plugin
+        return plugin
+
+    @log_exceptions
+    def on_disk_spun_down(self, device_name: str):
+        plugin = self._plugins.get(device_name)
+        if plugin is not None:
+            plugin.on_live_spin_down()
+
+
+@dataclass
+class _Standbys:
+    """Spin-downs of a policy and wake-ups that followed them"""
+
+    spin_downs: int = 0
+    wake_ups: int = 0
+    standby_seconds: float = 0.0
+    standby_since: Optional[float] = None
+
+    def spin_down(self, now: float) -> bool:
+        """Returns False if the disk is already in standby"""
+        if self.standby_since is not None:
+            return False
+        self.spin_downs += 1
+        self.standby_since = now
+        return True
+
+    def wake_up(self, now: float, io_time: float):
+        if self.standby_since is None or io_time <= self.standby_since:
+            return
+        self.wake_ups += 1
+        self.standby_seconds += now - self.standby_since
+        self.standby_since = None
+
+    def get_status(self, now: float) -> Dict[str, float]:
+        status = asdict(self)
+        del status["standby_since"]
+        if self.standby_since is not None:
+            status["standby_seconds"] += now - self.standby_since
+        return status
+
+
+class Shadow(Plugin):
+    """Evaluates an idle delay and activity rules without acting.
+
+    Works like once_idle but only records when it would have run the command.
+    Any I/O after a spin-down counts as a wake-up, both for spin-downs of the
+    shadow and for spin-downs of the live policy, so the two can be compared.
+    Activity is detected by the same polls as for the live policy.
+    """
+
+    api_version = 4
+
+    def __init__(
+        self,
+        *,
+        device_name: str,
+        scheduler: Scheduler,
+        config: PluginConfig,
+        activity_rules: Optional[ActivityRules],
+        disk_activity_monitor: DiskActivityMonitor,
+        plugins: Dict[str, "Shadow"],  # of the factory, by device name
+    ):
+        self._device_name = device_name
+        self._plugins = plugins
+        self._scheduler = scheduler
+        self._disk_activity_monitor = disk_activity_monitor
+        self.activity_rules = activity_rules
+        self._delay = human_readable.duration_to_seconds(config["delay"])
+        self._timer_id = None
+        self._shadow = _Standbys()
+        self._live = _Standbys()
+        logger.info(
+            "Shadow policy for %s: idle for %s",
+            device_name,
+            human_readable.seconds_to_duration(self._delay),
+        )
+
+    @log_exceptions
+    def on_disk_active(self):
+        self._cancel_timer()
+
+    @log_exceptions
+    def on_disk_idle(self):
+        now = time.monotonic()
+        last_io_time = self._disk_activity_monitor.last_io_time(self._device_name)
+        idle_since = now if last_io_time is None else min(last_io_time, now)
+        self._set_timer(max(self._delay - (now - idle_since), 0))
+
+    @log_exceptions
+    def on_disk_removed(self):
+        self._cancel_timer()
+
+    @log_exceptions
+    def on_disk_renamed(self, device_name: str, disk_path: str):
+        if self._plugins.get(self._device_name) is self:
+            del self._plugins[self._device_name]
+        self._plugins[device_name] = self
+        self._device_name = device_name
+
+    @log_exceptions
+    def on_poll(self, snapshot: DiskSnapshot):
+        if not (snapshot.deltas.sectors_read or snapshot.deltas.sectors_written):
+            return
+        now = time.monotonic()
+        # Without tracing I/O is only known to have happened since the previous
+        # poll, e.g. writeback that preceded a spin-down
+        last_io_time = self._disk_activity_monitor.last_io_time(self._device_name)
+        io_time = now - snapshot.interval if last_io_time is None else last_io_time
+        self._shadow.wake_up(now, io_time)
+        self._live.wake_up(now, io_time)
+
+    def on_live_spin_down(self):
+        self._live.spin_down(time.monotonic())
+
+    def get_status(self) -> PluginStatus:
+        now = time.monotonic()
+        return {
+            "delay": self._delay,
+            "shadow": self._shadow.get_status(now),
+            "live": self._live.get_status(now),
+        }
+
+    @log_exceptions
+    def _on_timer(self):
+        self._timer_id = None
+        if self._shadow.spin_down(time.monotonic()):
+            logger.info("Shadow policy would spin down %s", self._device_name)
+        # Like once_idle, in case undetected activity spun the disk up
+        self._set_timer(self._delay)
+
+    def _set_timer(self, delay: float):
+        self._cancel_timer()
+        self._timer_id = self._scheduler.set_timer(delay, self._on_timer)
+
+    def _cancel_timer(self):
+        if self._timer_id is not None:
+            self._scheduler.clear_timer(self._timer_id)
+            self._timer_id = None
@@ -0,0 +1,101 @@
+from typing import Optional
+import time
+
+from ..lib import human_readable
+from ..lib import shell
+from ..lib import smart
+from ..lib.error_handling import log_exceptions
+from ..lib.logger import LOGGER as logger
+from ..lib.scheduler import Scheduler
+from ..lib.ttl_cache import TtlCache
+from .base import Plugin, PluginFactory, PluginConfig, PluginStatus
+
+
+class Factory(PluginFactory):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._config = self._config or {}
+        self._cache: TtlCache[str, smart.SmartData] = TtlCache(
+            human_readable.duration_to_seconds(self._config.get("ttl", "1d"))
+        )
+
+    def create_plugin(self, device_name: str, disk_path: str) -> Plugin:
+        return Smart(
+            device_name=device_name,
+            disk_path=disk_path,
+            scheduler=self._scheduler,
+            config=self._config,
+            cache=self._cache,
+        )
+
+
+class Smart(Plugin):
+    """Reads SMART data of a disk while it's busy, so it never wakes the disk up.
+
+    Results are cached and served to status requests without touching the disk.
+    """
+
+    def __init__(
+        self,
+        *,
+        device_name: str,
+        disk_path: str,
+        scheduler: Scheduler,
+        config: PluginConfig,
+        cache: TtlCache[str, smart.SmartData],
+    ):
+        self._device_name = device_name
+        self._disk_path = disk_path
+        self._scheduler = scheduler
+        self._interval = human_readable.duration_to_seconds(
+            config.get("interval", "1h")
+        )
+        self._smartctl = config.get("smartctl", "smartctl")
+        self._cache = cache
+        self._timer_id = None
+        self._last_check_time: Optional[float] = None
+
+    @log_exceptions
+    def on_disk_active(self):
+        if self._timer_id is not None:
+            return
+        delay = 0.0
+        if self._last_check_time is not None:
+            delay = max(self._last_check_time + self._interval - time.monotonic(), 0)
+        self._timer_id = self._scheduler.set_timer(delay, self._on_timer)
+
+    @log_exceptions
+    def on_disk_idle(self):
+        self._cancel_timer()
+
+    @log_exceptions
+    def on_disk_removed(self):
+        self._cancel_timer()
+
+    def get_status(self) -> PluginStatus:
+        return {
+            "age": self._cache.age(self._device_name),
+            "smart": self._cache.get(self._device_name),
+        }
+
+    @log_exceptions
+    def _on_timer(self):
+        self._timer_id = self._scheduler.set_timer(self._interval, self._on_timer)
+        self._last_check_time = time.monotonic()
+        result = shell.run_and_capture(
+            smart.build_command(self._smartctl, self._disk_path)
+        )
+        if result is None:
+            return
+        data = smart.parse_output(*result)
+        if data is None:
+            logger.warning("Cannot read SMART data of %s", self._device_name)
+            return
+        self._cache.set(self._device_name, data)
+        if data.get("passed") is False:
+            logger.warning("SMART health check of %s has failed", self._device_name)
+
+    def _cancel_timer(self):
+        if self._timer_id is not None:
+            self._scheduler.clear_timer(self._timer_id)
+            self._timer_id = None
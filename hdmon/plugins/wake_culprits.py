@@ -0,0 +1,105 @@
+from typing import List, Optional, Tuple
+
+from ..lib import human_readable
+from ..lib.cgroup_io import CgroupIoSampler, device_number
+from ..lib.error_handling import log_exceptions
+from ..lib.logger import LOGGER as logger
+from ..lib.process_io import ProcessIoBaseline, ProcessIoSampler
+from .base import Plugin, PluginFactory, PluginConfig, PluginStatus
+
+
+class Factory(PluginFactory):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._config = self._config or {}
+        self._process_sampler: Optional[ProcessIoSampler] = None
+        if self._config.get("processes", False):
+            # Process counters aren't per disk, so all disks share them
+            self._process_sampler = ProcessIoSampler(
+                max_reads=int(self._config.get("max_processes", 500))
+            )
+
+    def create_plugin(self, device_name: str, disk_path: str) -> Plugin:
+        return WakeCulprits(
+            device_name=device_name,
+            disk_path=disk_path,
+            config=self._config,
+            process_sampler=self._process_sampler,
+        )
+
+
+class WakeCulprits(Plugin):
+    """Logs who woke a disk up.
+
+    Takes a baseline when the disk goes idle and compares it with the current
+    state when the disk becomes busy, so nothing is done on regular polls.
+    """
+
+    def __init__(
+        self,
+        *,
+        device_name: str,
+        disk_path: str,
+        config: PluginConfig,
+        process_sampler: Optional[ProcessIoSampler],
+    ):
+        self._device_name = device_name
+        self._top = int(config.get("top", 3))
+        self._cgroup_sampler: Optional[CgroupIoSampler] = None
+        if config.get("cgroups", True):
+            self._cgroup_sampler = CgroupIoSampler(
+                device_number(disk_path), config.get("cgroup_root", "/sys/fs/cgroup")
+            )
+        self._process_sampler = process_sampler
+        self._process_baseline: Optional[ProcessIoBaseline] = None
+        self.last_cgroups: List[Tuple[str, int]] = []
+        self.last_processes: List[Tuple[int, str, int]] = []
+
+    @log_exceptions
+    def on_disk_active(self):
+        if self._cgroup_sampler is not None:
+            self.last_cgroups = self._cgroup_sampler.find_top_contributors(self._top)
+            if self.last_cgroups:
+                logger.info(
+                    "%s has been woken up by %s",
+                    self._device_name,
+                    ", ".join(
+                        f"{cgroup} ({human_readable.bytes_to_size(size)})"
+                        for cgroup, size in self.last_cgroups
+                    ),
+                )
+        if self._process_sampler is not None and self._process_baseline is not None:
+            self.last_processes = self._process_sampler.find_top_contributors(
+                self._process_baseline, self._top
+            )
+            if self.last_processes:
+                logger.info(
+                    "%s has been woken up by %s",
+                    self._device_name,
+                    ", ".join(
+                        f'{pid} "{command}" ({human_readable.bytes_to_size(size)})'
+                        for pid, command, size in self.last_processes
+                    ),
+                )
+
+    def get_status(self) -> PluginStatus:
+        return {
+            "cgroups": [
+                {"cgroup": cgroup, "bytes": size} for cgroup, size in self.last_cgroups
+            ],
+            "processes": [
+                {"pid": pid, "command": command, "bytes": size}
+                for pid, command, size in self.last_processes
+            ],
+        }
+
+    @log_exceptions
+    def on_disk_idle(self):
+        if self._cgroup_sampler is not None:
+            self._cgroup_sampler.take_baseline()
+        if self._process_sampler is not None:
+            self._process_baseline = self._process_sampler.take_baseline()
+
+    @log_exceptions
+    def on_disk_removed(self):
+        pass
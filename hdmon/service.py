@@ -6,33 +6,120 @@ Disk monitoring and power management service
 
 
 from dataclasses import dataclass
-from typing import Iterator, List, Iterable, Iterator, Any, Dict
+from typing import Iterator, List, Iterable, Iterator, Any, Dict, Optional, Tuple
 import argparse
+import json
 import os
-import yaml
+import time
 
 from . import plugins
-from .lib.disk_activity_monitor import DiskActivityMonitor
+from .lib import control, systemd
+from .lib.activity_rules import ActivityRules
+from .lib.block_topology import BlockTopology
+from .lib.block_trace import BlockTraceSource
+from .lib.disk_activity_monitor import DiskActivityMonitor, DiskActivityObserver
+from .lib.disk_identity import DiskIdentityResolver
 from .lib.disk_presence_monitor import DiskPresenceMonitor, DiskPresenceObserver
-from .lib.disk_stats_monitor import DiskStatsMonitor
+from .lib.disk_stats_monitor import DiskStatsMonitor, DiskStatsObserver
+from .lib.disk_stats import DeviceNameAndCounters
+from .lib.disk_status_publisher import DiskStatusPublisher
 from .lib.error_handling import Error, UsageError, log_exceptions
+from .lib.event_history import (
+    HISTORY_FILE_PATH,
+    PERSISTENT_HISTORY_FILE_PATH,
+    EventHistoryWriter,
+    read_events,
+    summarize,
+)
+from .lib.human_readable import (
+    bytes_to_size,
+    duration_to_seconds,
+    seconds_to_duration,
+)
 from .lib.logger import LOGGER as logger, log_current_exception
 from .lib.scheduler import Scheduler
-from .plugins.base import PluginFactory
+from .lib.spin_down_coordinator import SpinDownCoordinator
+from .lib.spin_down_monitor import SpinDownMonitor
+from .lib.spin_up_monitor import SpinUpMonitor
+from .lib.status_file import STATUS_FILE_PATH, StatusFileWriter
+from .lib.throughput_history import ARCHIVES, ThroughputHistory
+from .plugins.base import PLUGIN_API_VERSION, Plugin, PluginFactory
 
 
 CONFIG_PATH = "/etc/hdmon.yml"
+CONTROL_SOCKET_PATH = "/run/hdmon/control.sock"
+
+_DEFAULT_MAX_PARALLEL_WAKES = 8
+_HISTORY_PERSIST_INTERVAL = 60 * 60  # 1 hour
 
 
 def parse_args():
     parser = argparse.ArgumentParser(__doc__)
 
     parser.add_argument("-c", "--config", default=None, help="configuration file path")
+    parser.add_argument(
+        "-s", "--socket", default=CONTROL_SOCKET_PATH, help="control socket path"
+    )
+
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.add_parser("run", help="run the service (default)")
+    wake_parser = subparsers.add_parser(
+        "wake", help="wake up disks in parallel and wait until they respond"
+    )
+    wake_parser.add_argument(
+        "targets",
+        nargs="+",
+        metavar="profile|disk",
+        help="profile name or number, name or path of a monitored disk",
+    )
+    wake_parser.add_argument(
+        "--max-parallel",
+        type=int,
+        default=_DEFAULT_MAX_PARALLEL_WAKES,
+        help="maximum number of disks to wake up at once",
+    )
+
+    status_parser = subparsers.add_parser(
+        "status", help="print cached state of disks without touching them"
+    )
+    status_parser.add_argument(
+        "disks", nargs="*", metavar="disk", help="disk names, all disks by default"
+    )
+    history_parser = subparsers.add_parser(
+        "history", help="print spin-downs and idle periods of disks"
+    )
+    history_parser.add_argument(
+        "disks", nargs="*", metavar="disk", help="disk names, all disks by default"
+    )
+    history_parser.add_argument(
+        "--since", default=None, help="how long ago to start, e.g. 7d"
+    )
+    history_parser.add_argument(
+        "--until", default=None, help="how long ago to stop, e.g. 1d"
+    )
+    history_parser.add_argument(
+        "--file", default=HISTORY_FILE_PATH, help="history file path"
+    )
+    throughput_parser = subparsers.add_parser(
+        "throughput", help="print read and write rates of disks"
+    )
+    throughput_parser.add_argument(
+        "disks", nargs="*", metavar="disk", help="disk names, all disks by default"
+    )
+    throughput_parser.add_argument(
+        "--period", choices=list(ARCHIVES), default="hour", help="time span"
+    )
+
+    subparsers.add_parser(
+        "metrics", help="print spin-up metrics in Prometheus text format"
+    )
 
     return parser.parse_args()
 
 
 def load_config(path):
+    import yaml
+
     with open(path) as fh:
         return yaml.safe_load(fh)
 
@@ -40,8 +127,10 @@ def load_config(path):
 @dataclass(frozen=True)
 class _Profile:
     profile_id: int
+    name: Optional[str]
     disk_patterns: List[str]
-    plugin_factories: List[PluginFactory]
+    activity_rules: ActivityRules
+    plugin_factories: Dict[str, PluginFactory]
 
 
 @dataclass
@@ -51,21 +140,78 @@ class _MonitoredDisk:
     profile: _Profile
 
 
-class DiskMonitoringService(DiskPresenceObserver):
-    def __init__(self, config):
+@dataclass
+class _DiskMonitoring:
+    disk: _MonitoredDisk
+    activity_device_name: str  # the disk itself or an array it belongs to
+    plugins: Dict[str, Plugin]
+    status_observer: DiskActivityObserver
+
+
+class DiskMonitoringService(DiskPresenceObserver, DiskStatsObserver):
+    def __init__(
+        self,
+        config,
+        control_socket_path=CONTROL_SOCKET_PATH,
+        status_file_path=STATUS_FILE_PATH,
+        history_file_path=HISTORY_FILE_PATH,
+        persistent_history_file_path=PERSISTENT_HISTORY_FILE_PATH,
+    ):
         logger.debug("Debug mode is ON")
 
         self._scheduler = Scheduler()
 
         self._disk_stats_monitor = DiskStatsMonitor(scheduler=self._scheduler)
-        self._disk_presence_monitor = DiskPresenceMonitor()
+        self._disk_presence_monitor = DiskPresenceMonitor(
+            identity_resolver=DiskIdentityResolver()
+        )
         self._disk_activity_monitor = DiskActivityMonitor()
+        self._spin_down_monitor = SpinDownMonitor()
+        self._status_file_writer = StatusFileWriter(status_file_path)
+        self._event_history_writer = EventHistoryWriter(
+            history_file_path, persistent_history_file_path
+        )
+        self._disk_status_publisher = DiskStatusPublisher(
+            self._status_file_writer, self._event_history_writer
+        )
 
         self._disk_stats_monitor.add_observer(self._disk_presence_monitor)
         self._disk_stats_monitor.add_observer(self._disk_activity_monitor)
+        self._disk_stats_monitor.add_observer(self._disk_status_publisher)
+        self._spin_down_monitor.add_observer(self._disk_status_publisher)
+        self._spin_up_monitor = SpinUpMonitor(scheduler=self._scheduler)
+        self._spin_down_monitor.add_observer(self._spin_up_monitor)
+        self._disk_stats_monitor.add_observer(self._spin_up_monitor)
+        self._block_trace: Optional[BlockTraceSource] = None
+        if config.get("trace_block_io", False):
+            self._block_trace = BlockTraceSource(
+                scheduler=self._scheduler, observer=self._disk_activity_monitor
+            )
+            self._block_trace.add_observer(self._spin_up_monitor)
+
+        self._block_topology = BlockTopology()
+        self._spin_down_coordinator: Optional[SpinDownCoordinator] = None
+        enclosures_config = config.get("enclosures")
+        if enclosures_config is not None:
+            enclosures_config = enclosures_config or {}
+            self._spin_down_coordinator = SpinDownCoordinator(
+                scheduler=self._scheduler,
+                block_topology=self._block_topology,
+                respin_window=duration_to_seconds(
+                    enclosures_config.get("respin_window", "2m")
+                ),
+                backoff=duration_to_seconds(enclosures_config.get("backoff", "10m")),
+                max_backoff=duration_to_seconds(
+                    enclosures_config.get("max_backoff", "4h")
+                ),
+            )
+        self._disk_monitorings: Dict[str, _DiskMonitoring] = {}
+        # Kept while disks are present, even if their monitoring restarts
+        self._throughput_histories: Dict[str, ThroughputHistory] = {}
 
         self._disk_presence_monitor.add_observer(self)
         self._disk_presence_monitor.add_observer(self._disk_activity_monitor)
+        self._disk_presence_monitor.add_observer(self._spin_up_monitor)
 
         self._profiles = [
             self._create_profile(profile_id=index + 1, profile_config=profile_config)
@@ -74,12 +220,70 @@ class DiskMonitoringService(DiskPresenceObserver):
         if not self._profiles:
             logger.warning("No profiles in configuration file, nothing to do")
 
+        # Added last, so that the poll is fully processed when it's notified
+        self._disk_stats_monitor.add_observer(self)
+        self._last_poll_time: Optional[float] = None
+
+        self._control_server = control.ControlServer(
+            control_socket_path,
+            {
+                "wake": self._handle_wake,
+                "status": self._handle_status,
+                "throughput": self._handle_throughput,
+                "metrics": self._handle_metrics,
+            },
+        )
+
     def run(self):
         logger.info("Running...")
-        self._scheduler.run()
+        self._status_file_writer.open()
+        self._event_history_writer.open()
+        self._scheduler.set_timer(_HISTORY_PERSIST_INTERVAL, self._persist_history)
+        watchdog_interval = systemd.watchdog_interval()
+        if watchdog_interval is not None:
+            systemd.Watchdog(
+                scheduler=self._scheduler,
+                interval=watchdog_interval,
+                is_healthy=self._is_healthy,
+            ).start()
+        if self._block_trace is not None and not self._block_trace.start():
+            self._block_trace = None  # polls are enough
+        self._control_server.start()
+        try:
+            self._scheduler.run()
+        finally:
+            self._control_server.stop()
+            if self._block_trace is not None:
+                self._block_trace.stop()
+            self._event_history_writer.close()
+            self._status_file_writer.close()
+
+    @log_exceptions
+    def on_disk_stats_updated(self, disk_stats: Iterable[DeviceNameAndCounters]):
+        if self._last_poll_time is None:
+            # The first poll is the baseline for all monitors
+            systemd.notify("READY=1")
+        self._last_poll_time = time.monotonic()
+
+    def _is_healthy(self) -> bool:
+        if (
+            self._last_poll_time is not None
+            and time.monotonic() - self._last_poll_time
+            > 2 * self._disk_stats_monitor.polling_interval
+        ):
+            logger.warning("Disks haven't been polled for too long")
+            return False
+        return True
+
+    @log_exceptions
+    def _persist_history(self):
+        self._scheduler.set_timer(_HISTORY_PERSIST_INTERVAL, self._persist_history)
+        self._event_history_writer.persist()
 
     @log_exceptions
     def on_disks_added(self, device_names: Iterable[str]):
+        self._block_topology.refresh()
+
         disk_by_device_name = {
             disk.device_name: disk for disk in self._find_monitored_disks()
         }
@@ -89,35 +293,222 @@ class DiskMonitoringService(DiskPresenceObserver):
             if disk is not None:
                 self._start_disk_monitoring(disk)
 
+        self._regroup_disks()
+        self._update_traced_disks()
+
     @log_exceptions
     def on_disks_removed(self, device_names: Iterable[str]):
-        pass
+        self._block_topology.refresh()
+
+        for device_name in device_names:
+            self._stop_disk_monitoring(device_name)
+            self._throughput_histories.pop(device_name, None)
+
+        self._regroup_disks()
+        self._update_traced_disks()
+
+    @log_exceptions
+    def on_disks_renamed(self, new_names: Dict[str, str]):
+        # Called before the disk activity monitor moves observers to new names
+        self._block_topology.refresh()
+
+        disk_by_device_name = {
+            disk.device_name: disk for disk in self._find_monitored_disks()
+        }
+
+        for old_name, new_name in new_names.items():
+            monitoring = self._disk_monitorings.get(old_name)
+            disk = disk_by_device_name.get(new_name)
+            if (
+                monitoring is not None
+                and disk is not None
+                and disk.profile is monitoring.disk.profile
+                and self._block_topology.activity_device(new_name)
+                == new_names.get(
+                    monitoring.activity_device_name, monitoring.activity_device_name
+                )
+            ):
+                self._rename_disk_monitoring(monitoring, disk, new_names)
+                continue
+            self._stop_disk_monitoring(old_name)
+            throughput_history = self._throughput_histories.pop(old_name, None)
+            if disk is not None:
+                if throughput_history is not None:
+                    self._throughput_histories[new_name] = throughput_history
+                self._start_disk_monitoring(disk)
+
+        self._regroup_disks()
+        self._update_traced_disks()
+
+    def _rename_disk_monitoring(
+        self,
+        monitoring: _DiskMonitoring,
+        disk: _MonitoredDisk,
+        new_names: Dict[str, str],
+    ):
+        """Keeps plugins and activity of a disk that has got a new name"""
+        old_name = monitoring.disk.device_name
+        del self._disk_monitorings[old_name]
+        self._throughput_histories[disk.device_name] = self._throughput_histories.pop(
+            old_name
+        )
+        # Observers still registered under old names are moved by the disk
+        # activity monitor, new ones are added under new names
+        old_activity_device_name = monitoring.activity_device_name
+        activity_device_name = new_names.get(
+            old_activity_device_name, old_activity_device_name
+        )
+        self._disk_activity_monitor.remove_observer(
+            old_activity_device_name, monitoring.status_observer
+        )
+        self._disk_status_publisher.remove_disk(old_name)
+        monitoring.status_observer = self._disk_status_publisher.add_disk(
+            disk.device_name
+        )
+        self._disk_activity_monitor.add_observer(
+            activity_device_name,
+            monitoring.status_observer,
+            disk.profile.activity_rules,
+        )
+        monitoring.disk = disk
+        monitoring.activity_device_name = activity_device_name
+        for name, plugin in list(monitoring.plugins.items()):
+            if plugin.api_version >= 4:
+                plugin.on_disk_renamed(disk.device_name, disk.disk_path)
+                continue
+            self._disk_activity_monitor.remove_observer(
+                old_activity_device_name, plugin
+            )
+            self._disk_activity_monitor.remove_observer(old_name, plugin)
+            plugin.on_disk_removed()
+            del monitoring.plugins[name]
+            self._add_plugin(
+                monitoring, name, disk.profile.plugin_factories[name], disk
+            )
+        self._disk_monitorings[disk.device_name] = monitoring
 
     def _start_disk_monitoring(self, disk: _MonitoredDisk):
-        for factory in disk.profile.plugin_factories:
-            plugin = factory.create_plugin(disk.device_name, disk.disk_path)
-            self._disk_activity_monitor.add_observer(disk.device_name, plugin)
+        activity_device_name = self._block_topology.activity_device(disk.device_name)
+        if activity_device_name != disk.device_name:
+            logger.info(
+                "%s is a member of %s, following its activity",
+                disk.device_name,
+                activity_device_name,
+            )
+        monitoring = _DiskMonitoring(
+            disk=disk,
+            activity_device_name=activity_device_name,
+            plugins={},
+            status_observer=self._disk_status_publisher.add_disk(disk.device_name),
+        )
+        self._disk_activity_monitor.add_observer(
+            activity_device_name,
+            monitoring.status_observer,
+            disk.profile.activity_rules,
+        )
+        for name, factory in disk.profile.plugin_factories.items():
+            self._add_plugin(monitoring, name, factory, disk)
+        self._disk_monitorings[disk.device_name] = monitoring
+        throughput_history = self._throughput_histories.get(disk.device_name)
+        if throughput_history is None:
+            throughput_history = ThroughputHistory()
+            self._throughput_histories[disk.device_name] = throughput_history
+        self._disk_activity_monitor.add_poll_observer(
+            disk.device_name, throughput_history
+        )
+
+    def _add_plugin(
+        self,
+        monitoring: _DiskMonitoring,
+        name: str,
+        factory: PluginFactory,
+        disk: _MonitoredDisk,
+    ):
+        """Adds the plugin under the activity device name of the monitoring"""
+        plugin = factory.create_plugin(disk.device_name, disk.disk_path)
+        if plugin.api_version > PLUGIN_API_VERSION:
+            logger.error(
+                "Plugin %s requires API version %d, skipping",
+                name,
+                plugin.api_version,
+            )
+            return
+        monitoring.plugins[name] = plugin
+        self._disk_activity_monitor.add_observer(
+            monitoring.activity_device_name,
+            plugin,
+            plugin.activity_rules or disk.profile.activity_rules,
+        )
+        if plugin.api_version >= 2:
+            # Counters of the disk itself even if it follows an array
+            self._disk_activity_monitor.add_poll_observer(disk.device_name, plugin)
+
+    def _stop_disk_monitoring(self, device_name: str):
+        monitoring = self._disk_monitorings.pop(device_name, None)
+        if monitoring is None:
+            return
+        self._disk_activity_monitor.remove_observer(
+            monitoring.activity_device_name, monitoring.status_observer
+        )
+        self._disk_status_publisher.remove_disk(device_name)
+        throughput_history = self._throughput_histories.get(device_name)
+        if throughput_history is not None:
+            self._disk_activity_monitor.remove_observer(device_name, throughput_history)
+        for plugin in monitoring.plugins.values():
+            self._disk_activity_monitor.remove_observer(
+                monitoring.activity_device_name, plugin
+            )
+            self._disk_activity_monitor.remove_observer(device_name, plugin)
+            plugin.on_disk_removed()
+
+    def _regroup_disks(self):
+        """Restarts monitoring of disks that joined or left arrays"""
+        for device_name, monitoring in list(self._disk_monitorings.items()):
+            activity_device_name = self._block_topology.activity_device(device_name)
+            if activity_device_name != monitoring.activity_device_name:
+                self._stop_disk_monitoring(device_name)
+                self._start_disk_monitoring(monitoring.disk)
+
+    def _update_traced_disks(self):
+        if self._block_trace is not None:
+            # Observers of array members follow the array
+            self._block_trace.set_device_names(
+                self._disk_monitorings,
+                {
+                    device_name: monitoring.activity_device_name
+                    for device_name, monitoring in self._disk_monitorings.items()
+                },
+            )
 
     def _create_profile(
         self, profile_id: int, profile_config: Dict[str, Any]
     ) -> _Profile:
         return _Profile(
             profile_id=profile_id,
+            name=profile_config.get("name"),
             disk_patterns=profile_config["disks"] or [],
-            plugin_factories=list(self._create_plugin_factories(profile_config)),
+            activity_rules=ActivityRules.from_config(profile_config.get("activity")),
+            plugin_factories=dict(self._create_plugin_factories(profile_config)),
         )
 
     def _create_plugin_factories(
         self, profile_config: Dict[str, Any]
-    ) -> Iterator[PluginFactory]:
+    ) -> Iterator[Tuple[str, PluginFactory]]:
         for key in profile_config:
-            if key in ["disks"]:
+            if key in ["disks", "name", "activity"]:
                 continue
-            plugin = getattr(plugins, key, None)
-            if plugin is None:
+            factory_class = plugins.load_factory_class(key)
+            if factory_class is None:
                 logger.warning("Unknown plugin: %s, skipping", key)
                 continue
-            yield plugin.Factory(scheduler=self._scheduler, config=profile_config[key])
+            yield key, factory_class(
+                scheduler=self._scheduler,
+                config=profile_config[key],
+                disk_activity_monitor=self._disk_activity_monitor,
+                spin_down_monitor=self._spin_down_monitor,
+                spin_down_coordinator=self._spin_down_coordinator,
+                disk_presence_monitor=self._disk_presence_monitor,
+            )
 
     def _find_monitored_disks(self) -> Iterator[_MonitoredDisk]:
         for profile in self._profiles:
@@ -133,6 +524,144 @@ class DiskMonitoringService(DiskPresenceObserver):
             if not disks_found:
                 logger.warning("No disks found from profile %d", profile.profile_id)
 
+    def _handle_wake(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Runs in a control connection thread"""
+        from .lib.wake import wake_disks
+
+        disk_path_by_device_name = control.call_in_scheduler(
+            self._scheduler, lambda: self._prepare_wake(request["targets"])
+        )
+        results = wake_disks(
+            list(disk_path_by_device_name.values()),
+            max_parallel=int(request.get("max_parallel", _DEFAULT_MAX_PARALLEL_WAKES)),
+        )
+        for device_name, disk_path in disk_path_by_device_name.items():
+            result = results[disk_path]
+            if result.error is None:
+                logger.info("%s woke up in %.1fs", device_name, result.latency)
+            else:
+                logger.error("Cannot wake up %s: %s", device_name, result.error)
+        return {
+            device_name: {
+                "latency": results[disk_path].latency,
+                "error": results[disk_path].error,
+            }
+            for device_name, disk_path in disk_path_by_device_name.items()
+        }
+
+    def _handle_status(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Runs in a control connection thread"""
+        return control.call_in_scheduler(
+            self._scheduler, lambda: self._get_status(request.get("disks") or [])
+        )
+
+    def _get_status(self, device_names: List[str]) -> Dict[str, Any]:
+        status = {}
+        for device_name in self._select_disks(device_names):
+            monitoring = self._disk_monitorings[device_name]
+            profile = monitoring.disk.profile
+            status[device_name] = {
+                "profile": profile.name or profile.profile_id,
+                "activity_device": monitoring.activity_device_name,
+                "idle": self._disk_activity_monitor.is_idle(
+                    monitoring.activity_device_name, profile.activity_rules
+                ),
+                "throughput": self._throughput_histories[device_name].get_status(),
+                "plugins": {
+                    name: plugin.get_status()
+                    for name, plugin in monitoring.plugins.items()
+                },
+            }
+        return status
+
+    def _handle_throughput(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Runs in a control connection thread"""
+        return control.call_in_scheduler(
+            self._scheduler,
+            lambda: self._get_throughput(
+                request.get("disks") or [], request.get("period", "hour")
+            ),
+        )
+
+    def _get_throughput(self, device_names: List[str], period: str) -> Dict[str, Any]:
+        if period not in ARCHIVES:
+            raise UsageError(f'Unknown period "{period}"')
+        return {
+            device_name: self._throughput_histories[device_name]
+            .archives[period]
+            .get_rows()
+            for device_name in self._select_disks(device_names)
+        }
+
+    def _handle_metrics(self, request: Dict[str, Any]) -> str:
+        """Runs in a control connection thread"""
+        return control.call_in_scheduler(
+            self._scheduler, self._spin_up_monitor.get_metrics
+        )
+
+    def _select_disks(self, device_names: List[str]) -> List[str]:
+        """Returns monitored disks, all of them if none are given"""
+        unknown_device_names = set(device_names) - set(self._disk_monitorings)
+        if unknown_device_names:
+            raise UsageError(
+                f'Unknown disk "{", ".join(sorted(unknown_device_names))}"'
+            )
+        return [
+            device_name
+            for device_name in self._disk_monitorings
+            if not device_names or device_name in device_names
+        ]
+
+    def _prepare_wake(self, targets: List[str]) -> Dict[str, str]:
+        disk_path_by_device_name = self._resolve_targets(targets)
+        logger.info("Waking up %s", ", ".join(disk_path_by_device_name))
+        # So that idle timers start over after the disks wake up, observers of
+        # array members follow the array
+        activity_device_names = {
+            self._disk_monitorings[device_name].activity_device_name: None
+            for device_name in disk_path_by_device_name
+        }
+        for activity_device_name in activity_device_names:
+            self._disk_activity_monitor.mark_active(activity_device_name)
+        return disk_path_by_device_name
+
+    def _resolve_targets(self, targets: List[str]) -> Dict[str, str]:
+        """Returns paths of monitored disks by their names.
+
+        Other devices are refused, the service runs as root and reads from
+        whatever it's asked to wake up.
+        """
+        profile_by_key = {}
+        for profile in self._profiles:
+            profile_by_key[str(profile.profile_id)] = profile
+            if profile.name:
+                profile_by_key[profile.name] = profile
+        device_name_by_real_path = {
+            os.path.realpath(monitoring.disk.disk_path): device_name
+            for device_name, monitoring in self._disk_monitorings.items()
+        }
+
+        disks = []
+        for target in targets:
+            profile = profile_by_key.get(target)
+            if profile is not None:
+                disks.extend(
+                    monitoring.disk
+                    for monitoring in self._disk_monitorings.values()
+                    if monitoring.disk.profile is profile
+                )
+                continue
+            device_name = device_name_by_real_path.get(
+                os.path.realpath(
+                    target if "/" in target else os.path.join("/dev", target)
+                )
+            )
+            if device_name is None:
+                raise UsageError(f'Unknown profile or monitored disk "{target}"')
+            disks.append(self._disk_monitorings[device_name].disk)
+
+        return {disk.device_name: disk.disk_path for disk in disks}
+
     @staticmethod
     def _find_disk_paths(patterns: List[str]) -> Iterator[str]:
         from .lib import filesystem
@@ -149,16 +678,111 @@ class DiskMonitoringService(DiskPresenceObserver):
                 yield str(path)
 
 
+def wake(args) -> int:
+    results = control.send_request(
+        args.socket,
+        {
+            "command": "wake",
+            "targets": args.targets,
+            "max_parallel": args.max_parallel,
+        },
+    )
+    for device_name, result in results.items():
+        if result["error"] is None:
+            print(f"{device_name}: {result['latency']:.1f}s")
+        else:
+            print(f"{device_name}: {result['error']}")
+    return 0 if all(result["error"] is None for result in results.values()) else 1
+
+
+def status(args) -> int:
+    result = control.send_request(
+        args.socket, {"command": "status", "disks": args.disks}
+    )
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+def history(args) -> int:
+    try:
+        events = read_events(args.file)
+    except FileNotFoundError:  # the service hasn't run since the last reboot
+        try:
+            events = read_events(PERSISTENT_HISTORY_FILE_PATH)
+        except FileNotFoundError:  # the service has never run
+            events = []
+    now = time.time()
+    since = now - duration_to_seconds(args.since) if args.since else 0
+    until = now - duration_to_seconds(args.until) if args.until else now
+    events = [
+        event
+        for event in events
+        if since <= event.timestamp <= until
+        and (not args.disks or event.device_name in args.disks)
+    ]
+    summaries = summarize(events)
+    if not summaries:
+        print("no events")
+    for device_name, summary in sorted(summaries.items()):
+        line = f"{device_name}: {summary.spin_downs} spin-downs"
+        if summary.idle_periods:
+            line += (
+                f", {len(summary.idle_periods)} idle periods"
+                f" (median {seconds_to_duration(summary.median_idle_period)},"
+                f" mean {seconds_to_duration(summary.mean_idle_period)},"
+                f" max {seconds_to_duration(summary.max_idle_period)})"
+            )
+        if summary.command_failures:
+            line += f", {summary.command_failures} failed commands"
+        if summary.hotplug_events:
+            line += f", {summary.hotplug_events} hotplug events"
+        print(line)
+    return 0
+
+
+def throughput(args) -> int:
+    result = control.send_request(
+        args.socket,
+        {"command": "throughput", "disks": args.disks, "period": args.period},
+    )
+    step = ARCHIVES[args.period][0]
+    for device_name, rows in result.items():
+        print(f"{device_name} ({seconds_to_duration(step)} steps)")
+        for timestamp, read, written in rows:
+            print(
+                f"  {time.strftime('%Y-%m-%d %H:%M', time.localtime(timestamp))}"
+                f"  read {bytes_to_size(read)}/s"
+                f"  written {bytes_to_size(written)}/s"
+            )
+    return 0
+
+
+def metrics(args) -> int:
+    print(control.send_request(args.socket, {"command": "metrics"}), end="")
+    return 0
+
+
 def main():
     try:
         args = parse_args()
 
+        if args.command == "wake":
+            return wake(args)
+        if args.command == "status":
+            return status(args)
+        if args.command == "history":
+            return history(args)
+        if args.command == "throughput":
+            return throughput(args)
+        if args.command == "metrics":
+            return metrics(args)
+
         config_path = args.config or CONFIG_PATH
         if not os.path.isfile(config_path):
             raise UsageError(f'Cannot find configuration file "{config_path}"')
         config = load_config(config_path)
 
-        DiskMonitoringService(config).run()
+        DiskMonitoringService(config, control_socket_path=args.socket).run()
         return 0
     except Error:
         log_current_exception()
@@ -14,8 +14,12 @@ SYSTEMD_UNIT_FILE_CONTENT = """\
 Description=Hard Disk Monitor
 
 [Service]
+Type=notify
 ExecStart={hdmon}
 Restart=always
+RuntimeDirectory=hdmon
+# Longer than the longest command hdmon waits for
+WatchdogSec=10min
 
 [Install]
 WantedBy=default.target
@@ -24,10 +28,28 @@ WantedBy=default.target
 DEFAULT_CONFIG = """\
 # Hard Disk Monitor configuration
 
+# Uncomment to notice disk activity when it happens rather than on the next
+# poll and to count idle time from the last I/O. Needs tracefs, without it
+# disks are polled as usual.
+# trace_block_io: true
+
+# Uncomment to spin down disks behind the same USB bridge only together,
+# once all of them are idle. Some enclosures spin their disks up right
+# after a spin-down, spin-downs are then postponed by a backoff that doubles
+# every time it happens again.
+# enclosures:
+#   # Activity this soon after a spin-down counts as a spin-up by the enclosure
+#   respin_window: 2m
+#   backoff: 10m
+#   max_backoff: 4h
+
 # Each profile define a set of disks and rules that apply to them
 profiles:
 
-- disks:
+- # Optional, allows to refer to the profile in commands like "hdmon wake backup"
+  # name: backup
+
+  disks:
     # Add your disks here. Should be absolute paths or patterns.
     # Patterns can contain "*", "**" and "?".
     #
@@ -35,10 +57,73 @@ profiles:
     # - /dev/sd?
     # - /dev/disk/by-label/label
 
+  # Optional rules that decide when a disk is busy.
+  # activity:
+  #   # Ignore polls with fewer sectors read or written (both directions)
+  #   min_sectors: 1
+  #   # Or set thresholds separately
+  #   min_sectors_read: 1
+  #   min_sectors_written: 1
+  #   # Number of consecutive polls required to change disk state
+  #   busy_samples: 1
+  #   idle_samples: 1
+  #   # Polls that find requests in flight are busy
+  #   use_in_flight: false
+  #   # Polls after time spent doing I/O are busy
+  #   use_io_ticks: false
+
   once_idle:
     # Runs a command if a disk is idle for specified amount of time.
+    # Commands without shell syntax other than $disk_path run without a shell.
     delay: 2h
     run: /usr/sbin/hdparm -y $disk_path
+    # Uncomment to learn the delay from observed idle periods of each disk.
+    # The delay above is used until the disk has been observed for a day.
+    # adaptive:
+    #   max_spin_ups_per_day: 4
+    #   min_delay: 10m
+    #   max_delay: 1d
+    #   state_dir: /var/lib/hdmon
+    # Uncomment to flush dirty data of filesystems on a disk before running
+    # the command, otherwise writeback may wake the disk up right away.
+    # Retries while data is still pending, per-disk stats require debugfs.
+    # writeback:
+    #   retry_delay: 10s
+    #   max_retries: 6
+
+  # Uncomment to wake disks up shortly before they are usually accessed.
+  # Learns access times per time of day and day of week, turns itself off
+  # while its predictions are wrong too often.
+  # prespin:
+  #   lead: 2m
+  #   min_idle: 10m
+  #   min_precision: 0.5
+  #   max_parallel: 8
+  #   state_dir: /var/lib/hdmon
+
+  # Uncomment to log which services woke disks up (requires cgroup v2).
+  # wake_culprits:
+  #   top: 3
+  #   # Also log processes with most I/O to any disk, reads at most
+  #   # max_processes files from /proc per wake up.
+  #   processes: false
+  #   max_processes: 500
+
+  # Uncomment to read SMART data while disks are busy anyway.
+  # See the results with "sudo hdmon status".
+  # smart:
+  #   interval: 1h
+  #   # How long the results are kept
+  #   ttl: 1d
+  #   smartctl: smartctl
+
+  # Uncomment to try another idle delay and activity rules without acting.
+  # Records when the command would have run and the wake-ups that followed,
+  # see "sudo hdmon status" to compare them with once_idle.
+  # shadow:
+  #   delay: 30m
+  #   activity:
+  #     min_sectors: 64
 """
 
 
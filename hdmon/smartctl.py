@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+
+"""
+Runs smartctl unless a disk is spun down according to hdmon, so that scripts
+and monitoring systems don't wake disks up just to ask for their state.
+
+Usage: hdmon-smartctl <smartctl arguments>
+"""
+
+
+import os
+import sys
+
+from .lib.error_handling import Error
+from .lib.status_file import POWER_STATE_STANDBY, read_status
+
+
+SMARTCTL = "smartctl"
+# Same as smartctl's "device is in a low-power mode" exit status
+EXIT_STANDBY = 2
+
+
+def _find_sleeping_disk(args):
+    try:
+        statuses = read_status()
+    except (OSError, Error):  # hdmon isn't running, let smartctl decide
+        return None
+    for arg in args:
+        if not arg.startswith("/dev/"):
+            continue
+        device_name = os.path.basename(os.path.realpath(arg))
+        status = statuses.get(device_name)
+        if status is not None and status.power_state == POWER_STATE_STANDBY:
+            return arg
+    return None
+
+
+def main():
+    args = sys.argv[1:]
+    disk = _find_sleeping_disk(args)
+    if disk is not None:
+        print(f"{disk} is in standby according to hdmon, skipping", file=sys.stderr)
+        return EXIT_STANDBY
+    os.execvp(SMARTCTL, [SMARTCTL] + args)
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -24,6 +24,14 @@ setup(
             "hdmon=hdmon.service:main",
             "hdmon-install=hdmon.setup:install",
             "hdmon-uninstall=hdmon.setup:uninstall",
-        ]
+            "hdmon-smartctl=hdmon.smartctl:main",
+        ],
+        "hdmon.plugins": [
+            "once_idle=hdmon.plugins.once_idle:Factory",
+            "prespin=hdmon.plugins.prespin:Factory",
+            "shadow=hdmon.plugins.shadow:Factory",
+            "smart=hdmon.plugins.smart:Factory",
+            "wake_culprits=hdmon.plugins.wake_culprits:Factory",
+        ],
     },
 )
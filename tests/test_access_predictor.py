@@ -0,0 +1,55 @@
+import datetime
+import unittest
+
+from hdmon.lib.access_predictor import AccessPredictor
+
+
+_SLOT = 15 * 60
+
+
+def at(day, hour, minute=0):
+    # 2024-01-01 is Monday
+    return datetime.datetime(2024, 1, day, hour, minute).timestamp()
+
+
+class AccessPredictorTestCase(unittest.TestCase):
+    def setUp(self):
+        self.predictor = AccessPredictor(slot_seconds=_SLOT)
+
+    def test_expects_nothing_initially(self):
+        self.assertFalse(self.predictor.is_access_expected(at(1, 2)))
+
+    def test_learns_daily_access(self):
+        for day in range(1, 4):
+            self.predictor.record_access(at(day, 2, 5))
+        self.assertTrue(self.predictor.is_access_expected(at(4, 2)))
+        self.assertFalse(self.predictor.is_access_expected(at(4, 2, 15)))
+        self.assertFalse(self.predictor.is_access_expected(at(4, 3)))
+
+    def test_doesnt_learn_from_single_access(self):
+        self.predictor.record_access(at(1, 2, 5))
+        self.assertFalse(self.predictor.is_access_expected(at(2, 2)))
+
+    def test_learns_weekly_access(self):
+        # Mondays only
+        for week in range(3):
+            self.predictor.record_access(at(1 + week * 7, 22))
+        self.assertTrue(self.predictor.is_access_expected(at(22, 22)))
+        self.assertFalse(self.predictor.is_access_expected(at(23, 22)))
+
+    def test_forgets_stopped_access(self):
+        for day in range(1, 4):
+            self.predictor.record_access(at(day, 2, 5))
+        self.predictor.record_access(at(10, 12))
+        self.assertFalse(self.predictor.is_access_expected(at(11, 2)))
+
+    def test_restores_state(self):
+        for day in range(1, 4):
+            self.predictor.record_access(at(day, 2, 5))
+        restored = AccessPredictor(slot_seconds=_SLOT)
+        restored.load_state(self.predictor.to_state())
+        self.assertTrue(restored.is_access_expected(at(4, 2)))
+
+
+if __name__ == "__main__":
+    unittest.main()
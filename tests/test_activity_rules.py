@@ -0,0 +1,98 @@
+import unittest
+
+from hdmon.lib.activity_rules import ActivityRules, DEFAULT_ACTIVITY_RULES
+from hdmon.lib.disk_stats import DiskCounters
+from hdmon.lib.error_handling import ConfigurationError
+
+
+class ActivityRulesTestCase(unittest.TestCase):
+    def test_default_rules_detect_any_activity(self):
+        rules = DEFAULT_ACTIVITY_RULES
+        self.assertFalse(rules.is_busy_sample(DiskCounters(5, 5), DiskCounters(5, 5)))
+        self.assertTrue(rules.is_busy_sample(DiskCounters(5, 5), DiskCounters(6, 5)))
+        self.assertTrue(rules.is_busy_sample(DiskCounters(5, 5), DiskCounters(5, 6)))
+
+    def test_counters_going_back_are_activity(self):
+        rules = ActivityRules(min_sectors_read=100, min_sectors_written=100)
+        self.assertTrue(rules.is_busy_sample(DiskCounters(5, 5), DiskCounters(0, 5)))
+
+    def test_separate_thresholds(self):
+        rules = ActivityRules(min_sectors_read=8, min_sectors_written=64)
+        self.assertFalse(rules.is_busy_sample(DiskCounters(0, 0), DiskCounters(7, 63)))
+        self.assertTrue(rules.is_busy_sample(DiskCounters(0, 0), DiskCounters(8, 0)))
+        self.assertTrue(rules.is_busy_sample(DiskCounters(0, 0), DiskCounters(0, 64)))
+
+    def test_requests_in_flight(self):
+        rules = ActivityRules(use_in_flight=True)
+        self.assertFalse(
+            DEFAULT_ACTIVITY_RULES.is_busy_sample(
+                DiskCounters(5, 5), DiskCounters(5, 5, in_flight=1)
+            )
+        )
+        self.assertTrue(
+            rules.is_busy_sample(DiskCounters(5, 5), DiskCounters(5, 5, in_flight=1))
+        )
+        self.assertFalse(rules.is_busy_sample(DiskCounters(5, 5), DiskCounters(5, 5)))
+
+    def test_io_ticks(self):
+        rules = ActivityRules(use_io_ticks=True)
+        self.assertTrue(
+            rules.is_busy_sample(
+                DiskCounters(5, 5, io_ticks=100), DiskCounters(5, 5, io_ticks=110)
+            )
+        )
+        self.assertFalse(
+            rules.is_busy_sample(
+                DiskCounters(5, 5, io_ticks=100), DiskCounters(5, 5, io_ticks=100)
+            )
+        )
+
+    def test_from_empty_config(self):
+        self.assertIs(DEFAULT_ACTIVITY_RULES, ActivityRules.from_config(None))
+        self.assertIs(DEFAULT_ACTIVITY_RULES, ActivityRules.from_config({}))
+
+    def test_from_config_with_shorthands(self):
+        rules = ActivityRules.from_config(
+            {"min_sectors": 16, "min_sectors_written": 128, "samples": 3}
+        )
+        self.assertEqual(
+            ActivityRules(
+                min_sectors_read=16,
+                min_sectors_written=128,
+                busy_samples=3,
+                idle_samples=3,
+            ),
+            rules,
+        )
+
+    def test_equal_configs_give_equal_rules(self):
+        self.assertEqual(
+            hash(ActivityRules.from_config({"min_sectors": 16})),
+            hash(
+                ActivityRules.from_config(
+                    {"min_sectors_read": 16, "min_sectors_written": 16}
+                )
+            ),
+        )
+
+    def test_from_invalid_config(self):
+        with self.assertRaises(ConfigurationError):
+            ActivityRules.from_config({"min_bytes": 1})
+        with self.assertRaises(ConfigurationError):
+            ActivityRules.from_config({"min_sectors": 0})
+        with self.assertRaises(ConfigurationError):
+            ActivityRules.from_config({"samples": "2"})
+        with self.assertRaises(ConfigurationError):
+            ActivityRules.from_config({"use_in_flight": 1})
+
+    def test_from_config_with_flags(self):
+        self.assertEqual(
+            ActivityRules(min_sectors_read=8, use_in_flight=True, use_io_ticks=True),
+            ActivityRules.from_config(
+                {"min_sectors_read": 8, "use_in_flight": True, "use_io_ticks": True}
+            ),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+from pathlib import Path
+import tempfile
+import unittest
+
+from hdmon.lib.block_topology import BlockTopology
+
+
+class BlockTopologyTestCase(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.sysfs = Path(temp_dir.name)
+        self.topology = BlockTopology(str(self.sysfs))
+
+    def add_disk(self, name, partitions=()):
+        (self.sysfs / name / "slaves").mkdir(parents=True)
+        for partition in partitions:
+            (self.sysfs / name / partition).mkdir()
+            (self.sysfs / name / partition / "partition").touch()
+
+    def add_holder(self, name, slaves, is_md=False):
+        self.add_disk(name)
+        for slave in slaves:
+            (self.sysfs / name / "slaves" / slave).mkdir()
+        if is_md:
+            (self.sysfs / name / "md").mkdir()
+
+    def test_disks_follow_themselves_by_default(self):
+        self.add_disk("sda")
+        self.topology.refresh()
+        self.assertEqual("sda", self.topology.activity_device("sda"))
+        self.assertEqual("sdz", self.topology.activity_device("sdz"))
+
+    def test_md_members_follow_array(self):
+        self.add_disk("sda", ["sda1"])
+        self.add_disk("sdb", ["sdb1"])
+        self.add_holder("md0", ["sda1", "sdb1"], is_md=True)
+        self.topology.refresh()
+        self.assertEqual("md0", self.topology.activity_device("sda"))
+        self.assertEqual("md0", self.topology.activity_device("sdb"))
+        self.assertEqual({"sda", "sdb"}, self.topology.members("md0"))
+
+    def test_stacked_devices_follow_lowest_array(self):
+        self.add_disk("sda", ["sda1"])
+        self.add_disk("sdb", ["sdb1"])
+        self.add_holder("md0", ["sda1", "sdb1"], is_md=True)
+        self.add_holder("dm-0", ["md0"])
+        self.add_holder("dm-1", ["md0"])
+        self.topology.refresh()
+        self.assertEqual("md0", self.topology.activity_device("sda"))
+
+    def test_single_disk_device_mapper_is_not_array(self):
+        self.add_disk("sdc")
+        self.add_holder("dm-2", ["sdc"])
+        self.topology.refresh()
+        self.assertEqual("sdc", self.topology.activity_device("sdc"))
+
+    def test_spanning_device_mapper_is_array(self):
+        self.add_disk("sdd", ["sdd1"])
+        self.add_disk("sde", ["sde1"])
+        self.add_holder("dm-3", ["sdd1", "sde1"])
+        self.topology.refresh()
+        self.assertEqual("dm-3", self.topology.activity_device("sdd"))
+
+    def test_disks_of_unrelated_arrays_follow_themselves(self):
+        self.add_disk("sda", ["sda1", "sda2"])
+        self.add_disk("sdb", ["sdb1", "sdb2"])
+        self.add_holder("md0", ["sda1", "sdb1"], is_md=True)
+        self.add_holder("md1", ["sda2", "sdb2"], is_md=True)
+        self.topology.refresh()
+        self.assertEqual("sda", self.topology.activity_device("sda"))
+
+    def test_uses_cache_until_refreshed(self):
+        self.add_disk("sda", ["sda1"])
+        self.add_disk("sdb", ["sdb1"])
+        self.topology.refresh()
+        self.add_holder("md0", ["sda1", "sdb1"], is_md=True)
+        self.assertEqual("sda", self.topology.activity_device("sda"))
+        self.topology.refresh()
+        self.assertEqual("md0", self.topology.activity_device("sda"))
+
+    def add_device_disk(self, name, path):
+        disk_path = self.sysfs / "devices" / "pci0000:00" / path / "block" / name
+        (disk_path / "slaves").mkdir(parents=True)
+        (self.sysfs / name).symlink_to(disk_path)
+
+    def test_disks_behind_one_usb_device_share_enclosure(self):
+        usb = "0000:00:14.0/usb2"
+        for name, path in [
+            ("sdb", f"{usb}/2-1/2-1:1.0/host6/target6:0:0/6:0:0:0"),
+            ("sdc", f"{usb}/2-1/2-1:1.0/host6/target6:0:0/6:0:0:1"),
+            # Another interface of the same bridge
+            ("sdd", f"{usb}/2-1/2-1:1.1/host8/target8:0:0/8:0:0:0"),
+            # Behind a hub
+            ("sde", f"{usb}/2-2/2-2.1/2-2.1:1.0/host7/target7:0:0/7:0:0:0"),
+        ]:
+            self.add_device_disk(name, path)
+        self.add_disk("vda")
+        self.topology.refresh()
+        devices = self.sysfs / "devices" / "pci0000:00"
+        self.assertEqual(
+            str(devices / "0000:00:14.0" / "usb2" / "2-1"),
+            self.topology.enclosure("sdb"),
+        )
+        self.assertEqual(self.topology.enclosure("sdb"), self.topology.enclosure("sdc"))
+        self.assertEqual(self.topology.enclosure("sdb"), self.topology.enclosure("sdd"))
+        self.assertEqual(
+            str(devices / "0000:00:14.0" / "usb2" / "2-2" / "2-2.1"),
+            self.topology.enclosure("sde"),
+        )
+        self.assertIsNone(self.topology.enclosure("vda"))
+
+    def test_disks_of_sata_and_sas_hosts_have_no_enclosure(self):
+        for name, path in [
+            ("sda", "0000:00:17.0/ata1/host0/target0:0:0/0:0:0:0"),
+            ("sdb", "0000:00:17.0/ata2/host1/target1:0:0/1:0:0:0"),
+            ("sdc", "0000:01:00.0/host2/port-2:0/end_device-2:0/target2:0:0/2:0:0:0"),
+            ("sdd", "0000:01:00.0/host2/port-2:1/end_device-2:1/target2:0:1/2:0:1:0"),
+        ]:
+            self.add_device_disk(name, path)
+        self.topology.refresh()
+        for name in ["sda", "sdb", "sdc", "sdd"]:
+            with self.subTest(disk=name):
+                self.assertIsNone(self.topology.enclosure(name))
+
+
+if __name__ == "__main__":
+    unittest.main()
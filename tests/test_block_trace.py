@@ -0,0 +1,142 @@
+from pathlib import Path
+from unittest import mock
+import tempfile
+import threading
+import unittest
+
+from hdmon.lib.block_trace import BlockTraceSource
+
+
+_EVENTS = ("block_rq_issue", "block_rq_complete")
+
+
+class BlockTraceSourceTestCase(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.root = Path(temp_dir.name)
+        self.sysfs = self.root / "sys" / "block"
+        self.tracefs = self.root / "tracing"
+        self.instance = self.tracefs / "instances" / "hdmon"
+        for event in _EVENTS:
+            (self.instance / "events" / "block" / event).mkdir(parents=True)
+        self.add_device("sda", "8:0")
+        self.add_device("sdb", "8:16")
+        self.scheduler = mock.Mock()
+        self.observer = mock.Mock()
+
+    def add_device(self, name, device_number):
+        path = self.sysfs / name
+        path.mkdir(parents=True)
+        (path / "dev").write_text(device_number + "\n")
+
+    def write_trace(self, *lines):
+        (self.instance / "trace_pipe").write_text(
+            "".join(line + "\n" for line in lines)
+        )
+
+    def create(self, tracefs=None):
+        return BlockTraceSource(
+            scheduler=self.scheduler,
+            observer=self.observer,
+            tracefs_paths=[str(tracefs or self.tracefs)],
+            sysfs_block_path=str(self.sysfs),
+        )
+
+    def start(self, source):
+        self.assertTrue(source.start())
+        for thread in threading.enumerate():
+            if thread.name == "block_trace":
+                thread.join(5)
+
+    def deliver(self):
+        for call in self.scheduler.call_soon_threadsafe.call_args_list:
+            call.args[0]()
+        self.scheduler.call_soon_threadsafe.reset_mock()
+
+    def read_event_file(self, event, name):
+        return (self.instance / "events" / "block" / event / name).read_text()
+
+    def test_unavailable_tracefs(self):
+        source = self.create(tracefs=self.root / "missing")
+        self.assertFalse(source.start())
+
+    def test_filters_events_by_device_numbers(self):
+        self.write_trace()
+        source = self.create()
+        source.set_device_names(["sda", "sdb", "sdc"])
+        self.start(source)
+        self.assertEqual((self.instance / "trace_clock").read_text(), "mono")
+        for event in _EVENTS:
+            self.assertEqual(
+                self.read_event_file(event, "filter"),
+                "dev == 8388608 || dev == 8388624",
+            )
+            self.assertEqual(self.read_event_file(event, "enable"), "1")
+
+        source.set_device_names([])
+        for event in _EVENTS:
+            self.assertEqual(self.read_event_file(event, "enable"), "0")
+
+    def test_reports_io(self):
+        self.write_trace(
+            "  dd-123 [001] ..... 100.500000: block_rq_issue: 8,0 R 4096 () 2048 + 8 [dd]",
+            "  <idle>-0 [001] d.h1. 100.600000: block_rq_complete: 8,0 R () 2048 + 8 [0]",
+            "  kworker/u8:1-45 [000] ..... 101.000000: block_rq_issue: "
+            "8,16 WS 8192 () 100 + 16 none,0,0 [kworker/u8:1]",
+            "  kworker/u8:1-45 [000] ..... 101.100000: block_rq_issue: "
+            "8,16 FF 0 () 0 + 0 none,0,0 [kworker/u8:1]",
+            "  other-1 [000] ..... 102.000000: block_rq_issue: 8,32 R 4096 () 0 + 8 [x]",
+            "garbage",
+        )
+        source = self.create()
+        source.set_device_names(["sda", "sdb"])
+        self.start(source)
+
+        self.scheduler.call_soon_threadsafe.assert_called_once()
+        self.deliver()
+        self.observer.on_block_io.assert_has_calls(
+            [mock.call("sda", 100.6, 8, 0), mock.call("sdb", 101.1, 0, 16)],
+            any_order=True,
+        )
+        self.assertEqual(self.observer.on_block_io.call_count, 2)
+        # Following events are delivered by the timer
+        self.scheduler.set_timer.assert_called_once()
+        delay, callback = self.scheduler.set_timer.call_args.args
+        self.assertGreater(delay, 0)
+
+        # Nothing new, the next event is delivered right away again
+        callback()
+        self.assertEqual(self.observer.on_block_io.call_count, 2)
+        source._on_line(
+            "  dd-123 [001] ..... 200.000000: block_rq_issue: 8,0 W 4096 () 0 + 8 [dd]"
+        )
+        self.deliver()
+        self.observer.on_block_io.assert_called_with("sda", 200.0, 0, 8)
+
+    def test_reports_io_of_array_members_for_array(self):
+        self.add_device("md0", "9:0")
+        self.write_trace(
+            "  dd-123 [001] ..... 100.500000: block_rq_issue: 8,0 R 4096 () 2048 + 8 [dd]",
+            "  dd-123 [001] ..... 100.600000: block_rq_issue: 8,16 W 4096 () 0 + 16 [dd]",
+        )
+        source = self.create()
+        source.set_device_names(["sda", "sdb"], {"sda": "md0", "sdb": "md0"})
+        self.start(source)
+        for event in _EVENTS:
+            # Only members issue requests
+            self.assertEqual(
+                self.read_event_file(event, "filter"),
+                "dev == 8388608 || dev == 8388624",
+            )
+
+        self.deliver()
+        self.observer.on_block_io.assert_has_calls(
+            [
+                mock.call("sda", 100.5, 8, 0),
+                mock.call("sdb", 100.6, 0, 16),
+                mock.call("md0", 100.6, 8, 16),
+            ],
+            any_order=True,
+        )
+        self.assertEqual(self.observer.on_block_io.call_count, 3)
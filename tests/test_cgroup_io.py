@@ -0,0 +1,59 @@
+from pathlib import Path
+import tempfile
+import unittest
+
+from hdmon.lib.cgroup_io import CgroupIoSampler
+
+
+class CgroupIoSamplerTestCase(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.root = Path(temp_dir.name)
+        self.sampler = CgroupIoSampler("8:16", str(self.root))
+
+    def set_io_stat(self, cgroup, sdb_bytes, sda_bytes=0):
+        path = self.root / cgroup
+        path.mkdir(parents=True, exist_ok=True)
+        (path / "io.stat").write_text(
+            f"8:0 rbytes={sda_bytes} wbytes=0 rios=1 wios=0 dbytes=0 dios=0\n"
+            f"8:16 rbytes={sdb_bytes} wbytes={sdb_bytes} rios=1 wios=1 dbytes=0 dios=0\n"
+        )
+
+    def test_returns_nothing_without_baseline(self):
+        self.set_io_stat("system.slice", 100)
+        self.assertEqual([], self.sampler.find_top_contributors(3))
+
+    def test_finds_leaf_contributors(self):
+        self.set_io_stat("system.slice", 100)
+        self.set_io_stat("system.slice/smartd.service", 10)
+        self.set_io_stat("system.slice/backup.service", 90)
+        self.set_io_stat("user.slice", 0)
+        self.sampler.take_baseline()
+
+        self.set_io_stat("system.slice", 1100, sda_bytes=10**9)
+        self.set_io_stat("system.slice/smartd.service", 160)
+        self.set_io_stat("system.slice/backup.service", 890)
+        self.set_io_stat("user.slice", 40)
+        self.assertEqual(
+            [
+                ("system.slice/backup.service", 1600),
+                ("system.slice/smartd.service", 300),
+                ("system.slice", 100),
+            ],
+            self.sampler.find_top_contributors(3),
+        )
+
+    def test_counts_new_cgroups(self):
+        self.set_io_stat("system.slice", 0)
+        self.sampler.take_baseline()
+        self.set_io_stat("system.slice", 5)
+        self.set_io_stat("system.slice/cron.service", 5)
+        self.assertEqual(
+            [("system.slice/cron.service", 10)],
+            self.sampler.find_top_contributors(3),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from hdmon.lib import control
+from hdmon.lib.error_handling import Error, UsageError
+from hdmon.lib.scheduler import Scheduler
+
+
+class ControlTestCase(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.path = os.path.join(temp_dir.name, "hdmon", "control.sock")
+        self.server = control.ControlServer(
+            self.path,
+            {
+                "echo": lambda request: request["value"],
+                "fail": self.fail_with_usage_error,
+            },
+        )
+        self.server.start()
+        self.addCleanup(self.server.stop)
+
+    @staticmethod
+    def fail_with_usage_error(_request):
+        raise UsageError("bad request")
+
+    def test_returns_result(self):
+        result = control.send_request(self.path, {"command": "echo", "value": [1]})
+        self.assertEqual([1], result)
+
+    def test_raises_errors(self):
+        with self.assertRaisesRegex(Error, "bad request"):
+            control.send_request(self.path, {"command": "fail"})
+        with self.assertRaisesRegex(Error, "Unknown command"):
+            control.send_request(self.path, {"command": "unknown"})
+
+    def test_calls_in_scheduler_thread(self):
+        scheduler = Scheduler()
+        scheduler.set_timer(60, lambda: None)
+        threads = []
+
+        def request():
+            threads.append(
+                control.call_in_scheduler(scheduler, threading.current_thread)
+            )
+            scheduler.stop()
+
+        threading.Thread(target=request).start()
+        scheduler.run()
+        self.assertEqual([threading.current_thread()], threads)
+
+
+if __name__ == "__main__":
+    unittest.main()
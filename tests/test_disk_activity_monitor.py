@@ -2,6 +2,7 @@ from typing import Dict
 from unittest import mock
 import unittest
 
+from hdmon.lib.activity_rules import ActivityRules
 from hdmon.lib.disk_activity_monitor import DiskActivityMonitor
 from hdmon.lib.disk_stats import DiskCounters
 
@@ -231,6 +232,239 @@ class DiskActivityMonitorTestCase(unittest.TestCase):
         observer.on_disk_idle.assert_not_called()
         observer.on_disk_active.assert_not_called()
 
+    def test_ignores_activity_below_threshold(self):
+        self.add_disk("sda", DiskCounters(sectors_read=0, sectors_written=0))
+        self.make_all_disks_idle()
+
+        observer = mock.Mock()
+        self.monitor.add_observer(
+            "sda", observer, ActivityRules(min_sectors_read=8, min_sectors_written=8)
+        )
+        observer.reset_mock()
+
+        self.increment_disk_counters("sda", sectors_read=7, sectors_written=7)
+        self.notify_monitor_about_current_disk_stats()
+        observer.on_disk_active.assert_not_called()
+
+        self.increment_disk_counters("sda", sectors_written=8)
+        self.notify_monitor_about_current_disk_stats()
+        observer.on_disk_active.assert_called_once()
+
+    def test_changes_state_after_consecutive_samples(self):
+        self.add_disk("sda", DiskCounters(sectors_read=0, sectors_written=0))
+        observer = mock.Mock()
+        self.monitor.add_observer(
+            "sda", observer, ActivityRules(busy_samples=2, idle_samples=3)
+        )
+        self.notify_monitor_about_current_disk_stats()
+
+        self.notify_monitor_about_current_disk_stats()
+        self.notify_monitor_about_current_disk_stats()
+        observer.on_disk_idle.assert_not_called()
+        self.notify_monitor_about_current_disk_stats()
+        observer.on_disk_idle.assert_called_once()
+
+        self.increment_disk_counters("sda", sectors_read=1)
+        self.notify_monitor_about_current_disk_stats()
+        self.notify_monitor_about_current_disk_stats()  # streak is broken
+        self.increment_disk_counters("sda", sectors_read=1)
+        self.notify_monitor_about_current_disk_stats()
+        observer.on_disk_active.assert_not_called()
+        self.increment_disk_counters("sda", sectors_read=1)
+        self.notify_monitor_about_current_disk_stats()
+        observer.on_disk_active.assert_called_once()
+
+    def test_tracks_rules_separately(self):
+        self.add_disk("sda", DiskCounters(sectors_read=0, sectors_written=0))
+        self.make_all_disks_idle()
+
+        default_observer = mock.Mock()
+        self.monitor.add_observer("sda", default_observer)
+        tolerant_observer = mock.Mock()
+        self.monitor.add_observer(
+            "sda", tolerant_observer, ActivityRules(min_sectors_read=100)
+        )
+        default_observer.reset_mock()
+        tolerant_observer.reset_mock()
+
+        self.increment_disk_counters("sda", sectors_read=1)
+        self.notify_monitor_about_current_disk_stats()
+        default_observer.on_disk_active.assert_called_once()
+        tolerant_observer.on_disk_active.assert_not_called()
+
+    def test_ignores_sectors_read_by_hdmon(self):
+        self.add_disk("sda", DiskCounters(sectors_read=0, sectors_written=0))
+        self.make_all_disks_idle()
+
+        observer = mock.Mock()
+        self.monitor.add_observer("sda", observer)
+        observer.reset_mock()
+
+        self.monitor.ignore_sectors_read("sda", 8)
+        self.notify_monitor_about_current_disk_stats()
+        self.increment_disk_counters("sda", sectors_read=8)
+        self.notify_monitor_about_current_disk_stats()
+        observer.on_disk_active.assert_not_called()
+
+        self.increment_disk_counters("sda", sectors_read=8)
+        self.notify_monitor_about_current_disk_stats()
+        observer.on_disk_active.assert_called_once()
+
+    def test_ignores_sectors_written_by_hdmon(self):
+        self.add_disk("sda", DiskCounters(sectors_read=0, sectors_written=0))
+        self.make_all_disks_idle()
+
+        observer = mock.Mock()
+        self.monitor.add_observer("sda", observer)
+        observer.reset_mock()
+
+        self.increment_disk_counters("sda", sectors_written=16)
+        self.monitor.ignore_sectors_written("sda", 16)
+        self.notify_monitor_about_current_disk_stats()
+        observer.on_disk_active.assert_not_called()
+
+        self.increment_disk_counters("sda", sectors_written=1)
+        self.notify_monitor_about_current_disk_stats()
+        observer.on_disk_active.assert_called_once()
+
+    def test_notifies_poll_observers_with_snapshots(self):
+        self.add_disk("sda", DiskCounters(sectors_read=0, sectors_written=0))
+        self.add_disk("sdb", DiskCounters(sectors_read=0, sectors_written=0))
+        observer = mock.Mock()
+        another_observer = mock.Mock()
+        self.monitor.add_poll_observer("sda", observer)
+        self.monitor.add_poll_observer("sda", another_observer)
+
+        with mock.patch("time.monotonic", return_value=100.0):
+            self.notify_monitor_about_current_disk_stats()
+        observer.on_poll.assert_not_called()
+
+        self._disk_counters["sda"] = DiskCounters(
+            sectors_read=20, sectors_written=40, in_flight=2, io_ticks=15000
+        )
+        with mock.patch("time.monotonic", return_value=160.0):
+            self.notify_monitor_about_current_disk_stats()
+        observer.on_poll.assert_called_once()
+        (snapshot,) = observer.on_poll.call_args.args
+        self.assertIs(snapshot, another_observer.on_poll.call_args.args[0])
+        self.assertEqual(snapshot.device_name, "sda")
+        self.assertEqual(snapshot.interval, 60.0)
+        self.assertEqual(snapshot.deltas.sectors_written, 40)
+        self.assertEqual(snapshot.deltas.in_flight, 2)
+        self.assertIsNone(snapshot.deltas.flushes_completed)
+        self.assertAlmostEqual(snapshot.read_bytes_per_second, 20 * 512 / 60)
+        self.assertAlmostEqual(snapshot.written_bytes_per_second, 40 * 512 / 60)
+        self.assertAlmostEqual(snapshot.utilisation, 0.25)
+
+        self.monitor.remove_observer("sda", observer)
+        self.notify_monitor_about_current_disk_stats()
+        observer.on_poll.assert_called_once()
+        self.assertEqual(another_observer.on_poll.call_count, 2)
+
+    def test_isolates_failing_poll_observers(self):
+        self.add_disk("sda", DiskCounters(sectors_read=0, sectors_written=0))
+        failing_observer = mock.Mock()
+        failing_observer.on_poll.side_effect = RuntimeError("broken plugin")
+        observer = mock.Mock()
+        activity_observer = mock.Mock()
+        self.monitor.add_poll_observer("sda", failing_observer)
+        self.monitor.add_poll_observer("sda", observer)
+        self.monitor.add_observer("sda", activity_observer)
+        self.notify_monitor_about_current_disk_stats()
+
+        with self.assertLogs(level="ERROR") as logs:
+            self.make_all_disks_idle()
+        self.assertEqual(logs.output, ["ERROR:root:broken plugin"] * 2)
+        self.assertEqual(observer.on_poll.call_count, 2)
+        activity_observer.on_disk_idle.assert_called_once()
+
+    def test_marks_disk_active(self):
+        self.add_disk("sda", DiskCounters(sectors_read=0, sectors_written=0))
+        self.make_all_disks_idle()
+
+        observer = mock.Mock()
+        self.monitor.add_observer("sda", observer)
+        observer.reset_mock()
+
+        self.monitor.mark_active("sda")
+        observer.on_disk_active.assert_called_once()
+        self.monitor.mark_active("sda")
+        observer.on_disk_active.assert_called_once()
+
+        self.notify_monitor_about_current_disk_stats()
+        observer.on_disk_idle.assert_called_once()
+
+    def test_traced_io_makes_disk_active(self):
+        self.add_disk("sda", DiskCounters(sectors_read=0, sectors_written=0))
+        observer = mock.Mock()
+        self.monitor.add_observer("sda", observer, ActivityRules(min_sectors_read=16))
+        slow_observer = mock.Mock()
+        self.monitor.add_observer("sda", slow_observer, ActivityRules(busy_samples=2))
+        self.make_all_disks_idle()
+        self.assertIsNone(self.monitor.last_io_time("sda"))
+        observer.reset_mock()
+        slow_observer.reset_mock()
+
+        self.monitor.on_block_io("sda", 100.0, 8, 0)
+        self.assertEqual(self.monitor.last_io_time("sda"), 100.0)
+        observer.on_disk_active.assert_not_called()
+        self.monitor.on_block_io("sda", 99.0, 8, 0)
+        self.assertEqual(self.monitor.last_io_time("sda"), 100.0)
+        observer.on_disk_active.assert_called_once()
+        # Needs polls to confirm activity
+        slow_observer.on_disk_active.assert_not_called()
+
+        # Traced sectors are counted until the next poll only
+        self.notify_monitor_about_current_disk_stats()
+        observer.on_disk_idle.assert_called_once()
+        self.monitor.on_block_io("sda", 101.0, 8, 0)
+        observer.on_disk_active.assert_called_once()
+
+    def test_traced_io_of_hdmon_is_ignored(self):
+        self.add_disk("sda", DiskCounters(sectors_read=0, sectors_written=0))
+        self.make_all_disks_idle()
+        observer = mock.Mock()
+        self.monitor.add_observer("sda", observer)
+        observer.reset_mock()
+
+        self.monitor.ignore_sectors_read("sda", 8)
+        self.monitor.on_block_io("sda", 100.0, 8, 0)
+        observer.on_disk_active.assert_not_called()
+        self.assertEqual(self.monitor.last_io_time("sda"), 100.0)
+        self.monitor.on_block_io("sda", 100.0, 0, 1)
+        observer.on_disk_active.assert_called_once()
+
+    def test_keeps_activity_of_renamed_disks(self):
+        self.add_disk("sdb", DiskCounters(sectors_read=100, sectors_written=0))
+        self.make_all_disks_idle()
+        observer = mock.Mock()
+        self.monitor.add_observer("sdb", observer)
+        poll_observer = mock.Mock()
+        self.monitor.add_poll_observer("sdb", poll_observer)
+        observer.reset_mock()
+        poll_observer.reset_mock()
+
+        del self._disk_counters["sdb"]
+        self._disk_counters["sdc"] = DiskCounters(sectors_read=0, sectors_written=0)
+        new_observer = mock.Mock()
+        self.monitor.add_observer("sdc", new_observer)
+        new_observer.on_disk_idle.assert_not_called()
+        self.monitor.on_disks_renamed({"sdb": "sdc"})
+        new_observer.on_disk_idle.assert_called_once()
+        self.assertTrue(self.monitor.is_idle("sdc"))
+        self.assertIsNone(self.monitor.is_idle("sdb"))
+
+        # Counters of the new name are a new baseline
+        self.notify_monitor_about_current_disk_stats()
+        poll_observer.on_poll.assert_not_called()
+        self.notify_monitor_about_current_disk_stats()
+        poll_observer.on_poll.assert_called_once()
+        observer.on_disk_active.assert_not_called()
+        self.increment_disk_counters("sdc", sectors_read=1)
+        self.notify_monitor_about_current_disk_stats()
+        observer.on_disk_active.assert_called_once()
+        new_observer.on_disk_active.assert_called_once()
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,53 @@
+from pathlib import Path
+import tempfile
+import unittest
+
+from hdmon.lib.disk_identity import DiskIdentityResolver
+
+
+class DiskIdentityResolverTestCase(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.sysfs = Path(temp_dir.name) / "block"
+        self.udev = Path(temp_dir.name) / "udev"
+        self.udev.mkdir()
+        self.resolver = DiskIdentityResolver(str(self.sysfs), str(self.udev))
+
+    def add_disk(self, name, device_number, wwid=None, udev_properties=None):
+        (self.sysfs / name / "device").mkdir(parents=True)
+        (self.sysfs / name / "dev").write_text(f"{device_number}\n")
+        if wwid is not None:
+            (self.sysfs / name / "device" / "wwid").write_text(f"{wwid}\n")
+        if udev_properties is not None:
+            (self.udev / f"b{device_number}").write_text(
+                "S:disk/by-id/usb-disk\n"
+                + "".join(f"E:{key}={value}\n" for key, value in udev_properties)
+            )
+
+    def test_prefers_wwid(self):
+        self.add_disk(
+            "sda", "8:0", wwid="naa.5000c500a1b2c3d4", udev_properties=[("ID_WWN", "x")]
+        )
+        self.assertEqual(self.resolver.resolve("sda"), "naa.5000c500a1b2c3d4")
+
+    def test_falls_back_to_udev_properties(self):
+        self.add_disk(
+            "sdb",
+            "8:16",
+            udev_properties=[("ID_SERIAL", "WD_Elements_1234"), ("ID_WWN", "0x50014e")],
+        )
+        self.assertEqual(self.resolver.resolve("sdb"), "ID_WWN=0x50014e")
+        self.add_disk("sdc", "8:32", udev_properties=[("ID_SERIAL", "Generic_5678")])
+        self.assertEqual(self.resolver.resolve("sdc"), "ID_SERIAL=Generic_5678")
+
+    def test_returns_none_without_identity(self):
+        self.add_disk("sdd", "8:48", udev_properties=[("ID_BUS", "usb")])
+        self.assertIsNone(self.resolver.resolve("sdd"))
+        self.add_disk("sde", "8:64")
+        self.assertIsNone(self.resolver.resolve("sde"))
+        self.assertIsNone(self.resolver.resolve("sdf"))
+
+
+if __name__ == "__main__":
+    unittest.main()
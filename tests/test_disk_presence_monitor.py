@@ -153,6 +153,61 @@ class DiskPresenceMonitorTestCase(unittest.TestCase):
             ["sda", "sdc"], list(observer.on_disks_removed.call_args[0][0])
         )
 
+    def test_keeps_disks_with_the_same_identity_on_counter_regression(self):
+        identities = {"sda": "wwn-a"}
+        self.monitor = DiskPresenceMonitor(
+            identity_resolver=mock.Mock(resolve=identities.get)
+        )
+        self.add_disks([("sda", DiskCounters(100, 100))])
+        self.notify_monitor_about_current_disk_stats()
+
+        observer = mock.Mock()
+        self.monitor.add_observer(observer)
+        observer.reset_mock()
+        self.set_disk_counters("sda", DiskCounters(0, 0))
+        self.notify_monitor_about_current_disk_stats()
+        observer.on_disks_added.assert_not_called()
+        observer.on_disks_removed.assert_not_called()
+
+        self.set_disk_counters("sda", DiskCounters(100, 100))
+        self.notify_monitor_about_current_disk_stats()
+        identities["sda"] = "wwn-b"
+        self.set_disk_counters("sda", DiskCounters(0, 0))
+        self.notify_monitor_about_current_disk_stats()
+        observer.on_disks_added.assert_called_once_with({"sda"})
+        observer.on_disks_removed.assert_called_once_with({"sda"})
+
+    def test_detects_renamed_disks(self):
+        identities = {"sda": "wwn-a", "sdb": "wwn-b", "sdc": "wwn-b", "sdd": None}
+        self.monitor = DiskPresenceMonitor(
+            identity_resolver=mock.Mock(resolve=identities.get)
+        )
+        self.add_disks([("sda", DiskCounters(0, 0)), ("sdb", DiskCounters(0, 0))])
+        self.notify_monitor_about_current_disk_stats()
+
+        observer = mock.Mock()
+        self.monitor.add_observer(observer)
+        observer.reset_mock()
+        self.remove_disks(["sdb"])
+        self.add_disks([("sdc", DiskCounters(0, 0)), ("sdd", DiskCounters(0, 0))])
+        self.notify_monitor_about_current_disk_stats()
+        observer.on_disks_renamed.assert_called_once_with({"sdb": "sdc"})
+        observer.on_disks_added.assert_called_once_with({"sdd"})
+        observer.on_disks_removed.assert_not_called()
+        for device_name, identity in [
+            ("sda", "wwn-a"),
+            ("sdb", None),
+            ("sdc", "wwn-b"),
+            ("sdd", None),
+        ]:
+            with self.subTest(device_name=device_name):
+                self.assertEqual(self.monitor.identity(device_name), identity)
+
+        observer.reset_mock()
+        self.notify_monitor_about_current_disk_stats()
+        observer.on_disks_renamed.assert_not_called()
+        observer.on_disks_added.assert_not_called()
+
 
 if __name__ == "__main__":
     unittest.main()
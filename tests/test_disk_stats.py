@@ -0,0 +1,94 @@
+import os
+import tempfile
+import unittest
+
+from hdmon.lib.disk_stats import DiskCounters, iter_disk_stats
+
+
+class DiskStatsTestCase(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.path = os.path.join(temp_dir.name, "diskstats")
+
+    def parse(self, content):
+        with open(self.path, "w") as fh:
+            fh.write(content)
+        return list(iter_disk_stats(self.path))
+
+    def test_parses_all_fields(self):
+        self.assertEqual(
+            self.parse("   8       0 sda 1 2 3 4 5 6 7 8 9 10 11 12 13 14 15 16 17\n"),
+            [
+                (
+                    "sda",
+                    DiskCounters(
+                        sectors_read=3,
+                        sectors_written=7,
+                        reads_completed=1,
+                        reads_merged=2,
+                        read_ticks=4,
+                        writes_completed=5,
+                        writes_merged=6,
+                        write_ticks=8,
+                        in_flight=9,
+                        io_ticks=10,
+                        time_in_queue=11,
+                        discards_completed=12,
+                        discards_merged=13,
+                        sectors_discarded=14,
+                        discard_ticks=15,
+                        flushes_completed=16,
+                        flush_ticks=17,
+                    ),
+                )
+            ],
+        )
+
+    def test_older_kernels_have_fewer_fields(self):
+        (_name, with_discards), (_name, without_discards) = self.parse(
+            "   8       0 sda 1 2 3 4 5 6 7 8 9 10 11 12 13 14 15\n"
+            "   8      16 sdb 1 2 3 4 5 6 7 8 9 10 11\n"
+        )
+        self.assertEqual(with_discards.sectors_discarded, 14)
+        self.assertIsNone(with_discards.flushes_completed)
+        self.assertEqual(without_discards.io_ticks, 10)
+        self.assertIsNone(without_discards.discards_completed)
+
+    def test_reparses_changed_lines_only(self):
+        content = "   8       0 sda 1 2 3 4 5 6 7 8 9 10 11 12 13 14 15 16 17\n"
+        ((_name, first),) = self.parse(content)
+        ((_name, second),) = self.parse(content)
+        self.assertIs(first, second)
+        ((_name, third),) = self.parse(content.replace(" 3 ", " 4 "))
+        self.assertEqual(third.sectors_read, 4)
+
+    def test_keeps_previous_polls_of_each_file(self):
+        other_path = self.path + ".other"
+        with open(other_path, "w") as fh:
+            fh.write("   8       0 sda 1 2 30 4 5 6 70 8 9 10 11\n")
+        content = "   8       0 sda 1 2 3 4 5 6 7 8 9 10 11\n"
+        ((_name, first),) = self.parse(content)
+        ((_name, other_first),) = iter_disk_stats(other_path)
+        ((_name, second),) = self.parse(content)
+        ((_name, other_second),) = iter_disk_stats(other_path)
+        self.assertEqual(first.sectors_read, 3)
+        self.assertEqual(other_first.sectors_read, 30)
+        self.assertIs(first, second)
+        self.assertIs(other_first, other_second)
+
+    def test_compares_with_other_types(self):
+        ((_name, counters),) = self.parse("   8       0 sda 1 2 3 4 5 6 7 8 9 10 11\n")
+        self.assertEqual(counters, DiskCounters(3, 7, 1, 2, 4, 5, 6, 8, 9, 10, 11))
+        self.assertNotEqual(counters, None)
+        self.assertNotEqual(counters, 3)
+        self.assertFalse(counters == "sda")
+
+    def test_sector_counters_are_positional(self):
+        self.assertEqual(
+            DiskCounters(1, 2), DiskCounters(sectors_read=1, sectors_written=2)
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import os
+import tempfile
+import unittest
+
+from hdmon.lib import event_history
+from hdmon.lib.event_history import Event, EventHistoryWriter
+
+
+class EventHistoryTestCase(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.path = os.path.join(temp_dir.name, "run", "history")
+        self.persistent_path = os.path.join(temp_dir.name, "lib", "history")
+
+    def open_writer(self, capacity=4):
+        writer = EventHistoryWriter(self.path, self.persistent_path, capacity)
+        writer.open()
+        self.addCleanup(writer.close)
+        return writer
+
+    def test_appends_events(self):
+        writer = self.open_writer()
+        self.assertEqual(event_history.read_events(self.path), [])
+        writer.append(1.0, "sda", event_history.EVENT_IDLE)
+        writer.append(2.0, "sdb", event_history.EVENT_BUSY, 1.5)
+        self.assertEqual(
+            event_history.read_events(self.path),
+            [
+                Event(1.0, "sda", event_history.EVENT_IDLE),
+                Event(2.0, "sdb", event_history.EVENT_BUSY, 1.5),
+            ],
+        )
+
+    def test_overwrites_oldest_events(self):
+        writer = self.open_writer()
+        for timestamp in range(6):
+            writer.append(float(timestamp), "sda", event_history.EVENT_BUSY)
+        self.assertEqual(
+            [event.timestamp for event in event_history.read_events(self.path)],
+            # The oldest slot is skipped, the next event may be overwriting it
+            [3.0, 4.0, 5.0],
+        )
+
+    def test_continues_after_restart(self):
+        writer = self.open_writer()
+        writer.append(1.0, "sda", event_history.EVENT_IDLE)
+        writer.close()
+        writer = self.open_writer()
+        writer.append(2.0, "sda", event_history.EVENT_BUSY)
+        self.assertEqual(len(event_history.read_events(self.path)), 2)
+
+    def test_restores_persisted_events_after_reboot(self):
+        writer = self.open_writer()
+        writer.append(1.0, "sda", event_history.EVENT_IDLE)
+        writer.persist()
+        writer.append(2.0, "sda", event_history.EVENT_BUSY)
+        os.remove(self.path)  # tmpfs is gone
+        self.open_writer()
+        self.assertEqual(
+            event_history.read_events(self.path),
+            [Event(1.0, "sda", event_history.EVENT_IDLE)],
+        )
+
+    def test_persists_only_changed_ring(self):
+        writer = self.open_writer()
+        writer.append(1.0, "sda", event_history.EVENT_IDLE)
+        writer.persist()
+        os.remove(self.persistent_path)
+        writer.persist()
+        self.assertFalse(os.path.exists(self.persistent_path))
+        writer.append(2.0, "sda", event_history.EVENT_COMMAND_FAILED)
+        writer.persist()
+        self.assertTrue(os.path.exists(self.persistent_path))
+
+    def test_starts_over_if_capacity_changes(self):
+        writer = self.open_writer()
+        writer.append(1.0, "sda", event_history.EVENT_IDLE)
+        writer.close()
+        self.open_writer(capacity=8)
+        self.assertEqual(event_history.read_events(self.path), [])
+
+    def test_summarizes_events(self):
+        events = [
+            Event(0.0, "sda", event_history.EVENT_ADDED),
+            Event(10.0, "sda", event_history.EVENT_IDLE),
+            Event(15.0, "sda", event_history.EVENT_COMMAND_FAILED),
+            Event(20.0, "sda", event_history.EVENT_SPUN_DOWN),
+            Event(110.0, "sda", event_history.EVENT_BUSY),
+            Event(120.0, "sda", event_history.EVENT_IDLE),
+            Event(150.0, "sda", event_history.EVENT_BUSY),
+            Event(200.0, "sdb", event_history.EVENT_IDLE),
+            Event(300.0, "sdb", event_history.EVENT_REMOVED),
+        ]
+        summaries = event_history.summarize(events)
+        self.assertEqual(summaries["sda"].spin_downs, 1)
+        self.assertEqual(summaries["sda"].command_failures, 1)
+        self.assertEqual(summaries["sda"].idle_periods, [100.0, 30.0])
+        self.assertEqual(summaries["sda"].median_idle_period, 65.0)
+        self.assertEqual(summaries["sda"].max_idle_period, 100.0)
+        self.assertEqual(summaries["sda"].hotplug_events, 1)
+        self.assertEqual(summaries["sdb"].idle_periods, [])
+        self.assertIsNone(summaries["sdb"].mean_idle_period)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+
+from hdmon.lib.histogram import LogHistogram
+from hdmon.lib.idle_delay_learner import IdleDelayLearner
+
+
+_MINUTE = 60
+_HOUR = 60 * _MINUTE
+_DAY = 24 * _HOUR
+
+
+class LogHistogramTestCase(unittest.TestCase):
+    def test_counts_values_above_bound(self):
+        histogram = LogHistogram(min_value=1, max_value=16, buckets_per_doubling=1)
+        self.assertEqual([1, 2, 4, 8, 16], histogram.bounds)
+        for value in [0.5, 1, 3, 3, 100]:
+            histogram.add(value)
+        self.assertEqual(4, histogram.count_above(0))
+        self.assertEqual(3, histogram.count_above(1))
+        self.assertEqual(1, histogram.count_above(2))
+        self.assertEqual(1, histogram.count_above(4))
+
+    def test_decays_counts(self):
+        histogram = LogHistogram(min_value=1, max_value=16)
+        histogram.add(2)
+        histogram.add(4)
+        histogram.decay(0.5)
+        self.assertEqual(1, histogram.total)
+
+    def test_restores_state(self):
+        histogram = LogHistogram(min_value=1, max_value=16)
+        histogram.add(2)
+        restored = LogHistogram(min_value=1, max_value=16)
+        restored.load_state(histogram.to_state())
+        self.assertEqual(1, restored.total)
+
+        different = LogHistogram(min_value=1, max_value=32)
+        different.load_state(histogram.to_state())
+        self.assertEqual(0, different.total)
+
+
+class IdleDelayLearnerTestCase(unittest.TestCase):
+    def create_learner(self, max_spin_ups_per_day=4):
+        return IdleDelayLearner(
+            max_spin_ups_per_day=max_spin_ups_per_day,
+            min_delay=10 * _MINUTE,
+            max_delay=1 * _DAY,
+            initial_delay=2 * _HOUR,
+        )
+
+    def observe_days(self, learner, days, gaps_per_day):
+        for _day in range(days):
+            for gap in gaps_per_day:
+                learner.add_idle_gap(gap)
+            learner.add_observation_time(_DAY)
+            learner.update_delay()
+
+    def test_uses_initial_delay_while_learning(self):
+        learner = self.create_learner()
+        learner.add_idle_gap(40 * _MINUTE)
+        learner.add_observation_time(_HOUR)
+        self.assertFalse(learner.update_delay())
+        self.assertEqual(2 * _HOUR, learner.delay)
+
+    def test_waits_out_frequent_short_gaps(self):
+        learner = self.create_learner(max_spin_ups_per_day=4)
+        # Media disk: accessed every 40 minutes during the day, one night gap
+        self.observe_days(learner, 3, [40 * _MINUTE] * 20 + [8 * _HOUR])
+        self.assertGreater(learner.delay, 40 * _MINUTE)
+        self.assertLessEqual(learner.delay, 8 * _HOUR)
+
+    def test_spins_down_rarely_used_disks_early(self):
+        learner = self.create_learner(max_spin_ups_per_day=4)
+        # Backup disk: idle for the whole day after the backup
+        self.observe_days(learner, 3, [23 * _HOUR])
+        self.assertEqual(10 * _MINUTE, learner.delay)
+
+    def test_restores_state(self):
+        learner = self.create_learner(max_spin_ups_per_day=1)
+        self.observe_days(learner, 3, [30 * _MINUTE] * 10)
+        restored = self.create_learner(max_spin_ups_per_day=1)
+        restored.load_state(learner.to_state())
+        self.assertEqual(learner.delay, restored.delay)
+        self.assertTrue(restored.is_trained)
+
+
+if __name__ == "__main__":
+    unittest.main()
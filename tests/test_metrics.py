@@ -0,0 +1,42 @@
+import unittest
+
+from hdmon.lib.metrics import LatencyBuckets, format_histogram, format_values
+
+
+class LatencyBucketsTestCase(unittest.TestCase):
+    def test_counts_values_in_buckets(self):
+        histogram = LatencyBuckets(first_bound=1, factor=2, bucket_count=3)
+        self.assertEqual(histogram.bounds, [1, 2, 4])
+        for value in [0.5, 1, 1.5, 4, 100]:
+            histogram.add(value)
+        self.assertEqual(histogram.counts, [2, 1, 1, 1])
+        self.assertEqual(histogram.sum, 107)
+        self.assertEqual(histogram.count, 5)
+
+    def test_formats_cumulative_buckets(self):
+        histogram = LatencyBuckets(first_bound=0.5, factor=2, bucket_count=2)
+        histogram.add(0.25)
+        histogram.add(3)
+        self.assertEqual(
+            format_histogram("latency_seconds", "Latency.", {"sda": histogram}),
+            [
+                "# HELP latency_seconds Latency.",
+                "# TYPE latency_seconds histogram",
+                'latency_seconds_bucket{disk="sda",le="0.5"} 1',
+                'latency_seconds_bucket{disk="sda",le="1"} 1',
+                'latency_seconds_bucket{disk="sda",le="+Inf"} 2',
+                'latency_seconds_sum{disk="sda"} 3.25',
+                'latency_seconds_count{disk="sda"} 2',
+            ],
+        )
+
+    def test_formats_values(self):
+        self.assertEqual(
+            format_values("wakes", "gauge", "Wakes.", {"sdb": 2, "sda": 1}),
+            [
+                "# HELP wakes Wakes.",
+                "# TYPE wakes gauge",
+                'wakes{disk="sda"} 1',
+                'wakes{disk="sdb"} 2',
+            ],
+        )
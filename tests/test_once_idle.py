@@ -0,0 +1,80 @@
+from unittest import mock
+import unittest
+
+from hdmon.lib.state_store import StateStore
+from hdmon.plugins.once_idle import OnceIdle
+
+
+class OnceIdleTestCase(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch("hdmon.plugins.once_idle.DiskWriteback")
+        self.writeback = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        self.scheduler = mock.Mock()
+        self.disk_activity_monitor = mock.Mock()
+        self.disk_activity_monitor.last_io_time.return_value = None
+        self.spin_down_monitor = mock.Mock()
+        self.plugin = OnceIdle(
+            device_name="sda",
+            disk_path="/dev/sda",
+            scheduler=self.scheduler,
+            config={"delay": "10m", "run": "true", "writeback": {}},
+            disk_activity_monitor=self.disk_activity_monitor,
+            spin_down_monitor=self.spin_down_monitor,
+        )
+
+    def fire_timer(self):
+        _delay, callback = self.scheduler.set_timer.call_args.args
+        callback()
+
+    def test_ignores_writeback_on_disk_and_its_array(self):
+        self.writeback.pending_kb.side_effect = [64, 0]
+        self.writeback.sync.return_value = {"sda": 128, "md0": 128}
+        self.plugin.on_disk_idle()
+        with mock.patch("hdmon.lib.shell.run", return_value=True) as run:
+            self.fire_timer()
+        self.disk_activity_monitor.ignore_sectors_written.assert_has_calls(
+            [mock.call("sda", 128), mock.call("md0", 128)]
+        )
+        run.assert_called_once_with("true", env={"disk_path": "/dev/sda"})
+        self.spin_down_monitor.notify_spun_down.assert_called_once_with("sda")
+
+    def test_records_failed_commands(self):
+        self.writeback.pending_kb.return_value = 0
+        self.plugin.on_disk_idle()
+        with mock.patch("hdmon.lib.shell.run", return_value=False):
+            self.fire_timer()
+        self.spin_down_monitor.notify_spin_down_failed.assert_called_once_with("sda")
+        self.spin_down_monitor.notify_spun_down.assert_not_called()
+
+    def test_saves_learned_state_after_idle_gaps_and_removal(self):
+        with mock.patch.object(StateStore, "load", return_value=None):
+            plugin = OnceIdle(
+                device_name="sda",
+                disk_path="/dev/sda",
+                scheduler=self.scheduler,
+                config={
+                    "delay": "10m",
+                    "run": "true",
+                    "adaptive": {"max_spin_ups_per_day": 4},
+                },
+                disk_activity_monitor=self.disk_activity_monitor,
+                spin_down_monitor=self.spin_down_monitor,
+                disk_id="wwn-a",
+            )
+        with mock.patch.object(StateStore, "save") as save:
+            plugin.on_disk_active()
+            plugin.on_disk_active()
+            save.assert_not_called()
+            plugin.on_disk_idle()
+            plugin.on_disk_active()
+            save.assert_called_once_with("once_idle-wwn-a", mock.ANY)
+            save.reset_mock()
+            plugin.on_disk_active()
+            save.assert_not_called()
+            plugin.on_disk_removed()
+            save.assert_called_once_with("once_idle-wwn-a", mock.ANY)
+
+
+if __name__ == "__main__":
+    unittest.main()
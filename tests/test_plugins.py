@@ -0,0 +1,39 @@
+from unittest import mock
+import sys
+import unittest
+
+from hdmon import plugins
+from hdmon.plugins.base import PluginFactory
+
+
+class PluginsTestCase(unittest.TestCase):
+    def test_loads_builtin_plugin(self):
+        from hdmon.plugins import once_idle
+
+        self.assertIs(plugins.load_factory_class("once_idle"), once_idle.Factory)
+
+    def test_imports_plugin_on_demand(self):
+        sys.modules.pop("hdmon.plugins.smart", None)
+        plugins.load_factory_class("once_idle")
+        self.assertNotIn("hdmon.plugins.smart", sys.modules)
+
+    def test_loads_plugin_from_entry_point(self):
+        class Factory(PluginFactory):
+            def create_plugin(self, device_name, disk_path):
+                raise NotImplementedError()
+
+        entry_point = mock.Mock(value="third_party:Factory")
+        entry_point.name = "third_party"
+        entry_point.load.return_value = Factory
+        with mock.patch.object(
+            plugins, "_find_entry_point", return_value=entry_point
+        ) as find_entry_point:
+            self.assertIs(plugins.load_factory_class("third_party"), Factory)
+        find_entry_point.assert_called_once_with("third_party")
+
+    def test_unknown_plugin(self):
+        self.assertIsNone(plugins.load_factory_class("no_such_plugin"))
+
+
+if __name__ == "__main__":
+    unittest.main()
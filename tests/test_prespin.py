@@ -0,0 +1,142 @@
+from unittest import mock
+import os
+import tempfile
+import unittest
+
+from hdmon.lib.access_predictor import AccessPredictor
+from hdmon.plugins import prespin
+
+
+# Longer than lead, slot and detection delay together
+_AFTER_DEADLINE = 1200
+
+
+class PrespinTestCase(unittest.TestCase):
+    def setUp(self):
+        self.now = 1_000_000.0
+        for name in ["time.monotonic", "time.time"]:
+            patcher = mock.patch(name, side_effect=lambda: self.now)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(
+            AccessPredictor, "is_access_expected", return_value=True
+        )
+        self.is_access_expected = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch("hdmon.plugins.prespin.wake_disk", return_value=0.0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.state_dir = temp_dir.name
+        self.scheduler = mock.Mock()
+        self.disk_activity_monitor = mock.Mock()
+        self.plugin = self.create_factory().create_plugin("sda", "/dev/sda")
+        self.plugin.on_disk_idle()
+        self.now += 3600
+
+    def create_factory(self, **kwargs):
+        return prespin.Factory(
+            scheduler=self.scheduler,
+            config={"lead": "2m", "min_idle": "10m", "state_dir": self.state_dir},
+            disk_activity_monitor=self.disk_activity_monitor,
+            spin_down_monitor=mock.Mock(),
+            **kwargs,
+        )
+
+    def fire_timer(self) -> bool:
+        """Returns True if the disk has been woken up"""
+        self.disk_activity_monitor.ignore_sectors_read.reset_mock()
+        _delay, callback = self.scheduler.set_timer.call_args.args
+        callback()
+        return self.disk_activity_monitor.ignore_sectors_read.called
+
+    def hit(self) -> bool:
+        is_woken_up = self.fire_timer()
+        self.now += 180
+        self.plugin.on_disk_active()
+        self.plugin.on_disk_idle()
+        self.now += 3600
+        return is_woken_up
+
+    def miss(self) -> bool:
+        """The prediction is judged on the next one or the next wake up"""
+        is_woken_up = self.fire_timer()
+        self.now += _AFTER_DEADLINE
+        return is_woken_up
+
+    def status(self):
+        return self.plugin.get_status()
+
+    def test_wakes_disk_up_before_predicted_access(self):
+        self.assertTrue(self.hit())
+        self.disk_activity_monitor.ignore_sectors_read.assert_called_once_with(
+            "sda", prespin.WAKE_SECTORS
+        )
+        self.assertEqual(
+            self.status(), {"enabled": True, "precision": 1.0, "recall": 1.0}
+        )
+
+    def test_doesnt_wake_busy_disk_or_without_expected_access(self):
+        self.plugin.on_disk_active()
+        self.assertFalse(self.fire_timer())
+        self.plugin.on_disk_idle()
+        self.is_access_expected.return_value = False
+        self.assertFalse(self.fire_timer())
+        # Only the unpredicted wake up has been counted
+        self.assertEqual(
+            self.status(), {"enabled": True, "precision": None, "recall": 0.0}
+        )
+
+    def test_counts_missed_predictions_and_unpredicted_wake_ups(self):
+        self.assertTrue(self.miss())
+        self.is_access_expected.return_value = False
+        self.assertFalse(self.hit())
+        self.assertEqual(
+            self.status(), {"enabled": True, "precision": 0.0, "recall": 0.0}
+        )
+
+    def test_disables_itself_when_imprecise_and_enables_again(self):
+        for _ in range(prespin._MIN_PREDICTIONS_TO_JUDGE):
+            self.assertTrue(self.miss())
+        # The last miss disables waking up before the next prediction
+        self.assertFalse(self.hit())
+        self.assertFalse(self.status()["enabled"])
+
+        # Predictions are still judged without waking the disk up
+        for _ in range(prespin._MIN_PREDICTIONS_TO_JUDGE - 2):
+            self.assertFalse(self.hit())
+        self.assertFalse(self.status()["enabled"])
+        self.assertFalse(self.hit())
+        self.assertTrue(self.status()["enabled"])
+        self.assertEqual(self.plugin.precision, 0.5)
+        self.assertTrue(self.hit())
+
+    def test_keeps_state_under_disk_identity(self):
+        disk_presence_monitor = mock.Mock()
+        disk_presence_monitor.identity.return_value = "ID_SERIAL=WDC WD40"
+        factory = self.create_factory(disk_presence_monitor=disk_presence_monitor)
+        plugin = factory.create_plugin("sdb", "/dev/sdb")
+        disk_presence_monitor.identity.assert_called_once_with("sdb")
+        plugin.on_disk_renamed("sdc", "/dev/sdc")
+        plugin.on_disk_idle()
+        self.now += 3600
+        plugin.on_disk_active()
+        self.assertEqual(
+            os.listdir(self.state_dir), ["prespin-ID_SERIAL=WDC_WD40.json"]
+        )
+
+        # Learned again after a restart, whatever the name of the disk
+        restarted_plugin = self.create_factory(
+            disk_presence_monitor=disk_presence_monitor
+        ).create_plugin("sdd", "/dev/sdd")
+        self.assertEqual(
+            restarted_plugin._predictor.to_state(), plugin._predictor.to_state()
+        )
+        self.assertNotEqual(
+            self.plugin._predictor.to_state(), plugin._predictor.to_state()
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
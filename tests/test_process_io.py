@@ -0,0 +1,80 @@
+from pathlib import Path
+import tempfile
+import unittest
+
+from hdmon.lib.process_io import ProcessIoSampler
+
+
+class ProcessIoSamplerTestCase(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.proc = Path(temp_dir.name)
+        (self.proc / "self").mkdir()
+
+    def set_process(self, pid, read_bytes, write_bytes=0, cmdline=None):
+        path = self.proc / str(pid)
+        path.mkdir(exist_ok=True)
+        (path / "io").write_text(
+            f"rchar: 1\nwchar: 1\nsyscr: 1\nsyscw: 1\n"
+            f"read_bytes: {read_bytes}\nwrite_bytes: {write_bytes}\n"
+            f"cancelled_write_bytes: 0\n"
+        )
+        if cmdline is not None or not (path / "cmdline").exists():
+            (path / "cmdline").write_bytes(cmdline or b"")
+            (path / "comm").write_text("kworker\n")
+
+    def remove_process(self, pid):
+        for file in (self.proc / str(pid)).iterdir():
+            file.unlink()
+        (self.proc / str(pid)).rmdir()
+
+    def test_finds_top_processes(self):
+        sampler = ProcessIoSampler(str(self.proc))
+        self.set_process(1, 100, cmdline=b"/sbin/init\0")
+        self.set_process(2, 100)
+        self.set_process(3, 100, cmdline=b"rsync\0-a\0/src\0/dst\0")
+        baseline = sampler.take_baseline()
+
+        self.set_process(1, 110)
+        self.set_process(2, 150)
+        self.set_process(3, 100, write_bytes=1000)
+        self.set_process(4, 20, cmdline=b"sh\0-c\0backup\0")
+        self.remove_process(1)
+        self.assertEqual(
+            [(3, "rsync -a /src /dst", 1000), (2, "[kworker]", 50)],
+            sampler.find_top_contributors(baseline, 2),
+        )
+        self.assertEqual(
+            (4, "sh -c backup", 20), sampler.find_top_contributors(baseline, 3)[-1]
+        )
+
+    def test_bounds_reads_per_scan(self):
+        sampler = ProcessIoSampler(str(self.proc), max_reads=4)
+        for pid in range(1, 5):
+            self.set_process(pid, 0)
+        baseline = sampler.take_baseline()
+        for pid in range(1, 5):
+            self.set_process(pid, 10)
+        for pid in range(5, 11):
+            self.set_process(pid, 10)
+
+        # New processes are read first
+        top = sampler.find_top_contributors(baseline, 10)
+        self.assertCountEqual([5, 6, 7, 8], [pid for pid, _command, _bytes in top])
+        # Then the rest in turns
+        top = sampler.find_top_contributors(baseline, 10)
+        self.assertEqual(8, len(top))
+
+    def test_ignores_processes_with_unknown_baseline(self):
+        for pid in range(1, 11):
+            self.set_process(pid, 100)
+        sampler = ProcessIoSampler(str(self.proc), max_reads=4)
+        baseline = sampler.take_baseline()
+        for _scan in range(3):
+            sampler.find_top_contributors(baseline, 10)
+        self.assertEqual([], sampler.find_top_contributors(baseline, 10))
+
+
+if __name__ == "__main__":
+    unittest.main()
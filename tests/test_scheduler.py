@@ -0,0 +1,56 @@
+import threading
+import time
+import unittest
+
+from hdmon.lib.scheduler import Scheduler
+
+
+class SchedulerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = Scheduler()
+        self.calls = []
+
+    def test_runs_timers_in_order(self):
+        self.scheduler.set_timer(0.02, lambda: self.calls.append(2))
+        self.scheduler.set_timer(0.01, lambda: self.calls.append(1))
+        self.scheduler.run()
+        self.assertEqual([1, 2], self.calls)
+
+    def test_skips_cleared_timers(self):
+        timer_id = self.scheduler.set_timer(0, lambda: self.calls.append(1))
+        self.scheduler.set_timer(0, lambda: self.calls.append(2))
+        self.scheduler.clear_timer(timer_id)
+        self.scheduler.run()
+        self.assertEqual([2], self.calls)
+
+    def test_runs_callbacks_from_other_threads_without_waiting_for_timers(self):
+        self.scheduler.set_timer(60, lambda: self.calls.append("timer"))
+
+        def callback():
+            self.calls.append("callback")
+            self.scheduler.stop()
+
+        threading.Timer(
+            0.01, lambda: self.scheduler.call_soon_threadsafe(callback)
+        ).start()
+        self.scheduler.run()
+        self.assertEqual(["callback"], self.calls)
+
+    def test_logs_stalls(self):
+        scheduler = Scheduler(stall_threshold=0.02)
+
+        def blocking_callback():
+            time.sleep(0.05)
+
+        scheduler.set_timer(0, blocking_callback)
+        scheduler.set_timer(0, lambda: self.calls.append(1))
+        with self.assertLogs(level="WARNING") as logs:
+            scheduler.run()
+        self.assertEqual([1], self.calls)
+        self.assertGreater(scheduler.last_lag, 0.02)
+        self.assertIn("blocking_callback blocked the scheduler", logs.output[0])
+        self.assertIn("fired", logs.output[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
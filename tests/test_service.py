@@ -0,0 +1,304 @@
+from unittest import mock
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+from hdmon import service
+from hdmon.lib import event_history, status_file
+from hdmon.lib.disk_identity import DiskIdentityResolver
+from hdmon.lib.disk_stats import DiskCounters
+from hdmon.lib.error_handling import UsageError
+from hdmon.lib.event_history import EventHistoryWriter
+from hdmon.lib.wake import WakeResult
+from hdmon.plugins.base import Plugin, PluginFactory
+
+
+class RecordingPlugin(Plugin):
+    api_version = 4
+
+    def __init__(self, device_name):
+        self.device_name = device_name
+        self.events = []
+
+    def on_disk_active(self):
+        self.events.append("active")
+
+    def on_disk_idle(self):
+        self.events.append("idle")
+
+    def on_disk_removed(self):
+        self.events.append("removed")
+
+    def on_disk_renamed(self, device_name, disk_path):
+        self.events.append(f"renamed to {device_name}")
+        self.device_name = device_name
+
+
+class OldPlugin(RecordingPlugin):
+    api_version = 3
+
+
+class RecordingFactory(PluginFactory):
+    plugin_class = RecordingPlugin
+
+    def create_plugin(self, device_name, disk_path):
+        return self.plugin_class(device_name)
+
+
+class OldFactory(RecordingFactory):
+    plugin_class = OldPlugin
+
+
+class HistoryTestCase(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.path = os.path.join(temp_dir.name, "run", "history")
+        self.persistent_path = os.path.join(temp_dir.name, "lib", "history")
+        patcher = mock.patch.object(
+            service, "PERSISTENT_HISTORY_FILE_PATH", self.persistent_path
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def print_history(self):
+        args = argparse.Namespace(disks=[], since=None, until=None, file=self.path)
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            self.assertEqual(service.history(args), 0)
+        return output.getvalue()
+
+    def test_prints_summaries(self):
+        writer = EventHistoryWriter(self.path, self.persistent_path, 4)
+        writer.open()
+        self.addCleanup(writer.close)
+        writer.append(1.0, "sda", event_history.EVENT_COMMAND_FAILED)
+        writer.append(2.0, "sda", event_history.EVENT_SPUN_DOWN)
+        self.assertEqual(self.print_history(), "sda: 1 spin-downs, 1 failed commands\n")
+
+    def test_prints_no_events_without_history_files(self):
+        self.assertEqual(self.print_history(), "no events\n")
+
+
+class ServiceTestCase(unittest.TestCase):
+    """Runs polls through the service and its monitors"""
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.temp_dir = temp_dir.name
+        self.status_path = os.path.join(self.temp_dir, "status")
+        self.identities = {"sda": "wwn-a", "sdb": "wwn-b", "sdc": "wwn-a"}
+        self.activity_devices = {}
+        self.disk_paths = ["/dev/sda", "/dev/sdb"]
+        for target, kwargs in [
+            ("hdmon.service.BlockTopology", {}),
+            ("hdmon.service.BlockTraceSource", {}),
+            (
+                "hdmon.plugins.load_factory_class",
+                {"side_effect": {"new": RecordingFactory, "old": OldFactory}.get},
+            ),
+            (
+                "hdmon.service.DiskMonitoringService._find_disk_paths",
+                {"side_effect": lambda patterns: iter(self.disk_paths)},
+            ),
+        ]:
+            patcher = mock.patch(target, **kwargs)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(
+            DiskIdentityResolver, "resolve", side_effect=self.identities.get
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.service = service.DiskMonitoringService(
+            {
+                "trace_block_io": True,
+                "profiles": [
+                    {"name": "archive", "disks": ["/dev/sd*"], "new": {}, "old": {}}
+                ],
+            },
+            control_socket_path=os.path.join(self.temp_dir, "control.sock"),
+            status_file_path=self.status_path,
+            history_file_path=os.path.join(self.temp_dir, "history"),
+            persistent_history_file_path=os.path.join(self.temp_dir, "lib", "history"),
+        )
+        topology = service.BlockTopology.return_value
+        topology.activity_device.side_effect = lambda device_name: (
+            self.activity_devices.get(device_name, device_name)
+        )
+        topology.enclosure.return_value = None
+        self.block_trace = service.BlockTraceSource.return_value
+        for writer in [
+            self.service._status_file_writer,
+            self.service._event_history_writer,
+        ]:
+            writer.open()
+            self.addCleanup(writer.close)
+
+    def poll(self, *device_names, sectors_read=0):
+        disk_stats = [
+            (device_name, DiskCounters(sectors_read, 0)) for device_name in device_names
+        ]
+        with mock.patch(
+            "hdmon.lib.disk_stats_monitor.iter_disk_stats", return_value=disk_stats
+        ):
+            self.service._disk_stats_monitor._on_timer()
+
+    def plugins_of(self, device_name):
+        return self.service._get_status([device_name])[device_name]["plugins"]
+
+
+class RenameTestCase(ServiceTestCase):
+    def rename_sda_to_sdc(self, *other_device_names):
+        self.poll("sda", "sdb", *other_device_names)
+        self.poll("sda", "sdb", *other_device_names)
+        self.assertEqual(self.plugins_of("sda"), {"new": None, "old": None})
+        throughput_history = self.service._throughput_histories["sda"]
+        plugins = self.service._disk_monitorings["sda"].plugins
+        kept_plugin, old_plugin = plugins["new"], plugins["old"]
+
+        self.disk_paths = ["/dev/sdb", "/dev/sdc"]
+        self.poll("sdb", "sdc", *other_device_names)
+
+        self.assertEqual(self.service._get_status([]).keys(), {"sdb", "sdc"})
+        self.assertIs(self.service._throughput_histories["sdc"], throughput_history)
+        self.assertNotIn("sda", self.service._throughput_histories)
+        monitoring = self.service._disk_monitorings["sdc"]
+        self.assertIs(monitoring.plugins["new"], kept_plugin)
+        self.assertEqual(kept_plugin.events, ["idle", "renamed to sdc"])
+        # Plugins that can't be renamed are recreated
+        self.assertEqual(old_plugin.events, ["idle", "removed"])
+        recreated_plugin = monitoring.plugins["old"]
+        self.assertIsNot(recreated_plugin, old_plugin)
+        self.assertEqual(recreated_plugin.device_name, "sdc")
+        self.assertEqual(set(status_file.read_status(self.status_path)), {"sdb", "sdc"})
+
+        self.poll("sdb", "sdc", *other_device_names, sectors_read=8)
+        self.assertEqual(kept_plugin.events[-1], "active")
+        self.assertEqual(recreated_plugin.events[-1], "active")
+        self.assertFalse(status_file.read_status(self.status_path)["sdc"].is_idle)
+        return monitoring
+
+    def test_keeps_monitoring_of_renamed_disk(self):
+        monitoring = self.rename_sda_to_sdc()
+        self.assertEqual(monitoring.activity_device_name, "sdc")
+        (
+            device_names,
+            activity_device_names,
+        ) = self.block_trace.set_device_names.call_args.args
+        self.assertEqual(set(device_names), {"sdb", "sdc"})
+        self.assertEqual(activity_device_names, {"sdb": "sdb", "sdc": "sdc"})
+
+    def test_keeps_monitoring_of_renamed_array_member(self):
+        self.activity_devices = {"sda": "md0", "sdc": "md0"}
+        monitoring = self.rename_sda_to_sdc("md0")
+        self.assertEqual(monitoring.activity_device_name, "md0")
+        (
+            device_names,
+            activity_device_names,
+        ) = self.block_trace.set_device_names.call_args.args
+        self.assertEqual(set(device_names), {"sdb", "sdc"})
+        self.assertEqual(activity_device_names, {"sdb": "sdb", "sdc": "md0"})
+
+
+class WakeTestCase(ServiceTestCase):
+    array_members = {}
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch(
+            "hdmon.lib.control.call_in_scheduler",
+            side_effect=lambda scheduler, function: function(),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.activity_devices.update(self.array_members)
+        self.device_names = ["sda", "sdb", "sdc", *set(self.array_members.values())]
+        self.poll(*self.device_names)
+        self.poll(*self.device_names)
+
+    def wake(self, targets):
+        with mock.patch(
+            "hdmon.lib.wake.wake_disks",
+            return_value={
+                "/dev/sda": WakeResult(latency=7.5),
+                "/dev/sdb": WakeResult(error="Input/output error"),
+            },
+        ) as wake_disks:
+            with self.assertLogs(level="INFO"):
+                result = self.service._handle_wake(
+                    {"targets": targets, "max_parallel": 1}
+                )
+        return wake_disks, result
+
+    def test_wakes_disks_up(self):
+        wake_disks, result = self.wake(["archive"])
+        wake_disks.assert_called_once()
+        self.assertCountEqual(wake_disks.call_args.args[0], ["/dev/sda", "/dev/sdb"])
+        self.assertEqual(wake_disks.call_args.kwargs, {"max_parallel": 1})
+        self.assertEqual(
+            result,
+            {
+                "sda": {"latency": 7.5, "error": None},
+                "sdb": {"latency": None, "error": "Input/output error"},
+            },
+        )
+        # Idle timers start over
+        for device_name in ["sda", "sdb"]:
+            self.assertFalse(
+                self.service._disk_activity_monitor.is_idle(
+                    self.activity_devices.get(device_name, device_name)
+                )
+            )
+
+    def test_resolves_profiles_and_monitored_disks(self):
+        link = os.path.join(self.temp_dir, "ata-disk")
+        os.symlink("/dev/sdb", link)
+        for targets, expected_device_names in [
+            (["1"], ["sda", "sdb"]),
+            (["sdb"], ["sdb"]),
+            (["/dev/sda"], ["sda"]),
+            ([link, "sda"], ["sdb", "sda"]),
+        ]:
+            with self.subTest(targets=targets):
+                self.assertEqual(
+                    self.service._resolve_targets(targets),
+                    {
+                        device_name: f"/dev/{device_name}"
+                        for device_name in expected_device_names
+                    },
+                )
+
+    def test_refuses_other_devices(self):
+        link = os.path.join(self.temp_dir, "null")
+        os.symlink("/dev/null", link)
+        for target in ["sdc", "/dev/sdc", "/dev/null", link, "/etc/passwd", "2"]:
+            with self.subTest(target=target):
+                with self.assertRaises(UsageError):
+                    self.service._resolve_targets(["sda", target])
+
+
+class ArrayMemberWakeTestCase(WakeTestCase):
+    array_members = {"sda": "md0", "sdb": "md0"}
+
+    def test_marks_array_active(self):
+        plugins = self.service._disk_monitorings["sda"].plugins.values()
+        for plugin in plugins:
+            self.assertEqual(plugin.events, ["idle"])
+        with mock.patch.object(
+            self.service._disk_activity_monitor,
+            "mark_active",
+            wraps=self.service._disk_activity_monitor.mark_active,
+        ) as mark_active:
+            self.wake(["sda", "sdb"])
+        mark_active.assert_called_once_with("md0")
+        for plugin in plugins:
+            self.assertEqual(plugin.events, ["idle", "active"])
+
+
+if __name__ == "__main__":
+    unittest.main()
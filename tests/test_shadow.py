@@ -0,0 +1,153 @@
+from unittest import mock
+import unittest
+
+from hdmon.lib.disk_activity_monitor import DiskSnapshot
+from hdmon.lib.disk_stats import DiskCounters
+from hdmon.lib.spin_down_monitor import SpinDownMonitor
+from hdmon.plugins import shadow
+
+
+class FakeScheduler:
+    """Runs timers when time is advanced"""
+
+    def __init__(self, test_case):
+        self._test_case = test_case
+        self._timers = {}
+        self._next_timer_id = 0
+
+    def set_timer(self, delay, callback):
+        self._next_timer_id += 1
+        self._timers[self._next_timer_id] = (self._test_case.now + delay, callback)
+        return self._next_timer_id
+
+    def clear_timer(self, timer_id):
+        del self._timers[timer_id]
+
+    def advance(self, seconds):
+        deadline = self._test_case.now + seconds
+        while True:
+            due = [
+                (fire_at, timer_id)
+                for timer_id, (fire_at, _callback) in self._timers.items()
+                if fire_at <= deadline
+            ]
+            if not due:
+                break
+            fire_at, timer_id = min(due)
+            self._test_case.now = fire_at
+            _fire_at, callback = self._timers.pop(timer_id)
+            callback()
+        self._test_case.now = deadline
+
+
+class ShadowTestCase(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch("time.monotonic", side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.scheduler = FakeScheduler(self)
+        self.disk_activity_monitor = mock.Mock()
+        self.disk_activity_monitor.last_io_time.return_value = None
+        self.spin_down_monitor = SpinDownMonitor()
+        self.factory = shadow.Factory(
+            scheduler=self.scheduler,
+            config={"delay": "10m"},
+            disk_activity_monitor=self.disk_activity_monitor,
+            spin_down_monitor=self.spin_down_monitor,
+        )
+        self.plugin = self.factory.create_plugin("sda", "/dev/sda")
+
+    def poll(self, device_name="sda", sectors_read=0, interval=60.0):
+        self.plugin.on_poll(
+            DiskSnapshot(
+                device_name=device_name,
+                interval=interval,
+                counters=DiskCounters(sectors_read=sectors_read, sectors_written=0),
+                deltas=DiskCounters(sectors_read=sectors_read, sectors_written=0),
+                read_bytes_per_second=0.0,
+                written_bytes_per_second=0.0,
+                utilisation=0.0,
+            )
+        )
+
+    def status(self, policy):
+        return self.plugin.get_status()[policy]
+
+    def test_spins_down_once_idle_for_delay(self):
+        self.plugin.on_disk_idle()
+        self.scheduler.advance(599)
+        self.assertEqual(self.status("shadow")["spin_downs"], 0)
+        self.scheduler.advance(1)
+        self.assertEqual(self.status("shadow")["spin_downs"], 1)
+        # Already in standby, the timer set again doesn't count
+        self.scheduler.advance(600)
+        self.assertEqual(self.status("shadow")["spin_downs"], 1)
+        self.assertEqual(self.status("shadow")["standby_seconds"], 600)
+
+    def test_activity_cancels_spin_down(self):
+        self.plugin.on_disk_idle()
+        self.scheduler.advance(300)
+        self.plugin.on_disk_active()
+        self.scheduler.advance(600)
+        self.assertEqual(self.status("shadow")["spin_downs"], 0)
+
+    def test_counts_traced_idle_time(self):
+        self.disk_activity_monitor.last_io_time.return_value = self.now - 500
+        self.plugin.on_disk_idle()
+        self.scheduler.advance(100)
+        self.assertEqual(self.status("shadow")["spin_downs"], 1)
+
+    def test_counts_wake_ups_of_shadow_and_live_spin_downs(self):
+        self.plugin.on_disk_idle()
+        self.scheduler.advance(600)
+        self.spin_down_monitor.notify_spun_down("sda")
+        self.scheduler.advance(120)
+        self.poll(sectors_read=8)
+        for policy in ["shadow", "live"]:
+            with self.subTest(policy=policy):
+                status = self.status(policy)
+                self.assertEqual(status["spin_downs"], 1)
+                self.assertEqual(status["wake_ups"], 1)
+                self.assertEqual(status["standby_seconds"], 120)
+
+    def test_ignores_io_before_standby(self):
+        self.plugin.on_disk_idle()
+        self.scheduler.advance(600)
+        self.scheduler.advance(30)
+        # Writeback between the previous poll and the spin-down
+        self.poll(sectors_read=8, interval=60)
+        self.assertEqual(self.status("shadow")["wake_ups"], 0)
+        # Traced I/O is known to have happened after the spin-down
+        self.disk_activity_monitor.last_io_time.return_value = self.now - 10
+        self.poll(sectors_read=8, interval=60)
+        self.assertEqual(self.status("shadow")["wake_ups"], 1)
+
+    def test_ignores_polls_without_io(self):
+        self.spin_down_monitor.notify_spun_down("sda")
+        self.scheduler.advance(60)
+        self.poll()
+        self.assertEqual(self.status("live")["wake_ups"], 0)
+
+    def test_routes_live_spin_downs_to_plugin_of_disk(self):
+        another_plugin = self.factory.create_plugin("sdb", "/dev/sdb")
+        self.spin_down_monitor.notify_spun_down("sdb")
+        self.assertEqual(self.status("live")["spin_downs"], 0)
+        self.assertEqual(another_plugin.get_status()["live"]["spin_downs"], 1)
+        self.spin_down_monitor.notify_spun_down("sdc")
+
+    def test_routes_live_spin_downs_after_rename(self):
+        self.plugin.on_disk_renamed("sdc", "/dev/sdc")
+        self.spin_down_monitor.notify_spun_down("sda")
+        self.assertEqual(self.status("live")["spin_downs"], 0)
+        self.spin_down_monitor.notify_spun_down("sdc")
+        self.assertEqual(self.status("live")["spin_downs"], 1)
+        # The new disk under the old name gets its own plugin
+        plugin = self.factory.create_plugin("sda", "/dev/sda")
+        self.plugin.on_disk_renamed("sdd", "/dev/sdd")
+        self.spin_down_monitor.notify_spun_down("sda")
+        self.assertEqual(plugin.get_status()["live"]["spin_downs"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import unittest
+
+from hdmon.lib import shell
+
+
+class SplitCommandTestCase(unittest.TestCase):
+    def test_plain_command(self):
+        self.assertEqual(
+            ["hdparm", "-y", "/dev/sda"],
+            shell.split_command("hdparm  -y /dev/sda", {}),
+        )
+
+    def test_expands_variables(self):
+        env = {"disk_path": "/dev/sda"}
+        self.assertEqual(
+            ["hdparm", "-y", "/dev/sda"],
+            shell.split_command("hdparm -y $disk_path", env),
+        )
+        self.assertEqual(
+            ["echo", "x/dev/sda1"], shell.split_command("echo x${disk_path}1", env)
+        )
+
+    def test_drops_empty_variables(self):
+        self.assertEqual(["echo"], shell.split_command("echo $unknown", {}))
+
+    def test_shell_syntax(self):
+        env = {"disk_path": "/dev/sda"}
+        for command in [
+            "hdparm -y $disk_path && sync",
+            "hdparm -y $disk_path > /dev/null",
+            "echo '$disk_path'",
+            'echo "$disk_path"',
+            "echo $(date)",
+            "echo /dev/sd*",
+            "echo $1",
+            "",
+        ]:
+            with self.subTest(command=command):
+                self.assertIsNone(shell.split_command(command, env))
+
+    def test_assignments_and_builtins(self):
+        for command in [
+            "LANG=C true",
+            "HOME=/tmp hdparm -y $disk_path",
+            "exit 0",
+            "cd /tmp",
+            ". /etc/hdmon.sh",
+            "ulimit -n 64",
+            "umask 077",
+        ]:
+            with self.subTest(command=command):
+                self.assertIsNone(shell.split_command(command, {}))
+        self.assertEqual(
+            ["dd", "if=/dev/sda", "of=/dev/null"],
+            shell.split_command("dd if=/dev/sda of=/dev/null", {}),
+        )
+
+    def test_values_the_shell_would_split(self):
+        self.assertIsNone(shell.split_command("echo $name", {"name": "a b"}))
+        self.assertIsNone(shell.split_command("echo $name", {"name": "*"}))
+
+
+class SpawnTestCase(unittest.TestCase):
+    def test_exit_code_and_output(self):
+        result = shell.spawn(["sh", "-c", "echo out; echo err >&2; exit 3"], {})
+        self.assertEqual(3, result.exit_code)
+        # The shell can complain about the working directory first
+        self.assertTrue(result.output.endswith(b"out\nerr\n"))
+        self.assertFalse(result.is_output_truncated)
+        self.assertGreaterEqual(result.run_time, result.spawn_time)
+
+    def test_keeps_end_of_output(self):
+        result = shell.spawn(
+            ["sh", "-c", "seq 1 10000"], {"PATH": "/bin:/usr/bin"}, max_output=10
+        )
+        self.assertEqual(0, result.exit_code)
+        self.assertEqual(b"\n9999\n10000\n"[-10:], result.output)
+        self.assertTrue(result.is_output_truncated)
+
+    def test_discards_stderr(self):
+        result = shell.spawn(
+            ["sh", "-c", "echo out; echo err >&2"], {}, capture_stderr=False
+        )
+        self.assertTrue(result.output.endswith(b"out\n"))
+        self.assertNotIn(b"err", result.output)
+
+    def test_timeout(self):
+        result = shell.spawn(["sleep", "10"], {}, timeout=0.1)
+        self.assertIsNone(result.exit_code)
+        self.assertLess(result.run_time, 5)
+
+    def test_doesnt_wait_for_background_children(self):
+        result = shell.spawn(["sh", "-c", "sleep 10 & exit 0"], {}, timeout=5)
+        self.assertEqual(0, result.exit_code)
+        self.assertLess(result.run_time, 5)
+
+    def test_missing_command(self):
+        with self.assertRaises(OSError):
+            shell.spawn(["hdmon-missing-command"], {})
+
+
+class RunTestCase(unittest.TestCase):
+    def test_success(self):
+        self.assertTrue(
+            shell.run("test $disk_path = /dev/sda", {"disk_path": "/dev/sda"})
+        )
+
+    def test_failure(self):
+        self.assertFalse(
+            shell.run("test $disk_path = /dev/sdb", {"disk_path": "/dev/sda"})
+        )
+        self.assertFalse(shell.run("exit 1", {}))
+        self.assertFalse(shell.run("hdmon-missing-command", {}))
+
+    def test_shell_command(self):
+        self.assertTrue(
+            shell.run('test "$disk_path" = /dev/sda', {"disk_path": "/dev/sda"})
+        )
+        self.assertTrue(shell.run("LANG=C true", {}))
+        self.assertTrue(shell.run("exit 0", {}))
+
+    def test_run_and_capture(self):
+        self.assertEqual((0, "a b\n"), shell.run_and_capture(["echo", "a", "b"]))
+        self.assertIsNone(shell.run_and_capture(["hdmon-missing-command"]))
@@ -0,0 +1,36 @@
+import json
+import unittest
+
+from hdmon.lib import smart
+
+
+class ParseOutputTestCase(unittest.TestCase):
+    def test_ata(self):
+        output = json.dumps(
+            {
+                "smart_status": {"passed": True},
+                "temperature": {"current": 35},
+                "ata_smart_attributes": {
+                    "table": [
+                        {"id": 5, "name": "Reallocated_Sector_Ct", "raw": {"value": 0}},
+                        {"id": 9, "name": "Power_On_Hours", "raw": {"value": 1234}},
+                    ]
+                },
+            }
+        )
+        self.assertEqual(
+            smart.parse_output(0, output),
+            {
+                "passed": True,
+                "temperature": 35,
+                "attributes": {"Reallocated_Sector_Ct": 0, "Power_On_Hours": 1234},
+            },
+        )
+
+    def test_failed_health_check(self):
+        output = json.dumps({"smart_status": {"passed": False}})
+        # Bit 3 is set if the disk is failing, the output is still valid
+        self.assertEqual(smart.parse_output(8, output), {"passed": False})
+
+    def test_standby(self):
+        self.assertIsNone(smart.parse_output(2, "{}"))
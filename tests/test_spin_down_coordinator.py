@@ -0,0 +1,90 @@
+from unittest import mock
+import unittest
+
+from hdmon.lib.spin_down_coordinator import SpinDownCoordinator
+
+
+class SpinDownCoordinatorTestCase(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch("time.monotonic", side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.scheduler = mock.Mock()
+        block_topology = mock.Mock()
+        block_topology.enclosure.side_effect = {
+            "sda": "host6",
+            "sdb": "host6",
+            "sdc": "host7",
+        }.get
+        self.coordinator = SpinDownCoordinator(
+            scheduler=self.scheduler,
+            block_topology=block_topology,
+            respin_window=120,
+            backoff=600,
+            max_backoff=1000,
+        )
+        self.spun_down = []
+        for device_name in ["sda", "sdb", "sdc", "nvme0n1"]:
+            self.coordinator.add_member(device_name)
+
+    def request(self, device_name):
+        self.coordinator.request_spin_down(
+            device_name, lambda: self.spun_down.append(device_name)
+        )
+
+    def test_spins_down_disks_without_siblings_right_away(self):
+        self.request("nvme0n1")
+        self.request("sdc")
+        self.assertEqual(["nvme0n1", "sdc"], self.spun_down)
+
+    def test_waits_for_all_disks_of_enclosure(self):
+        self.request("sda")
+        self.assertEqual([], self.spun_down)
+        self.coordinator.on_disk_active("sda")
+        self.request("sdb")
+        self.assertEqual([], self.spun_down)
+        self.request("sda")
+        self.assertEqual(["sdb", "sda"], self.spun_down)
+
+    def test_removed_disks_arent_waited_for(self):
+        self.request("sda")
+        self.coordinator.remove_member("sdb")
+        self.assertEqual(["sda"], self.spun_down)
+
+    def test_backs_off_after_immediate_spin_ups(self):
+        self.request("sdc")
+        self.now += 60
+        self.coordinator.on_disk_active("sdc")
+
+        # Postponed by the backoff
+        self.request("sdc")
+        self.assertEqual(["sdc"], self.spun_down)
+        delay, callback = self.scheduler.set_timer.call_args.args
+        self.assertEqual(600, delay)
+        self.now += delay
+        callback()
+        self.assertEqual(["sdc", "sdc"], self.spun_down)
+
+        # The backoff doubles up to the limit
+        self.now += 10
+        self.coordinator.on_disk_active("sdc")
+        self.request("sdc")
+        self.assertEqual(1000, self.scheduler.set_timer.call_args.args[0])
+
+    def test_resets_backoff_once_spin_down_holds(self):
+        self.request("sdc")
+        self.now += 60
+        self.coordinator.on_disk_active("sdc")
+        self.now += 600
+        self.request("sdc")
+        self.assertEqual(["sdc", "sdc"], self.spun_down)
+
+        self.now += 3600
+        self.coordinator.on_disk_active("sdc")
+        self.request("sdc")
+        self.assertEqual(["sdc", "sdc", "sdc"], self.spun_down)
+        self.now += 60
+        self.coordinator.on_disk_active("sdc")
+        self.request("sdc")
+        self.assertEqual(600, self.scheduler.set_timer.call_args.args[0])
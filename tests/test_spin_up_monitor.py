@@ -0,0 +1,123 @@
+from pathlib import Path
+from unittest import mock
+import tempfile
+import unittest
+
+from hdmon.lib.disk_stats import DiskCounters
+from hdmon.lib.spin_up_monitor import SpinUpMonitor
+
+
+class SpinUpMonitorTestCase(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.sysfs = Path(temp_dir.name)
+        self.scheduler = mock.Mock()
+        self.monitor = SpinUpMonitor(
+            scheduler=self.scheduler, sysfs_block_path=str(self.sysfs)
+        )
+        self.set_stat("sda", reads=10, writes=5, io_ticks=1000)
+
+    def set_stat(self, device_name, reads, writes, io_ticks, in_flight=0):
+        path = self.sysfs / device_name
+        path.mkdir(exist_ok=True)
+        (path / "stat").write_text(
+            f"{reads} 0 {reads * 8} 0 {writes} 0 {writes * 8} 0"
+            f" {in_flight} {io_ticks} 0 0 0 0 0 0 0\n"
+        )
+
+    def sample(self):
+        self.assertTrue(self.scheduler.set_timer.called)
+        _delay, callback = self.scheduler.set_timer.call_args.args
+        self.scheduler.set_timer.reset_mock()
+        callback()
+
+    def poll(self, device_name, reads, writes, io_ticks, in_flight=0):
+        self.monitor.on_disk_stats_updated(
+            [
+                (
+                    device_name,
+                    DiskCounters(
+                        sectors_read=reads * 8,
+                        sectors_written=writes * 8,
+                        reads_completed=reads,
+                        writes_completed=writes,
+                        in_flight=in_flight,
+                        io_ticks=io_ticks,
+                    ),
+                )
+            ]
+        )
+
+    def test_doesnt_sample_disks_that_werent_spun_down(self):
+        self.monitor.on_block_io("sda", 100.0, 8, 0)
+        self.poll("sda", reads=10, writes=5, io_ticks=1000, in_flight=1)
+        self.scheduler.set_timer.assert_not_called()
+        self.assertNotIn("sda", self.monitor.get_metrics())
+
+    def test_doesnt_sample_disks_in_standby_without_io(self):
+        self.monitor.on_disk_spun_down("sda")
+        self.assertIn('hdmon_standby{disk="sda"} 1', self.monitor.get_metrics())
+        self.poll("sda", reads=10, writes=5, io_ticks=1000)
+        self.monitor.on_block_io("sdb", 100.0, 8, 0)
+        self.scheduler.set_timer.assert_not_called()
+
+    def test_measures_first_io_after_traced_io(self):
+        self.monitor.on_disk_spun_down("sda")
+        # The request waits for the disk to spin up
+        self.monitor.on_block_io("sda", 100.0, 8, 0)
+        self.set_stat("sda", reads=10, writes=5, io_ticks=4000, in_flight=1)
+        self.sample()
+        self.scheduler.set_timer.assert_called_once()
+
+        self.set_stat("sda", reads=11, writes=5, io_ticks=8500)
+        self.sample()
+        self.scheduler.set_timer.assert_not_called()
+
+        metrics = self.monitor.get_metrics()
+        self.assertIn(
+            'hdmon_spin_up_latency_seconds_bucket{disk="sda",le="4"} 0', metrics
+        )
+        self.assertIn(
+            'hdmon_spin_up_latency_seconds_bucket{disk="sda",le="8"} 1', metrics
+        )
+        self.assertIn('hdmon_spin_up_latency_seconds_sum{disk="sda"} 7.5', metrics)
+        self.assertIn('hdmon_spin_ups_per_day{disk="sda"} 1', metrics)
+        self.assertNotIn("hdmon_standby{", metrics)
+
+    def test_starts_sampling_when_poll_shows_io_in_flight(self):
+        self.monitor.on_disk_spun_down("sda")
+        self.poll("sda", reads=10, writes=5, io_ticks=3000, in_flight=1)
+        # Polls don't end the standby of sampled disks
+        self.poll("sda", reads=10, writes=6, io_ticks=9000)
+        self.set_stat("sda", reads=10, writes=6, io_ticks=7000)
+        self.sample()
+        self.scheduler.set_timer.assert_not_called()
+        self.assertIn(
+            'hdmon_spin_up_latency_seconds_sum{disk="sda"} 6\n',
+            self.monitor.get_metrics(),
+        )
+
+    def test_measures_completed_io_at_poll(self):
+        self.monitor.on_disk_spun_down("sda")
+        self.poll("sda", reads=12, writes=5, io_ticks=9000)
+        self.scheduler.set_timer.assert_not_called()
+        metrics = self.monitor.get_metrics()
+        self.assertIn('hdmon_spin_up_latency_seconds_sum{disk="sda"} 8\n', metrics)
+        self.assertNotIn("hdmon_standby{", metrics)
+
+    def test_forgets_wakes_older_than_a_day(self):
+        with mock.patch("time.time", return_value=1000):
+            self.monitor.on_disk_spun_down("sda")
+            self.poll("sda", reads=10, writes=6, io_ticks=2000)
+        with mock.patch("time.time", return_value=1000 + 24 * 60 * 60 + 1):
+            metrics = self.monitor.get_metrics()
+        self.assertIn('hdmon_spin_ups_per_day{disk="sda"} 0', metrics)
+        self.assertIn('hdmon_spin_up_latency_seconds_count{disk="sda"} 1', metrics)
+
+    def test_stops_sampling_removed_disks(self):
+        self.monitor.on_disk_spun_down("sda")
+        self.monitor.on_block_io("sda", 100.0, 8, 0)
+        self.monitor.on_disks_removed(["sda"])
+        self.sample()
+        self.scheduler.set_timer.assert_not_called()
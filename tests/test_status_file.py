@@ -0,0 +1,70 @@
+import os
+import struct
+import tempfile
+import unittest
+
+from hdmon.lib import status_file
+from hdmon.lib.error_handling import Error
+from hdmon.lib.status_file import DiskStatus, StatusFileWriter
+
+
+class StatusFileTestCase(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.path = os.path.join(temp_dir.name, "hdmon", "status")
+        self.writer = StatusFileWriter(self.path, max_disks=2)
+        self.writer.open()
+        self.addCleanup(self.writer.close)
+
+    def read(self):
+        return status_file.read_status(self.path)
+
+    def test_empty(self):
+        self.assertEqual(self.read(), {})
+
+    def test_writes_records(self):
+        sda = DiskStatus(
+            device_name="sda",
+            is_idle=True,
+            power_state=status_file.POWER_STATE_STANDBY,
+            idle_since=1000.5,
+            spun_down_at=2000.5,
+            updated_at=2010.0,
+            sectors_read=123,
+            sectors_written=456,
+        )
+        sdb = DiskStatus(device_name="sdb")
+        self.assertTrue(self.writer.write(sda))
+        self.assertTrue(self.writer.write(sdb))
+        self.assertEqual(self.read(), {"sda": sda, "sdb": sdb})
+        self.assertEqual(status_file.read_disk_status("sdb", self.path), sdb)
+
+    def test_updates_records_in_place(self):
+        self.writer.write(DiskStatus(device_name="sda"))
+        updated = DiskStatus(device_name="sda", is_idle=False, sectors_read=1)
+        self.writer.write(updated)
+        self.assertEqual(self.read(), {"sda": updated})
+
+    def test_reuses_slots_of_removed_disks(self):
+        self.writer.write(DiskStatus(device_name="sda"))
+        self.writer.write(DiskStatus(device_name="sdb"))
+        self.assertFalse(self.writer.write(DiskStatus(device_name="sdc")))
+        self.writer.remove("sda")
+        self.assertTrue(self.writer.write(DiskStatus(device_name="sdc")))
+        self.assertEqual(set(self.read()), {"sdb", "sdc"})
+
+    def test_reader_waits_for_unfinished_update(self):
+        self.writer.write(DiskStatus(device_name="sda"))
+        header_size = struct.calcsize("=4sIII")
+        with open(self.path, "r+b") as fh:
+            fh.seek(header_size)
+            fh.write(struct.pack("=Q", 3))  # odd generation, the writer is busy
+        with self.assertRaises(Error):
+            self.read()
+
+    def test_rejects_unknown_format(self):
+        with open(self.path, "r+b") as fh:
+            fh.write(b"XXXX")
+        with self.assertRaises(Error):
+            self.read()
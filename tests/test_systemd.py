@@ -0,0 +1,89 @@
+from unittest import mock
+import os
+import socket
+import tempfile
+import time
+import unittest
+
+from hdmon.lib import systemd
+from hdmon.lib.scheduler import Scheduler
+
+
+class SystemdTestCase(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.path = os.path.join(temp_dir.name, "notify")
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.addCleanup(self.server.close)
+        self.server.bind(self.path)
+        self.server.settimeout(1)
+
+    def test_sends_messages(self):
+        with mock.patch.dict(os.environ, {"NOTIFY_SOCKET": self.path}):
+            self.assertTrue(systemd.notify("READY=1"))
+            self.assertTrue(systemd.notify("WATCHDOG=1"))
+        self.assertEqual(self.server.recv(1024), b"READY=1")
+        self.assertEqual(self.server.recv(1024), b"WATCHDOG=1")
+
+    def test_does_nothing_without_systemd(self):
+        with mock.patch.dict(os.environ, clear=True):
+            self.assertFalse(systemd.notify("READY=1"))
+
+    def test_watchdog_interval(self):
+        with mock.patch.dict(
+            os.environ, {"WATCHDOG_USEC": "30000000", "WATCHDOG_PID": str(os.getpid())}
+        ):
+            self.assertEqual(systemd.watchdog_interval(), 30.0)
+        with mock.patch.dict(
+            os.environ, {"WATCHDOG_USEC": "30000000", "WATCHDOG_PID": "1"}
+        ):
+            self.assertIsNone(systemd.watchdog_interval())
+        with mock.patch.dict(os.environ, clear=True):
+            self.assertIsNone(systemd.watchdog_interval())
+
+
+class WatchdogTestCase(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = Scheduler(stall_threshold=0.1)
+        self.pings = []
+        patcher = mock.patch.object(
+            systemd,
+            "notify",
+            side_effect=lambda _message: self.pings.append(time.monotonic()),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_pings_right_after_stall(self):
+        # Pings every 0.05s
+        systemd.Watchdog(
+            scheduler=self.scheduler, interval=0.2, is_healthy=lambda: True
+        ).start()
+        self.assertEqual(1, len(self.pings))
+        stall_ends = []
+
+        def stall():
+            time.sleep(0.15)
+            stall_ends.append(time.monotonic())
+
+        self.scheduler.set_timer(0.02, stall)
+        self.scheduler.set_timer(0.3, self.scheduler.stop)
+        with self.assertLogs(level="WARNING"):
+            self.scheduler.run()
+        # Resumed as soon as the loop was back rather than an interval later
+        pings_after_stall = [ping for ping in self.pings if ping >= stall_ends[0]]
+        self.assertLess(pings_after_stall[0] - stall_ends[0], 0.02)
+        self.assertGreaterEqual(len(pings_after_stall), 2)
+
+    def test_does_not_ping_if_unhealthy(self):
+        systemd.Watchdog(
+            scheduler=self.scheduler, interval=0.2, is_healthy=lambda: False
+        ).start()
+        self.scheduler.set_timer(0.12, self.scheduler.stop)
+        self.scheduler.run()
+        self.assertEqual([], self.pings)
+
+
+if __name__ == "__main__":
+    unittest.main()
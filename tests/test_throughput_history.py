@@ -0,0 +1,56 @@
+from unittest import mock
+import unittest
+
+from hdmon.lib.throughput_history import ThroughputArchive, ThroughputHistory
+
+
+class ThroughputArchiveTestCase(unittest.TestCase):
+    def setUp(self):
+        self.archive = ThroughputArchive(step=60, rows=3)
+
+    def test_empty(self):
+        self.assertEqual(self.archive.get_rows(), [])
+        self.assertEqual(self.archive.get_average(), (0.0, 0.0))
+
+    def test_consolidates_samples_of_a_step(self):
+        self.archive.add(600, 600, 60)
+        self.archive.add(630, 600, 0)
+        self.archive.add(660, 0, 120)
+        self.assertEqual(self.archive.get_rows(), [(600.0, 20.0, 1.0), (660.0, 0, 2.0)])
+        self.assertEqual(self.archive.get_average(), (10.0, 1.5))
+
+    def test_keeps_fixed_number_of_steps(self):
+        for minute in range(10, 20):
+            self.archive.add(minute * 60, minute, 0)
+        self.assertEqual(
+            [row[0] for row in self.archive.get_rows()], [17 * 60, 18 * 60, 19 * 60]
+        )
+        self.assertAlmostEqual(self.archive.get_rows()[0][1], 17 / 60)
+
+    def test_steps_without_polls_are_zero(self):
+        self.archive.add(600, 60, 0)
+        self.archive.add(630, 60, 0)
+        self.archive.add(600 + 3 * 60, 60, 0)  # the first step is overwritten
+        self.archive.add(600 + 60 * 60, 60, 0)
+        self.assertEqual(
+            self.archive.get_rows(),
+            [(4080.0, 0.0, 0.0), (4140.0, 0.0, 0.0), (4200.0, 1.0, 0.0)],
+        )
+
+
+class ThroughputHistoryTestCase(unittest.TestCase):
+    def test_records_snapshots(self):
+        history = ThroughputHistory()
+        snapshot = mock.Mock()
+        snapshot.deltas.sectors_read = 120
+        snapshot.deltas.sectors_written = -5  # counters went back
+        with mock.patch("time.time", return_value=3600.0):
+            history.on_poll(snapshot)
+        self.assertEqual(history.archives["hour"].get_rows(), [(3600.0, 1024.0, 0.0)])
+        self.assertEqual(
+            history.get_status()["month"], {"read": 120 * 512 / 3600, "written": 0}
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
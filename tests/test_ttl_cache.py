@@ -0,0 +1,41 @@
+from unittest import mock
+import unittest
+
+from hdmon.lib.ttl_cache import TtlCache
+
+
+class TtlCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch("time.monotonic", side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cache = TtlCache(ttl=10)
+
+    def test_keeps_values_until_ttl(self):
+        self.cache.set("sda", 1)
+        self.now += 4
+        self.assertEqual(self.cache.get("sda"), 1)
+        self.assertEqual(self.cache.age("sda"), 4)
+        self.now += 6
+        self.assertEqual(self.cache.get("sda"), 1)
+
+    def test_evicts_expired_values(self):
+        self.cache.set("sda", 1)
+        self.now += 5
+        self.cache.set("sdb", 2)
+        self.now += 6
+        self.assertIsNone(self.cache.get("sda"))
+        self.assertIsNone(self.cache.age("sda"))
+        self.assertEqual(list(self.cache.items()), [("sdb", 2)])
+
+    def test_set_resets_age(self):
+        self.cache.set("sda", 1)
+        self.now += 8
+        self.cache.set("sda", 2)
+        self.now += 8
+        self.assertEqual(self.cache.get("sda"), 2)
+
+    def test_missing_key(self):
+        self.assertIsNone(self.cache.get("sda"))
+        self.assertIsNone(self.cache.age("sda"))
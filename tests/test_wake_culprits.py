@@ -0,0 +1,48 @@
+from pathlib import Path
+import tempfile
+import unittest
+
+from hdmon.lib.process_io import ProcessIoSampler
+from hdmon.plugins.wake_culprits import WakeCulprits
+
+
+class WakeCulpritsTestCase(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.proc = Path(temp_dir.name)
+        self.plugin = WakeCulprits(
+            device_name="sda",
+            disk_path="/dev/sda",
+            config={"cgroups": False, "top": 1},
+            process_sampler=ProcessIoSampler(str(self.proc)),
+        )
+
+    def set_process(self, pid, read_bytes, cmdline):
+        path = self.proc / str(pid)
+        path.mkdir(exist_ok=True)
+        (path / "io").write_text(f"read_bytes: {read_bytes}\nwrite_bytes: 0\n")
+        (path / "cmdline").write_bytes(cmdline)
+
+    def test_finds_processes_that_woke_disk_up(self):
+        self.set_process(1, 100, b"/sbin/init\0")
+        self.set_process(2, 100, b"updatedb\0")
+        self.plugin.on_disk_idle()
+
+        self.set_process(1, 110, b"/sbin/init\0")
+        self.set_process(2, 4196, b"updatedb\0")
+        self.plugin.on_disk_active()
+        self.assertEqual(self.plugin.last_processes, [(2, "updatedb", 4096)])
+        self.assertEqual(
+            self.plugin.get_status()["processes"],
+            [{"pid": 2, "command": "updatedb", "bytes": 4096}],
+        )
+
+    def test_does_nothing_without_baseline(self):
+        self.set_process(1, 100, b"/sbin/init\0")
+        self.plugin.on_disk_active()
+        self.assertEqual(self.plugin.last_processes, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+from pathlib import Path
+from unittest import mock
+import tempfile
+import unittest
+
+from hdmon.lib.writeback import DiskWriteback
+
+
+class DiskWritebackTestCase(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.root = Path(temp_dir.name)
+        self.sysfs = self.root / "sys" / "block"
+        self.debugfs = self.root / "debug" / "bdi"
+        self.mountinfo = self.root / "mountinfo"
+        self.mountinfo.write_text("")
+
+        self.add_device("sda", "8:0", bdi="8:0", sectors_written=100)
+        self.add_partition("sda", "sda1", "8:1")
+        self.add_partition("sda", "sda2", "8:2")
+        self.add_device("dm-0", "253:0", bdi="253:0")
+        (self.sysfs / "sda" / "sda2" / "holders" / "dm-0").mkdir(parents=True)
+        self.add_device("sdb", "8:16", bdi="8:16")
+
+    def add_device(self, name, device_number, bdi, sectors_written=0):
+        path = self.sysfs / name
+        path.mkdir(parents=True)
+        (path / "dev").write_text(device_number + "\n")
+        (path / "stat").write_text(f"1 0 8 0 2 0 {sectors_written} 0 0 0 0\n")
+        bdi_path = self.root / "virtual" / "bdi" / bdi
+        bdi_path.mkdir(parents=True)
+        (path / "bdi").symlink_to(bdi_path)
+        self.set_bdi_stats(bdi, 0, 0)
+
+    def add_partition(self, disk, name, device_number):
+        path = self.sysfs / disk / name
+        path.mkdir()
+        (path / "dev").write_text(device_number + "\n")
+        (path / "partition").write_text("1\n")
+
+    def set_bdi_stats(self, bdi, writeback_kb, reclaimable_kb):
+        path = self.debugfs / bdi
+        path.mkdir(parents=True, exist_ok=True)
+        (path / "stats").write_text(
+            f"BdiWriteback:       {writeback_kb:>8} kB\n"
+            f"BdiReclaimable:     {reclaimable_kb:>8} kB\n"
+            f"BdiDirtyThresh:            0 kB\n"
+        )
+
+    def create(self, device_name="sda"):
+        return DiskWriteback(
+            device_name,
+            sysfs_block_path=str(self.sysfs),
+            debugfs_bdi_path=str(self.debugfs),
+            mountinfo_path=str(self.mountinfo),
+        )
+
+    def test_sums_pending_data_of_stacked_devices(self):
+        writeback = self.create()
+        self.assertEqual(writeback.pending_kb(), 0)
+        self.set_bdi_stats("8:0", 4, 8)
+        self.set_bdi_stats("253:0", 0, 16)
+        self.set_bdi_stats("8:16", 1000, 1000)
+        self.assertEqual(writeback.pending_kb(), 28)
+
+    def test_pending_data_is_unknown_without_debugfs(self):
+        writeback = self.create()
+        (self.debugfs / "253:0" / "stats").unlink()
+        self.assertIsNone(writeback.pending_kb())
+
+    def test_syncs_filesystems_on_disk(self):
+        mount_points = {}
+        for name in ["sda1", "dm 0", "sdb"]:
+            mount_points[name] = self.root / "mnt" / name
+            mount_points[name].mkdir(parents=True)
+        escaped_dm_mount_point = str(mount_points["dm 0"]).replace(" ", "\\040")
+        self.mountinfo.write_text(
+            f"30 1 8:1 / {mount_points['sda1']} rw - ext4 /dev/sda1 rw\n"
+            f"31 1 253:0 / {escaped_dm_mount_point} rw"
+            " - ext4 /dev/dm-0 rw\n"
+            f"32 1 8:16 / {mount_points['sdb']} rw - ext4 /dev/sdb rw\n"
+        )
+        writeback = self.create()
+        self.assertEqual(
+            list(writeback._find_mount_points()),
+            [str(mount_points["sda1"]), str(mount_points["dm 0"])],
+        )
+        self.assertEqual(writeback.sync(), {})
+
+    def test_counts_sectors_written_by_sync_on_stacked_devices(self):
+        self.add_device("md0", "9:0", bdi="9:0", sectors_written=10)
+        (self.sysfs / "sdb" / "holders" / "md0").mkdir(parents=True)
+        mount_point = self.root / "mnt" / "md0"
+        mount_point.mkdir(parents=True)
+        self.mountinfo.write_text(f"30 1 9:0 / {mount_point} rw - ext4 /dev/md0 rw\n")
+
+        def write_back(path):
+            self.assertEqual(path, str(mount_point))
+            (self.sysfs / "sdb" / "stat").write_text("1 0 8 0 2 0 16 0 0 0 0\n")
+            (self.sysfs / "md0" / "stat").write_text("1 0 8 0 2 0 26 0 0 0 0\n")
+
+        with mock.patch("hdmon.lib.writeback._syncfs", side_effect=write_back):
+            self.assertEqual(self.create("sdb").sync(), {"sdb": 16, "md0": 16})
+
+
+if __name__ == "__main__":
+    unittest.main()